@@ -0,0 +1,141 @@
+"""
+Measures lookup, registration and heartbeat throughput of the client
+against an in-process stub registry.
+
+    python benchmarks/bench_client.py --publishers 10 100 1000
+"""
+import argparse
+import gc
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def percentile(samples, fraction):
+    """
+    Returns the given percentile of a sorted list of samples.
+    """
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+def run_threads(target, threads):
+    """
+    Runs target(index) on the given number of threads and returns the elapsed time.
+    """
+    workers = [threading.Thread(target=target, args=(i,)) for i in range(threads)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.time() - start
+
+
+def make_publishers(url, pool, count):
+    return [ServicePublisher('bench-service-%d' % (i % 10), 300, 'UP', 'https://bench-%d.mybluemix.net' % i,
+                             'http', tags=['bench', 'zone-%d' % (i % 3)], url=url, auth_token='token', pool=pool)
+            for i in range(count)]
+
+
+def bench_registration(url, pool, count, threads):
+    publishers = make_publishers(url, pool, count)
+
+    def register(index):
+        for publisher in publishers[index::threads]:
+            publisher.register_service(False)
+
+    elapsed = run_threads(register, threads)
+    return publishers, count / elapsed
+
+
+def bench_heartbeats(publishers, threads, duration):
+    counts = [0] * threads
+
+    def beat(index):
+        own = publishers[index::threads]
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            for publisher in own:
+                publisher.heartbeat_service()
+                counts[index] += 1
+
+    elapsed = run_threads(beat, threads)
+    return sum(counts) / elapsed / threads
+
+
+def bench_lookups(url, pool, threads, lookups, **filters):
+    locator = ServiceLocator(url, 'token', pool=pool)
+    latencies = [[] for _ in range(threads)]
+
+    def lookup(index):
+        for _ in range(lookups):
+            start = time.time()
+            locator.get_services(parsed=True, **filters)
+            latencies[index].append(time.time() - start)
+
+    elapsed = run_threads(lookup, threads)
+    samples = sorted(sample for thread_samples in latencies for sample in thread_samples)
+    return len(samples) / elapsed, percentile(samples, .5), percentile(samples, .99)
+
+
+def bench_memory(url, pool, count):
+    """
+    Returns the bytes allocated per registered publisher, or None without tracemalloc.
+    """
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    publishers = make_publishers(url, pool, count)
+    for publisher in publishers:
+        publisher.register_service(False)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    for publisher in publishers:
+        publisher.deregister_service()
+    return allocated / float(count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--publishers', type=int, nargs='+', default=[10, 100, 1000],
+                        help='registered publisher counts to benchmark')
+    parser.add_argument('--threads', type=int, default=4, help='client threads')
+    parser.add_argument('--lookups', type=int, default=200, help='lookups per thread')
+    parser.add_argument('--duration', type=float, default=2, help='heartbeat phase duration (sec)')
+    args = parser.parse_args()
+
+    row = '%10s %12s %12s %10s %10s %14s %12s'
+    print(row % ('publishers', 'register/s', 'lookups/s', 'p50 ms', 'p99 ms', 'beats/s/thread', 'bytes/pub'))
+    for count in args.publishers:
+        with StubRegistryServer() as server:
+            pool = ConnectionPool(pool_maxsize=args.threads)
+            publishers, registrations = bench_registration(server.url, pool, count, args.threads)
+            lookups, p50, p99 = bench_lookups(server.url, pool, args.threads, args.lookups,
+                                              service_name='bench-service-0', tags='bench')
+            beats = bench_heartbeats(publishers, args.threads, args.duration)
+            for publisher in publishers:
+                publisher.deregister_service()
+            memory = bench_memory(server.url, pool, count)
+            pool.close()
+        print(row % (count, '%.0f' % registrations, '%.0f' % lookups, '%.2f' % (p50 * 1000),
+                     '%.2f' % (p99 * 1000), '%.0f' % beats, '-' if memory is None else '%.0f' % memory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,591 @@
+"""
+ asyncio counterparts of ServiceLocator and ServicePublisher
+
+ Requires Python 3.6+ and aiohttp (pip install bluemix-service-discovery[async]).
+"""
+import asyncio
+import json
+import logging
+import time
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.connection import (DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, attempt_timeout,
+                                                  body_size, streamed_size)
+from bluemix_service_discovery.heartbeat import DEFAULT_CAPACITY, format_heartbeat, heartbeat_deadline
+from bluemix_service_discovery.models import ServiceInstance
+from bluemix_service_discovery.service_locator import ServiceLocator, UNAVAILABLE_EXCEPTIONS
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.streaming import InstanceStreamParser
+from bluemix_service_discovery.utils import lookup_key, monotonic
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncResponse(object):
+    """Status code and body of a completed asynchronous request, or of a streamed one whose body is
+    read with iter_content"""
+
+    __slots__ = ('status_code', 'text', 'headers', 'raw')
+
+    def __init__(self, status_code, text, headers=None, raw=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers if headers is not None else {}
+        self.raw = raw
+
+    async def iter_content(self, chunk_size=65536):
+        """
+        Yields the body of a streamed response as it is received.
+
+        :param chunk_size:  Maximum number of bytes per chunk.
+        """
+        async for chunk in self.raw.content.iter_chunked(chunk_size):
+            yield chunk
+
+    def close(self):
+        """
+        Releases the connection of a streamed response back to the pool.
+        """
+        if self.raw is not None:
+            self.raw.release()
+
+
+class AsyncConnectionPool(object):
+    """Keep-alive aiohttp connection pool with the same limits as ConnectionPool"""
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 keep_alive=True):
+        """
+        Initializes the pool. The underlying session is created on first use, inside the running loop.
+
+        :param pool_connections:    Number of hosts connections are kept open for.
+        :param pool_maxsize:        Maximum number of connections kept open per host.
+        :param keep_alive:          Whether connections are reused between requests.
+        """
+        if aiohttp is None:
+            raise ImportError('aiohttp is required for asyncio support: '
+                              'pip install bluemix-service-discovery[async]')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+
+        # Event loop -> (session, keeper closing the session when the loop shuts down)
+        self._sessions = {}
+
+    @classmethod
+    def from_pool(cls, pool):
+        """
+        Builds an asynchronous pool with the limits of a synchronous ConnectionPool.
+
+        :param pool:    ConnectionPool to copy the limits from.
+        :return:        AsyncConnectionPool
+        """
+        return cls(pool.pool_connections, pool.pool_maxsize, pool.keep_alive)
+
+    async def session(self):
+        """
+        Returns the pooled session of the running event loop, creating it if needed. A session is bound
+        to its loop, so each loop using the pool gets its own, closed when the loop shuts down its
+        asynchronous generators, as asyncio.run does.
+
+        :return:    aiohttp.ClientSession
+        """
+        loop = _running_loop()
+        entry = self._sessions.get(loop)
+        if entry is None or entry[0].closed:
+            # Forget the sessions of loops closed since
+            for closed in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[closed]
+            connector = aiohttp.TCPConnector(limit=self.pool_connections * self.pool_maxsize,
+                                             limit_per_host=self.pool_maxsize,
+                                             force_close=not self.keep_alive)
+            session = aiohttp.ClientSession(connector=connector)
+            keeper = _close_on_shutdown(session)
+            await keeper.__anext__()
+            entry = self._sessions[loop] = (session, keeper)
+        return entry[0]
+
+    async def request(self, method, url, data=None, headers=None, timeout=None, stream=False):
+        """
+        Sends an HTTP request over a pooled connection.
+
+        :param method:  HTTP method.
+        :param url:     Request URL.
+        :param data:    Request body.
+        :param headers: Request headers.
+        :param timeout: (connect, read) timeouts (sec), or a single timeout for both.
+        :param stream:  Leave a successful response's body unread, for AsyncResponse.iter_content. The
+                        response must then be closed.
+        :return:        AsyncResponse
+        """
+        if timeout is not None:
+            connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+            timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        session = await self.session()
+        if stream:
+            response = await session.request(method, url, data=data, headers=headers, timeout=timeout)
+            if response.status < 400:
+                return AsyncResponse(response.status, None, response.headers, raw=response)
+            try:
+                return AsyncResponse(response.status, await response.text(), response.headers)
+            finally:
+                response.release()
+        async with session.request(method, url, data=data, headers=headers, timeout=timeout) as response:
+            return AsyncResponse(response.status, await response.text(), response.headers)
+
+    async def close(self):
+        """
+        Closes the pooled connections of the running event loop.
+        """
+        entry = self._sessions.pop(_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+
+
+_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+async def _close_on_shutdown(session):
+    """
+    Closes a session when the loop it was created in finalizes this generator, at shutdown or
+    when the pool closes it.
+    """
+    try:
+        yield
+    finally:
+        await session.close()
+
+
+_default_pool = None
+
+
+def get_default_async_pool():
+    """
+    Returns the process-wide pool used when no pool is given to an asynchronous client.
+
+    :return:    AsyncConnectionPool
+    """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = AsyncConnectionPool()
+    return _default_pool
+
+
+def _async_pool(pool, context):
+    """
+    Returns the pool an asynchronous client is given: the shared asynchronous pool, unless a pool or a
+    context providing one is given.
+    """
+    if pool is not None or context is not None:
+        return pool
+    return get_default_async_pool()
+
+
+def _require_async_pool(client):
+    """
+    Checks that an asynchronous client sends its requests with an AsyncConnectionPool, rather than a
+    blocking one, e.g. of a context created for synchronous clients.
+
+    :raises TypeError:  If the client's pool is not an AsyncConnectionPool.
+    """
+    if not isinstance(client.pool, AsyncConnectionPool):
+        raise TypeError('%s requires an AsyncConnectionPool, not %s: pass pool=AsyncConnectionPool() or a '
+                        'context created with one' % (type(client).__name__, type(client.pool).__name__))
+
+
+async def send(pool, method, url, action, error_message, retry=None, breaker=None, metrics=None, operation=None,
+               deadline=None, **kwargs):
+    """
+    Sends a request to Service Discovery, raising the exception matching an error response.
+    Mirrors bluemix_service_discovery.connection.send.
+
+    :param pool:            AsyncConnectionPool to send the request with.
+    :param method:          HTTP method.
+    :param url:             Request URL.
+    :param action:          Description of the operation, e.g. 'service lookup'.
+    :param error_message:   Message of the exception raised when the registry cannot be reached.
+    :param retry:           Optional RetryPolicy for transient errors.
+    :param breaker:         Optional CircuitBreaker guarding the registry.
+    :param metrics:         Optional Metrics notified of every attempt.
+    :param operation:       Operation name reported to metrics, e.g. 'lookup'.
+    :param deadline:        Time (sec) within which the call, retries included, must complete. The retry
+                            policy's deadline applies if it is shorter.
+    :param kwargs:          Additional arguments passed to the pool.
+    :return:                Successful response
+    :raises DeadlineExceededException: If the deadline passed before a response was received.
+    """
+    instrumented = metrics is not None and metrics.enabled
+    if retry is not None and retry.budget is not None:
+        retry.budget.record_request()
+    policy_deadline = getattr(retry, 'deadline', None)
+    if deadline is None or (policy_deadline is not None and policy_deadline < deadline):
+        deadline = policy_deadline
+    started_at = monotonic()
+    expires_at = started_at + deadline if deadline is not None else None
+    expired_message = '%s not completed within %s sec' % (action, deadline)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            request_kwargs = kwargs
+            if expires_at is not None:
+                remaining = expires_at - monotonic()
+                if remaining <= 0:
+                    raise exceptions.DeadlineExceededException(expired_message)
+                request_kwargs = dict(kwargs, timeout=attempt_timeout(kwargs.get('timeout'), remaining))
+            if breaker is not None:
+                breaker.before_request()
+            error = None
+            abandoned = False
+            response = None
+            if instrumented:
+                context = metrics.start_request(operation, method, url)
+                attempt_started_at = monotonic()
+            try:
+                try:
+                    response = await pool.request(method, url, **request_kwargs)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if expires_at is not None and monotonic() >= expires_at:
+                        raise exceptions.DeadlineExceededException(expired_message, internal_details=str(e))
+                    raise exceptions.TransportException(error_message, internal_details=str(e))
+
+                # Check for possible errors in response
+                exceptions.check_response(response.status_code, response.text, action)
+                return response
+            except asyncio.CancelledError as e:
+                # Cancelled, e.g. by asyncio.wait_for: says nothing about the registry
+                error, abandoned = e, True
+                raise
+            except Exception as e:
+                error = e
+                raise
+            except BaseException as e:
+                error, abandoned = e, True
+                raise
+            finally:
+                if breaker is not None:
+                    if abandoned:
+                        breaker.release()
+                    else:
+                        breaker.record(error)
+                if instrumented:
+                    streamed = kwargs.get('stream') and error is None
+                    metrics.end_request(context, operation, getattr(response, 'status_code', None),
+                                        monotonic() - attempt_started_at, body_size(kwargs.get('data')),
+                                        streamed_size(response) if streamed else body_size(response), error)
+        except Exception as e:
+            delay = retry.next_delay(e, attempt, started_at, deadline) if retry is not None else None
+            if delay is None:
+                raise
+            if instrumented:
+                metrics.observe_retry(operation, e)
+        await asyncio.sleep(delay)
+
+
+class AsyncSingleFlight(object):
+    """Share one in-flight call between the tasks requesting the same key"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+
+    async def do(self, key, operation):
+        """
+        Awaits operation(), unless a call for the same key is in flight, in which case its outcome is
+        awaited and shared. Cancelling one caller does not cancel the shared call.
+
+        :param key:         Hashable key identifying identical calls.
+        :param operation:   Coroutine function called without arguments.
+        :return:            Result of the operation
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.ensure_future(operation())
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+
+class AsyncServiceLocator(ServiceLocator):
+    """Search for service instances without blocking the event loop"""
+
+    def __init__(self, url=None, auth_token=None, pool=None, cache=None, retry=None, breaker=None,
+                 timeouts=None, metrics=None, context=None):
+        """
+        Initializes the service instance with all its parameters.
+
+        :param url:         Service Discovery API endpoint.
+        :param auth_token:  Authorization token for Service Discovery.
+        :param pool:        AsyncConnectionPool used for requests. Defaults to the shared pool.
+        :param cache:       Optional LookupCache for lookup results. Expired entries are reloaded inline, or
+                            served while the registry is unavailable.
+        :param retry:       Optional RetryPolicy for transient errors.
+        :param breaker:     Optional CircuitBreaker, which may be shared with publishers.
+        :param timeouts:    Dict of operation ('lookup') to (connect, read) timeouts (sec).
+        :param metrics:     Metrics notified of every request. Defaults to the process-wide metrics.
+        :param context:     Optional RegistryContext, with an AsyncConnectionPool, to attach to.
+        """
+        super(AsyncServiceLocator, self).__init__(url, auth_token, _async_pool(pool, context), cache, retry,
+                                                  breaker, timeouts, metrics=metrics, context=context)
+        _require_async_pool(self)
+        self.single_flight = AsyncSingleFlight()
+
+    async def get_services(self, fields=None, tags=None, service_name=None, status=None, parsed=False):
+        """
+        Returns all the currently registered services and their parameters.
+
+        :param fields       Comma separated list, or list, of fields to include in response.
+        :param tags         Comma separated list, or list, of tags that returned instances must have.
+        :param service_name Name of instances to return.
+        :param status       State, or list of states, of instances to be return.
+        :param parsed       Return a tuple of ServiceInstance instead of the response text.
+
+        :return response
+        """
+        catalog = await self._catalog(lookup_key(fields, tags, service_name, status))
+        return catalog.instances if parsed else catalog.text
+
+    async def get_index(self, tags=None, service_name=None, status=None):
+        """
+        Returns an index of the currently registered services by tag and status, served from the
+        locator's cache, or from index_cache if the locator has none.
+
+        :param tags         Comma separated list, or list, of tags that indexed instances must have.
+        :param service_name Name of instances to index.
+        :param status       State, or list of states, of instances to index.
+
+        :return TagIndex
+        """
+        return (await self._catalog(lookup_key(None, tags, service_name, status), self.index_cache)).index
+
+    async def _catalog(self, key, cache=None):
+        """
+        Returns the Catalog of a lookup, from the cache or the registry.
+
+        :param cache:   LookupCache to use instead of the locator's.
+        """
+        cache = cache if cache is not None else self.cache
+        catalog = cache.get_fresh(key) if cache is not None else None
+        if catalog is None:
+            try:
+                catalog = await self.single_flight.do(key, lambda: self._fetch_services(*key))
+            except UNAVAILABLE_EXCEPTIONS:
+                # Serve an older result while the registry is unavailable
+                catalog = cache.peek(key) if cache is not None else None
+                if catalog is None:
+                    raise
+            else:
+                if cache is not None:
+                    cache.put(key, catalog)
+        return catalog
+
+    async def iter_services(self, fields=None, tags=None, service_name=None, status=None, chunk_size=65536):
+        """
+        Yields the currently registered services as they are received, without buffering the response.
+        Cached results are not used. Iterate with async for.
+
+        :param fields       Comma separated list, or list, of fields to include in response.
+        :param tags         Comma separated list, or list, of tags that returned instances must have.
+        :param service_name Name of instances to return.
+        :param status       State, or list of states, of instances to be return.
+        :param chunk_size   Maximum number of bytes read from the connection at a time.
+
+        :return asynchronous generator of ServiceInstance
+        """
+        response = await send(self.pool, "GET", self._services_url(*lookup_key(fields, tags, service_name, status)),
+                              'service lookup', 'Error on service lookup', retry=self.retry,
+                              breaker=self.breaker, timeout=self.timeouts['lookup'],
+                              metrics=self.metrics, operation='lookup', stream=True,
+                              headers=self.context.auth_headers)
+        try:
+            parser = InstanceStreamParser()
+            async for chunk in response.iter_content(chunk_size):
+                for data in parser.feed(chunk):
+                    yield ServiceInstance.from_dict(data)
+            parser.close()
+        finally:
+            response.close()
+
+    async def _fetch_services(self, fields, tags, service_name, status):
+        """
+        Retrieves the registered services from Service Discovery, bypassing any cache.
+
+        :return:    Catalog wrapping the response
+        """
+        key = (fields, tags, service_name, status)
+        headers, previous = self._lookup_headers(key)
+        response = await send(self.pool, "GET", self._services_url(fields, tags, service_name, status),
+                              'service lookup', 'Error on service lookup', retry=self.retry,
+                              breaker=self.breaker, timeout=self.timeouts['lookup'],
+                              metrics=self.metrics, operation='lookup',
+                              headers=headers)
+
+        return self._catalog_from(key, response, previous)
+
+
+class AsyncServicePublisher(ServicePublisher):
+    """Register and heartbeat a new service instance from an event loop"""
+
+    def __init__(self, name, ttl, status, endpoint, protocol, tags=None, url=None, auth_token=None,
+                 pool=None, retry=None, breaker=None, timeouts=None, metrics=None, history_size=DEFAULT_CAPACITY,
+                 interval_policy=None, context=None):
+        """
+        Initializes the service instance with all its parameters.
+
+        :param name:        Name of the service.
+        :param ttl:         Time (sec) in which the service must register a heartbeat.
+        :param status:      Starting status of the service.
+        :param endpoint:    Endpoint of the service.
+        :param protocol:    Desired protocol of the service endpoint.
+        :param tags:        Tags to associate with the service.
+        :param url:         Service Discovery API endpoint.
+        :param auth_token:  Authorization token for Service Discovery.
+        :param pool:        AsyncConnectionPool used for requests. Defaults to the shared pool.
+        :param retry:       Optional RetryPolicy for transient errors.
+        :param breaker:     Optional CircuitBreaker, which may be shared with locators.
+        :param timeouts:    Dict of operation ('register', 'heartbeat', 'deregister') to (connect, read)
+                            timeouts (sec).
+        :param metrics:     Metrics notified of every request and heartbeat. Defaults to the process-wide
+                            metrics.
+        :param history_size: Number of recent heartbeats kept for get_heartbeat_success_rate and
+                            get_heartbeat_jitter.
+        :param interval_policy: Policy sizing the time between heartbeats, e.g. AdaptiveInterval.
+                            Defaults to FixedInterval, beating every half TTL.
+        :param context:     Optional RegistryContext, with an AsyncConnectionPool, to attach to.
+        """
+        super(AsyncServicePublisher, self).__init__(name, ttl, status, endpoint, protocol, tags=tags, url=url,
+                                                    auth_token=auth_token,
+                                                    pool=_async_pool(pool, context), retry=retry,
+                                                    breaker=breaker, timeouts=timeouts, metrics=metrics,
+                                                    history_size=history_size, interval_policy=interval_policy,
+                                                    context=context)
+        _require_async_pool(self)
+        self.heartbeat_task = None
+
+    async def register_service(self, heartbeat=True, parsed=False):
+        """
+        Registers the service with Service Discovery.
+
+        :param heartbeat:   Indicates whether or not to start a heartbeat task.
+        :param parsed:      Return a ServiceInstance instead of the response text.
+        :return:            Successful service registration object
+        """
+        # Call Service Discovery /instances to register the service
+        response = await send(self.pool, "POST", self.context.instances_url,
+                              'service registration', 'Error registering controller service', retry=self.retry,
+                              breaker=self.breaker, timeout=self.timeouts['register'],
+                              metrics=self.metrics, operation='register',
+                              data=json.dumps(self._registration_payload()),
+                              headers=self.context.json_headers)
+
+        # Set instance values based on returned object
+        registration = self._complete_registration(response.text, parsed)
+
+        # Start task responsible for sending heartbeat
+        if heartbeat:
+            self.beating = True
+            self.heartbeat_task = asyncio.ensure_future(self._heartbeater())
+
+        return registration
+
+    async def heartbeat_service(self):
+        """
+        Heartbeats the service with Service Discovery.
+
+        :return:    Datetime string of the heartbeat
+        """
+        return format_heartbeat(await self._beat())
+
+    async def _beat(self):
+        """
+        Sends a heartbeat and records its outcome in the history.
+
+        :return:    Epoch time (sec) of the heartbeat
+        """
+
+        # First make sure service has been registered
+        if not self.registered:
+            raise Exception('Service instance is not registered')
+
+        # Call Service Discovery /instances/XXX/heartbeat to heartbeat the service
+        started_at = monotonic()
+        try:
+            await send(self.pool, "PUT", self.heartbeat_url,
+                       'service heartbeat', 'Error heartbeating service', retry=self.retry,
+                       breaker=self.breaker, timeout=self.timeouts['heartbeat'],
+                       deadline=heartbeat_deadline(self.ttl, self.interval_policy.interval(self.ttl)),
+                       metrics=self.metrics, operation='heartbeat',
+                       headers=self.context.auth_headers)
+        except Exception:
+            self.heartbeats.record(time.time(), succeeded=False)
+            raise
+
+        self.interval_policy.observe(monotonic() - started_at)
+        heartbeat_time = time.time()
+        self.heartbeats.record(heartbeat_time)
+        return heartbeat_time
+
+    async def _heartbeater(self):
+        """
+        Handles the service heartbeat
+        """
+        due = monotonic() + self.interval_policy.interval(self.ttl)
+        while self.beating:
+            await asyncio.sleep(max(0, due - monotonic()))
+            started_at = monotonic()
+            if self.metrics.enabled:
+                self.metrics.observe_heartbeat_lag(started_at - due)
+            try:
+                await self._beat()
+                succeeded = True
+            except asyncio.CancelledError:
+                # An Exception before Python 3.8
+                raise
+            except Exception:
+                # Keep beating: the registry may recover before the instance expires
+                logger.exception('Error heartbeating service %s', self.id)
+                succeeded = False
+
+            # Schedule from the start of this beat, so that the time it took does not add up
+            due = started_at + self._heartbeat_delay(succeeded)
+
+    def stop_heartbeat(self, wait=False):
+        """
+        Stops heartbeating the service by cancelling the heartbeat task. Call it from the event loop.
+
+        :param wait:    Ignored: await deregister_service to wait for the task to end.
+        """
+        self.beating = False
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+
+    async def deregister_service(self):
+        """
+        De-register the service with Service Discovery
+        """
+
+        # Stop the heartbeats
+        task = self.heartbeat_task
+        self.stop_heartbeat()
+        if task is not None:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.heartbeats.clear()
+
+        # Call Service Discovery /instances/XXX to de-register the service
+        await send(self.pool, "DELETE", '%s/%s' % (self.context.instances_url, self.id),
+                   'service de-registration', 'Error de-registering service', retry=self.retry,
+                   breaker=self.breaker, timeout=self.timeouts['deregister'],
+                   metrics=self.metrics, operation='deregister',
+                   headers=self.context.auth_headers)
+
+        self.registered = False
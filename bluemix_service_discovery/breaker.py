@@ -0,0 +1,131 @@
+"""
+ Circuit breaker for Service Discovery calls
+"""
+import threading
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.utils import monotonic
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Errors counted against the registry: it could not be reached or failed on its side
+FAILURE_EXCEPTIONS = (exceptions.TransportException, exceptions.ServerErrorException,
+                      exceptions.DeadlineExceededException)
+
+
+class CircuitBreaker(object):
+    """Fail fast while the registry's recent error rate is too high, probing it to recover"""
+
+    def __init__(self, failure_rate=0.5, min_requests=10, window=30, reset_timeout=30, half_open_requests=1,
+                 buckets=10):
+        """
+        :param failure_rate:        Fraction of failed requests in the window that opens the circuit.
+        :param min_requests:        Minimum number of requests in the window before the circuit may open.
+        :param window:              Time (sec) over which the error rate is measured.
+        :param reset_timeout:       Time (sec) the circuit stays open before probing the registry.
+        :param half_open_requests:  Number of concurrent probe requests allowed while half-open.
+        :param buckets:             Number of buckets the window is divided into.
+        """
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_requests = half_open_requests
+
+        self.state = CLOSED
+        self._bucket_width = float(window) / buckets
+        # Ring of [bucket index, successes, failures]
+        self._buckets = [[-1, 0, 0] for _ in range(buckets)]
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """
+        Checks whether a request may be sent.
+
+        :raises CircuitOpenException:   While the circuit is open, or half-open with all probes in flight.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if monotonic() - self._opened_at < self.reset_timeout:
+                    raise exceptions.CircuitOpenException('Service registry circuit is open')
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_requests:
+                    raise exceptions.CircuitOpenException('Service registry circuit is half-open')
+                self._probes += 1
+
+    def record_success(self):
+        """
+        Records a request the registry answered. Closes a half-open circuit.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._close()
+            self._bucket()[1] += 1
+
+    def record_failure(self):
+        """
+        Records a request the registry failed. Opens the circuit past the failure rate.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._bucket()[2] += 1
+            successes, failures = self._totals()
+            total = successes + failures
+            if self.state == CLOSED and total >= self.min_requests and failures >= self.failure_rate * total:
+                self._open()
+
+    def release(self):
+        """
+        Records a request abandoned without an outcome, e.g. cancelled. Frees its probe slot while
+        half-open, without closing or opening the circuit.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, error):
+        """
+        Records the outcome of a request from the exception it raised, if any.
+
+        :param error:   Exception raised by the request, or None.
+        """
+        if error is None or not isinstance(error, FAILURE_EXCEPTIONS):
+            self.record_success()
+        else:
+            self.record_failure()
+
+    @property
+    def is_open(self):
+        return self.state == OPEN and monotonic() - self._opened_at < self.reset_timeout
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = monotonic()
+
+    def _close(self):
+        self.state = CLOSED
+        for bucket in self._buckets:
+            bucket[:] = [-1, 0, 0]
+
+    def _bucket(self):
+        index = int(monotonic() / self._bucket_width)
+        bucket = self._buckets[index % len(self._buckets)]
+        if bucket[0] != index:
+            bucket[:] = [index, 0, 0]
+        return bucket
+
+    def _totals(self):
+        oldest = int(monotonic() / self._bucket_width) - len(self._buckets)
+        successes = failures = 0
+        for index, bucket_successes, bucket_failures in self._buckets:
+            if index > oldest:
+                successes += bucket_successes
+                failures += bucket_failures
+        return successes, failures
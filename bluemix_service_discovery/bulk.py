@@ -0,0 +1,139 @@
+"""
+ Concurrent registration and de-registration of many service instances
+"""
+import inspect
+import threading
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.utils import monotonic
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+DEFAULT_MAX_WORKERS = 8
+
+_iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', lambda function: False)
+
+
+class BulkResult(object):
+    """Outcome of a bulk operation for a single publisher"""
+
+    __slots__ = ('publisher', 'result', 'error')
+
+    def __init__(self, publisher, result=None, error=None):
+        """
+        :param publisher:   ServicePublisher the operation ran for.
+        :param result:      Value returned by the operation.
+        :param error:       Exception raised by the operation, if any.
+        """
+        self.publisher = publisher
+        self.result = result
+        self.error = error
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'BulkResult(publisher=%r, result=%r, error=%r)' % (self.publisher, self.result, self.error)
+
+
+def register_services(publishers, heartbeat=True, parsed=False, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Registers many services concurrently.
+
+    :param publishers:  ServicePublisher objects to register.
+    :param heartbeat:   Indicates whether or not to heartbeat the services.
+    :param parsed:      Return ServiceInstance objects instead of response texts.
+    :param max_workers: Maximum number of registrations in flight.
+    :return:            List of BulkResult, in the order of publishers
+    """
+    return run_concurrently(lambda publisher: publisher.register_service(heartbeat, parsed=parsed),
+                            publishers, max_workers)
+
+
+def deregister_services(publishers, max_workers=DEFAULT_MAX_WORKERS, timeout=None, wait_heartbeat=True):
+    """
+    De-registers many services concurrently. Publishers that are not registered are skipped.
+
+    :param publishers:      ServicePublisher objects to de-register.
+    :param max_workers:     Maximum number of de-registrations in flight.
+    :param timeout:         Optional time (sec) after which de-registrations still pending are abandoned.
+    :param wait_heartbeat:  Wait for the heartbeats already being sent before de-registering.
+    :return:                List of BulkResult, in the order of publishers
+    """
+    def deregister(publisher):
+        if publisher.registered:
+            publisher.deregister_service(wait_heartbeat=wait_heartbeat)
+
+    return run_concurrently(deregister, publishers, max_workers, timeout)
+
+
+def require_synchronous(publisher):
+    """
+    Checks that a publisher registers and de-registers synchronously, as threads run them.
+
+    :param publisher:   Publisher to check.
+    :raises TypeError:  For an AsyncServicePublisher, whose calls would only create coroutines.
+    """
+    if _iscoroutinefunction(getattr(publisher, 'register_service', None)) or \
+            _iscoroutinefunction(getattr(publisher, 'deregister_service', None)):
+        raise TypeError('%r is asynchronous: await its calls, e.g. with asyncio.gather, instead'
+                        % (publisher,))
+
+
+def run_concurrently(operation, publishers, max_workers=DEFAULT_MAX_WORKERS, timeout=None):
+    """
+    Runs an operation for every publisher on a bounded pool of threads.
+
+    :param operation:   Callable taking a publisher.
+    :param publishers:  Publishers to run the operation for.
+    :param max_workers: Maximum number of operations in flight.
+    :param timeout:     Optional time (sec) after which the operations not completed are abandoned and
+                        reported with a DeadlineExceededException. Abandoned operations in flight finish
+                        on daemon threads.
+    :return:            List of BulkResult, in the order of publishers
+    :raises TypeError:  If a publisher is asynchronous.
+    """
+    publishers = list(publishers)
+    for publisher in publishers:
+        require_synchronous(publisher)
+    results = [BulkResult(publisher) for publisher in publishers]
+    completed = [False] * len(results)
+    lock = threading.Lock()
+    deadline = monotonic() + timeout if timeout is not None else None
+    pending = queue.Queue()
+    for index in range(len(results)):
+        pending.put(index)
+
+    def work():
+        while deadline is None or monotonic() < deadline:
+            try:
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            result = results[index]
+            try:
+                value, error = operation(result.publisher), None
+            except Exception as e:
+                value, error = None, e
+            with lock:
+                if not completed[index]:
+                    result.result, result.error = value, error
+                    completed[index] = True
+
+    threads = [threading.Thread(target=work) for _ in range(min(max_workers, len(results)))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(None if deadline is None else max(0, deadline - monotonic()))
+
+    with lock:
+        for index, result in enumerate(results):
+            if not completed[index]:
+                completed[index] = True
+                result.error = exceptions.DeadlineExceededException(
+                    'Operation not completed within %s sec' % timeout)
+
+    return results
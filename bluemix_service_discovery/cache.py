@@ -0,0 +1,165 @@
+"""
+ Client-side cache for service lookups
+"""
+import threading
+from collections import OrderedDict
+from bluemix_service_discovery.utils import monotonic
+
+
+class LookupCache(object):
+    """LRU cache of lookup results with a TTL and stale-while-revalidate"""
+
+    def __init__(self, ttl=30, max_size=128, stale_ttl=None):
+        """
+        Initializes the cache.
+
+        :param ttl:         Time (sec) an entry is served without refreshing it.
+        :param max_size:    Maximum number of filter combinations kept.
+        :param stale_ttl:   Time (sec) past the TTL an entry may still be served while it is
+                            refreshed in the background. None serves stale entries indefinitely,
+                            0 disables stale serving.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def get(self, key, loader):
+        """
+        Returns the cached value for key, calling loader on a miss.
+
+        :param key:     Hashable lookup key.
+        :param loader:  Callable returning a fresh value for key.
+        :return:        Cached or freshly loaded value
+        """
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self.hits += 1
+                    self._touch(key)
+                    return value
+                if self.stale_ttl is None or age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._touch(key)
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        refresher = threading.Thread(target=self._refresh, args=(key, loader))
+                        refresher.daemon = True
+                        refresher.start()
+                    return value
+            self.misses += 1
+
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def get_fresh(self, key):
+        """
+        Returns the cached value for key if it has not expired, counting a hit or a miss.
+
+        :param key: Hashable lookup key.
+        :return:    Cached value, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                self._touch(key)
+                return entry[0]
+            self.misses += 1
+        return None
+
+    def peek(self, key):
+        """
+        Returns the cached value for key regardless of its age, without counting a hit.
+
+        :param key: Hashable lookup key.
+        :return:    Cached value, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key, value, stored_at=None):
+        """
+        Stores a value, evicting the least recently used entries past max_size.
+
+        :param key:         Hashable lookup key.
+        :param value:       Value to store.
+        :param stored_at:   Monotonic time the value was fetched. Defaults to now.
+        """
+        with self._lock:
+            self._entries[key] = (value, monotonic() if stored_at is None else stored_at)
+            self._touch(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+        Drops one entry, or every entry when no key is given.
+
+        :param key: Hashable lookup key.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        :return:    Dict of counter values
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors,
+                'size': len(self._entries)
+            }
+
+    def _touch(self, key):
+        # Move the entry to the most recently used end
+        value = self._entries.pop(key)
+        self._entries[key] = value
+
+    def _refresh(self, key, loader):
+        """
+        Reloads a stale entry in the background.
+
+        :param key:     Hashable lookup key.
+        :param loader:  Callable returning a fresh value for key.
+        """
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self.refresh_errors += 1
+        else:
+            self.put(key, value)
+            with self._lock:
+                self.refreshes += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,248 @@
+"""
+ Shared HTTP connection pooling for Service Discovery clients
+"""
+import threading
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.utils import monotonic
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# (connect, read) timeouts (sec) per operation
+DEFAULT_TIMEOUTS = {
+    'lookup': (3.05, 10),
+    'register': (3.05, 10),
+    'heartbeat': (3.05, 10),
+    'deregister': (3.05, 10)
+}
+
+
+class ConnectionPool(object):
+    """Keep-alive HTTP connection pool shared by locators and publishers"""
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, keep_alive=True):
+        """
+        Initializes the pool. The underlying session is created on first use.
+
+        :param pool_connections:    Number of per-host pools to cache.
+        :param pool_maxsize:        Maximum number of connections kept open per host.
+        :param pool_block:          Whether to block when a host pool has no free connection.
+        :param keep_alive:          Whether connections are reused between requests.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        Returns the pooled session, creating it if needed.
+
+        :return:    requests.Session
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        # Deferred so that importing the client does not load requests and urllib3
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends an HTTP request over a pooled connection.
+
+        :param method:  HTTP method.
+        :param url:     Request URL.
+        :param kwargs:  Additional arguments passed to requests.Session.request.
+        :return:        requests.Response
+        """
+        return self.session.request(method, url, **kwargs)
+
+    def close(self):
+        """
+        Closes all pooled connections.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """
+    Returns the process-wide pool used when no pool is given to a client.
+
+    :return:    ConnectionPool
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = ConnectionPool()
+    return _default_pool
+
+
+def set_default_pool(pool):
+    """
+    Replaces the process-wide pool, e.g. to point clients at a local stand-in.
+
+    :param pool:    Object exposing request(method, url, **kwargs), or None to reset.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        _default_pool = pool
+
+
+def timeouts_for(timeouts=None):
+    """
+    Returns the timeouts per operation, overriding the defaults with the given ones.
+
+    :param timeouts:    Dict of operation to a (connect, read) tuple or a single timeout (sec).
+    :return:            Dict of operation to timeout
+    """
+    merged = dict(DEFAULT_TIMEOUTS)
+    merged.update(timeouts or {})
+    return merged
+
+
+def send(pool, method, url, action, error_message, retry=None, breaker=None, metrics=None, operation=None,
+         deadline=None, **kwargs):
+    """
+    Sends a request to Service Discovery, raising the exception matching an error response.
+
+    :param pool:            Connection pool to send the request with.
+    :param method:          HTTP method.
+    :param url:             Request URL.
+    :param action:          Description of the operation, e.g. 'service lookup'.
+    :param error_message:   Message of the exception raised when the registry cannot be reached.
+    :param retry:           Optional RetryPolicy for transient errors.
+    :param breaker:         Optional CircuitBreaker guarding the registry.
+    :param metrics:         Optional Metrics notified of every attempt.
+    :param operation:       Operation name reported to metrics, e.g. 'lookup'.
+    :param deadline:        Time (sec) within which the call, retries included, must complete. The retry
+                            policy's deadline applies if it is shorter.
+    :param kwargs:          Additional arguments passed to the pool.
+    :return:                Successful response
+    :raises DeadlineExceededException: If the deadline passed before a response was received.
+    """
+    instrumented = metrics is not None and metrics.enabled
+    attempts = [None]
+    policy_deadline = getattr(retry, 'deadline', None)
+    if deadline is None or (policy_deadline is not None and policy_deadline < deadline):
+        deadline = policy_deadline
+    expires_at = monotonic() + deadline if deadline is not None else None
+    expired_message = '%s not completed within %s sec' % (action, deadline)
+
+    def attempt():
+        if instrumented and attempts[0] is not None:
+            metrics.observe_retry(operation, attempts[0])
+        request_kwargs = kwargs
+        if expires_at is not None:
+            remaining = expires_at - monotonic()
+            if remaining <= 0:
+                raise exceptions.DeadlineExceededException(expired_message)
+            request_kwargs = dict(kwargs, timeout=attempt_timeout(kwargs.get('timeout'), remaining))
+        if breaker is not None:
+            breaker.before_request()
+        error = None
+        abandoned = False
+        response = None
+        if instrumented:
+            context = metrics.start_request(operation, method, url)
+            started_at = monotonic()
+        try:
+            try:
+                response = pool.request(method, url, **request_kwargs)
+            except Exception as e:
+                if expires_at is not None and monotonic() >= expires_at:
+                    raise exceptions.DeadlineExceededException(expired_message, internal_details=str(e))
+                raise exceptions.TransportException(error_message, internal_details=str(e))
+
+            # Check for possible errors in response, leaving successful bodies unread for streaming
+            status_code = response.status_code
+            exceptions.check_response(status_code, response.text if status_code >= 400 else None, action)
+            return response
+        except Exception as e:
+            error = attempts[0] = e
+            raise
+        except BaseException as e:
+            # Interrupted, e.g. by KeyboardInterrupt: says nothing about the registry
+            error, abandoned = e, True
+            raise
+        finally:
+            if breaker is not None:
+                if abandoned:
+                    breaker.release()
+                else:
+                    breaker.record(error)
+            if instrumented:
+                streamed = kwargs.get('stream') and error is None
+                metrics.end_request(context, operation, getattr(response, 'status_code', None),
+                                    monotonic() - started_at, body_size(kwargs.get('data')),
+                                    streamed_size(response) if streamed else body_size(response), error)
+
+    if retry is None:
+        return attempt()
+    return retry.call(attempt, deadline)
+
+
+def attempt_timeout(timeout, remaining):
+    """
+    Returns the timeout of a request attempt, shortened to the time left before the call's deadline.
+
+    :param timeout:     (connect, read) tuple, single timeout (sec) or None for no timeout.
+    :param remaining:   Time (sec) left before the deadline.
+    :return:            Timeout of the same form
+    """
+    if isinstance(timeout, tuple):
+        return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+def streamed_size(response):
+    """
+    Returns the announced size (bytes) of a response whose body is still unread, or 0 if unknown.
+    """
+    try:
+        return int(response.headers.get('Content-Length') or 0)
+    except (AttributeError, ValueError):
+        return 0
+
+
+def body_size(body):
+    """
+    Returns the size (bytes) of a request body or of a response's body.
+
+    :param body:    Request body, response, or None.
+    """
+    if body is None:
+        return 0
+    content = getattr(body, 'content', None)
+    if content is None:
+        content = getattr(body, 'text', body)
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    return len(content)
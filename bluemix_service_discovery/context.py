@@ -0,0 +1,167 @@
+"""
+ Registry settings and resources shared by the clients of one Service Discovery instance
+"""
+import threading
+import weakref
+from bluemix_service_discovery.connection import get_default_pool, timeouts_for
+from bluemix_service_discovery.metrics import get_default_metrics
+from bluemix_service_discovery.utils import load_credentials
+
+
+class RegistryContext(object):
+    """Credentials, prebuilt headers, connection pool and heartbeat scheduler of a registry
+
+    Locators and publishers attach to a context instead of each keeping its own copy, so that a
+    process running many of them stores these once and sends requests without rebuilding headers.
+    """
+
+    def __init__(self, url=None, auth_token=None, pool=None, scheduler=None, retry=None, breaker=None,
+                 timeouts=None, metrics=None):
+        """
+        :param url:         Service Discovery API endpoint.
+        :param auth_token:  Authorization token for Service Discovery.
+        :param pool:        Connection pool used for requests. Defaults to the shared pool.
+        :param scheduler:   Optional HeartbeatScheduler sending the heartbeats of attached publishers.
+        :param retry:       Optional RetryPolicy for transient errors.
+        :param breaker:     Optional CircuitBreaker guarding the registry.
+        :param timeouts:    Dict of operation to (connect, read) timeouts (sec), overriding DEFAULT_TIMEOUTS.
+        :param metrics:     Metrics notified of every request. Defaults to the process-wide metrics.
+        """
+        credentials = load_credentials(url, auth_token)
+        self.url = credentials['url']
+        self.token = credentials['auth_token']
+        self.scheduler = scheduler
+        self.retry = retry
+        self.breaker = breaker
+        self.timeouts = timeouts_for(timeouts)
+        self._pool = pool
+        self._metrics = metrics
+
+        # Prebuilt once, never mutated: passed as is to every request
+        self.instances_url = '%s/api/v1/instances' % self.url
+        self.auth_headers = {'Authorization': 'Bearer %s' % self.token}
+        self.json_headers = {'content-type': 'application/json', 'Authorization': 'Bearer %s' % self.token}
+        self.lookup_headers = {'Accept-Encoding': 'gzip', 'Authorization': 'Bearer %s' % self.token}
+
+    @property
+    def pool(self):
+        """
+        Connection pool given to this context, or the current shared pool.
+        """
+        return self._pool if self._pool is not None else get_default_pool()
+
+    @property
+    def metrics(self):
+        """
+        Metrics given to this context, or the current process-wide metrics.
+        """
+        return self._metrics if self._metrics is not None else get_default_metrics()
+
+    def derive(self, pool=None, scheduler=None, retry=None, breaker=None, timeouts=None, metrics=None,
+               url=None, auth_token=None):
+        """
+        Returns a context with the credentials and settings of this one, except those given.
+
+        :return:    This context if nothing is overridden, otherwise a new one
+        """
+        if pool is None and scheduler is None and retry is None and breaker is None and timeouts is None \
+                and metrics is None and url is None and auth_token is None:
+            return self
+        merged = dict(self.timeouts)
+        merged.update(timeouts or {})
+        return RegistryContext(url if url is not None else self.url,
+                               auth_token if auth_token is not None else self.token,
+                               pool=pool if pool is not None else self._pool,
+                               scheduler=scheduler if scheduler is not None else self.scheduler,
+                               retry=retry if retry is not None else self.retry,
+                               breaker=breaker if breaker is not None else self.breaker,
+                               timeouts=merged,
+                               metrics=metrics if metrics is not None else self._metrics)
+
+
+# Contexts in use, dropped with their last client so that their pool and scheduler can be released
+_contexts = weakref.WeakValueDictionary()
+_contexts_lock = threading.Lock()
+
+
+def get_context(url=None, auth_token=None, pool=None, scheduler=None):
+    """
+    Returns the context shared by all clients of a registry using the same pool and scheduler. It is
+    kept while a client refers to it.
+
+    :param url:         Service Discovery API endpoint.
+    :param auth_token:  Authorization token for Service Discovery.
+    :param pool:        Connection pool, or None for the shared pool.
+    :param scheduler:   HeartbeatScheduler, or None for heartbeat threads.
+    :return:            RegistryContext
+    """
+    credentials = load_credentials(url, auth_token)
+    key = (credentials['url'], credentials['auth_token'], pool, scheduler)
+    with _contexts_lock:
+        context = _contexts.get(key)
+        if context is None:
+            context = RegistryContext(credentials['url'], credentials['auth_token'], pool=pool, scheduler=scheduler)
+            _contexts[key] = context
+        return context
+
+
+def resolve_context(context=None, url=None, auth_token=None, pool=None, scheduler=None, retry=None,
+                    breaker=None, timeouts=None, metrics=None):
+    """
+    Returns the context a client attaches to: the given one, possibly with settings overridden, or
+    the shared context of the registry. Clients with their own retry, breaker, timeouts or metrics
+    get a context of their own.
+    """
+    if context is not None:
+        return context.derive(pool, scheduler, retry, breaker, timeouts, metrics)
+    if retry is None and breaker is None and timeouts is None and metrics is None:
+        return get_context(url, auth_token, pool, scheduler)
+    return RegistryContext(url, auth_token, pool, scheduler, retry, breaker, timeouts, metrics)
+
+
+class ContextClient(object):
+    """Base of the clients, exposing the settings of the context they are attached to
+
+    Assigning url or token attaches the client to a context with the new credentials.
+    """
+
+    @property
+    def url(self):
+        return self.context.url
+
+    @url.setter
+    def url(self, url):
+        # Move this client alone to a context for the new endpoint
+        self.context = self.context.derive(url=url)
+
+    @property
+    def token(self):
+        return self.context.token
+
+    @token.setter
+    def token(self, token):
+        self.context = self.context.derive(auth_token=token)
+
+    @property
+    def pool(self):
+        return self.context.pool
+
+    @property
+    def scheduler(self):
+        return self.context.scheduler
+
+    @property
+    def retry(self):
+        return self.context.retry
+
+    @property
+    def breaker(self):
+        return self.context.breaker
+
+    @property
+    def timeouts(self):
+        return self.context.timeouts
+
+    @property
+    def metrics(self):
+        return self.context.metrics
@@ -1,6 +1,7 @@
 """
  Global exception registry
 """
+import json
 
 
 class APIException(Exception):
@@ -98,3 +99,98 @@ class ResourceGoneException(APIException):
     def __init__(self, message, user_details=None, internal_details=None):
         super(ResourceGoneException, self).__init__(
             message, user_details=user_details, internal_details=internal_details)
+
+
+class ServerErrorException(APIException):
+    """
+    Raised when Service Discovery fails to process a request.
+    """
+
+    status_code = 500
+
+    def __init__(self, message, user_details=None, internal_details=None):
+        super(ServerErrorException, self).__init__(
+            message, user_details=user_details, internal_details=internal_details)
+
+
+class TransportException(APIException):
+    """
+    Raised when Service Discovery cannot be reached.
+    """
+
+    status_code = 503
+
+    def __init__(self, message, user_details=None, internal_details=None):
+        super(TransportException, self).__init__(
+            message, user_details=user_details, internal_details=internal_details)
+
+
+class CircuitOpenException(APIException):
+    """
+    Raised without contacting Service Discovery while its circuit breaker is open.
+    """
+
+    status_code = 503
+
+    def __init__(self, message, user_details=None, internal_details=None):
+        super(CircuitOpenException, self).__init__(
+            message, user_details=user_details, internal_details=internal_details)
+
+
+class NoInstanceAvailableException(APIException):
+    """
+    Raised when no healthy instance of a service is available to pick.
+    """
+
+    status_code = 503
+
+    def __init__(self, message, user_details=None, internal_details=None):
+        super(NoInstanceAvailableException, self).__init__(
+            message, user_details=user_details, internal_details=internal_details)
+
+
+class DeadlineExceededException(APIException):
+    """
+    Raised when an operation did not complete before its deadline.
+    """
+
+    status_code = 504
+
+    def __init__(self, message, user_details=None, internal_details=None):
+        super(DeadlineExceededException, self).__init__(
+            message, user_details=user_details, internal_details=internal_details)
+
+
+def _error_details(text):
+    """
+    Extracts the registry error message from a response body, falling back to the raw body.
+    """
+    try:
+        return json.loads(text).get('Error')
+    except (ValueError, AttributeError):
+        return text
+
+
+def check_response(status_code, text, action):
+    """
+    Raises the exception matching an error response from Service Discovery.
+
+    :param status_code: HTTP status code of the response.
+    :param text:        Response body.
+    :param action:      Description of the operation, e.g. 'service lookup'.
+    """
+    if status_code == 400:
+        raise ValidationException('Bad request to service registry',
+                                  internal_details=_error_details(text))
+    elif status_code == 401:
+        raise AuthenticationException('Unauthorized %s: token is not valid' % action,
+                                      internal_details=_error_details(text))
+    elif status_code == 404:
+        raise NotFoundException('Bad Service Discovery URL',
+                                internal_details=text)
+    elif status_code == 410:
+        raise ResourceGoneException('Service instance not found',
+                                    internal_details=_error_details(text))
+    elif status_code >= 500:
+        raise ServerErrorException('Service registry error on %s' % action,
+                                   internal_details=_error_details(text))
@@ -0,0 +1,196 @@
+"""
+ Heartbeat history and interval policies of publishers
+"""
+import math
+import threading
+import time
+from array import array
+
+DEFAULT_CAPACITY = 64
+
+# Shortest time (sec) between two heartbeats
+MIN_INTERVAL = 0.1
+
+TIME_FORMAT = "%m/%d/%Y %H:%M:%S"
+
+
+def format_heartbeat(timestamp):
+    """
+    Formats a heartbeat time the way heartbeat_service and get_last_heartbeat return it.
+
+    :param timestamp:   Epoch time (sec) of the heartbeat.
+    :return:            Datetime string in UTC
+    """
+    return time.strftime(TIME_FORMAT, time.gmtime(timestamp))
+
+
+class HeartbeatHistory(object):
+    """Ring buffer of the latest heartbeat attempts, stored as epoch times and outcomes"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        :param capacity:    Number of heartbeat attempts kept, oldest first out.
+        """
+        self.capacity = capacity
+        self._times = array('d', [0.0]) * capacity
+        self._succeeded = array('b', [0]) * capacity
+        self._next = 0
+        self._count = 0
+        self._last_success = None
+
+    def record(self, timestamp, succeeded=True):
+        """
+        Records a heartbeat attempt.
+
+        :param timestamp:   Epoch time (sec) of the attempt.
+        :param succeeded:   Whether the registry accepted the heartbeat.
+        """
+        self._times[self._next] = timestamp
+        self._succeeded[self._next] = 1 if succeeded else 0
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        if succeeded:
+            self._last_success = timestamp
+
+    @property
+    def last_success(self):
+        """
+        Epoch time (sec) of the last successful heartbeat, or None.
+        """
+        return self._last_success
+
+    def success_rate(self):
+        """
+        Returns the fraction of the kept heartbeat attempts that succeeded, or None without attempts.
+        """
+        if self._count == 0:
+            return None
+        return sum(self._succeeded[i] for i in self._indexes()) / float(self._count)
+
+    def jitter(self):
+        """
+        Returns the standard deviation (sec) of the intervals between the kept successful heartbeats,
+        or None with fewer than three of them.
+        """
+        times = [self._times[i] for i in self._indexes() if self._succeeded[i]]
+        intervals = [later - earlier for earlier, later in zip(times, times[1:])]
+        if len(intervals) < 2:
+            return None
+        mean = sum(intervals) / len(intervals)
+        return math.sqrt(sum((interval - mean) ** 2 for interval in intervals) / len(intervals))
+
+    def clear(self):
+        """
+        Forgets all heartbeat attempts.
+        """
+        self._next = 0
+        self._count = 0
+        self._last_success = None
+
+    def __len__(self):
+        return self._count
+
+    def _indexes(self):
+        """
+        Returns the buffer indexes of the kept attempts, oldest first.
+        """
+        start = (self._next - self._count) % self.capacity
+        return [(start + i) % self.capacity for i in range(self._count)]
+
+
+def failure_delay(failures, interval, min_interval=MIN_INTERVAL):
+    """
+    Returns the delay (sec) before retrying a failed heartbeat: none after the first failure, then
+    doubling up to the regular interval.
+
+    :param failures:        Number of consecutive failed heartbeats.
+    :param interval:        Regular heartbeat interval (sec).
+    :param min_interval:    Delay after the second failure.
+    """
+    if failures <= 1:
+        return 0
+    return min(interval, min_interval * 2 ** (failures - 2))
+
+
+def heartbeat_deadline(ttl, interval, min_interval=MIN_INTERVAL):
+    """
+    Returns the time (sec) within which a heartbeat, retries included, must complete: half the time
+    between the heartbeat and the expiry of the instance, so that a timed-out heartbeat can still be
+    retried at once before the instance expires.
+
+    :param ttl:             Time (sec) in which the instance must heartbeat.
+    :param interval:        Regular heartbeat interval (sec).
+    :param min_interval:    Shortest deadline (sec), for intervals close to the TTL.
+    """
+    return max(min_interval, (ttl - interval) / 2.0)
+
+
+class FixedInterval(object):
+    """Heartbeat at a fixed fraction of the TTL"""
+
+    def __init__(self, fraction=.5, min_interval=MIN_INTERVAL):
+        """
+        :param fraction:        Fraction of the TTL between two heartbeats.
+        :param min_interval:    Shortest interval (sec), for very short TTLs.
+        """
+        self.fraction = fraction
+        self.min_interval = min_interval
+
+    def interval(self, ttl):
+        """
+        Returns the time (sec) between two successful heartbeats of an instance with the given TTL.
+        """
+        return max(self.min_interval, ttl * self.fraction)
+
+    def observe(self, rtt):
+        """
+        Records the round-trip time (sec) of a successful heartbeat.
+        """
+
+
+class AdaptiveInterval(object):
+    """Heartbeat as late as the TTL allows, keeping a safety margin and the heartbeat round-trip time
+
+    The round-trip time is smoothed as TCP does (RFC 6298), and its deviation is counted four times,
+    so that the interval shrinks as soon as the registry slows down, but never below min_fraction of
+    the TTL: a slower registry must not get more heartbeats. Until a round-trip time is measured,
+    heartbeats are sent every half TTL.
+    """
+
+    def __init__(self, margin=.2, min_interval=MIN_INTERVAL, smoothing=.125, min_fraction=.5):
+        """
+        :param margin:          Fraction of the TTL left before expiry, e.g. to retry a failed heartbeat.
+        :param min_interval:    Shortest interval (sec).
+        :param smoothing:       Weight of a new round-trip time sample in its moving average.
+        :param min_fraction:    Fraction of the TTL the interval never falls below, as FixedInterval's.
+        """
+        self.margin = margin
+        self.min_interval = min_interval
+        self.smoothing = smoothing
+        self.min_fraction = min_fraction
+
+        self.rtt = None
+        self.rtt_deviation = None
+        self._lock = threading.Lock()
+
+    def observe(self, rtt):
+        """
+        Records the round-trip time (sec) of a successful heartbeat.
+        """
+        with self._lock:
+            if self.rtt is None:
+                self.rtt = rtt
+                self.rtt_deviation = rtt / 2.0
+            else:
+                self.rtt_deviation += 2 * self.smoothing * (abs(self.rtt - rtt) - self.rtt_deviation)
+                self.rtt += self.smoothing * (rtt - self.rtt)
+
+    def interval(self, ttl):
+        """
+        Returns the time (sec) between two successful heartbeats of an instance with the given TTL.
+        """
+        with self._lock:
+            if self.rtt is None:
+                return max(self.min_interval, ttl * .5)
+            return max(self.min_interval, ttl * self.min_fraction,
+                       ttl * (1 - self.margin) - (self.rtt + 4 * self.rtt_deviation))
@@ -0,0 +1,108 @@
+"""
+ Inverted index of service instances by tag and status, for routing without a registry round trip
+"""
+from bluemix_service_discovery.utils import string_types
+
+# Number of distinct queries whose results an index keeps
+DEFAULT_MAX_QUERIES = 1024
+
+
+def _values(value):
+    """
+    Returns a tag or status filter as a frozenset, or None for no filter.
+
+    :param value:   None, a comma separated string, or a list of values.
+    """
+    if value is None:
+        return None
+    if isinstance(value, string_types):
+        value = value.split(',')
+    values = frozenset(part for part in value if part)
+    return values if values else None
+
+
+class TagIndex(object):
+    """Map every tag and status to the positions of the instances that have it
+
+    Queries intersect the position sets of their tags, smallest first, and their results are kept, so
+    a repeated routing decision costs a dict lookup. An index never changes: a new lookup response
+    gets a new index.
+    """
+
+    def __init__(self, instances, max_queries=DEFAULT_MAX_QUERIES):
+        """
+        :param instances:   ServiceInstance objects to index.
+        :param max_queries: Number of distinct queries whose results are kept.
+        """
+        self.instances = tuple(instances)
+        self.max_queries = max_queries
+
+        by_tag = {}
+        by_status = {}
+        for position, instance in enumerate(self.instances):
+            for tag in instance.tags:
+                by_tag.setdefault(tag, set()).add(position)
+            by_status.setdefault(instance.status, set()).add(position)
+        self._by_tag = dict((tag, frozenset(positions)) for tag, positions in by_tag.items())
+        self._by_status = dict((status, frozenset(positions)) for status, positions in by_status.items())
+        self._queries = {}
+
+    def select(self, tags=None, status=None):
+        """
+        Returns the instances having all the given tags and one of the given statuses.
+
+        :param tags:    Comma separated list, or list, of tags the instances must have.
+        :param status:  State, or list of states, of the instances. None matches any.
+        :return:        Tuple of ServiceInstance, in the order of the lookup response
+        """
+        key = (_values(tags), _values(status))
+        result = self._queries.get(key)
+        if result is None:
+            result = self._select(*key)
+            if len(self._queries) < self.max_queries:
+                self._queries[key] = result
+        return result
+
+    def prefer(self, preferences, tags=None, status=None):
+        """
+        Returns the instances matching the first preference that any instance matches, e.g. those of
+        the same zone, else those of the same region, else any with [['zone=a'], ['region=x'], None].
+
+        :param preferences: Tags, or list of tags, instances must have in addition to tags, in order of
+                            preference. None or an empty list matches any instance.
+        :param tags:        Comma separated list, or list, of tags all instances must have.
+        :param status:      State, or list of states, of the instances. None matches any.
+        :return:            Tuple of ServiceInstance, empty if no preference is matched
+        """
+        required = _values(tags) or frozenset()
+        for preference in preferences:
+            instances = self.select(required | (_values(preference) or frozenset()), status)
+            if instances:
+                return instances
+        return ()
+
+    def count(self, tag):
+        """
+        Returns the number of instances having a tag.
+        """
+        return len(self._by_tag.get(tag, ()))
+
+    def __len__(self):
+        return len(self.instances)
+
+    def _select(self, tags, statuses):
+        candidates = []
+        if tags:
+            candidates.extend(self._by_tag.get(tag, frozenset()) for tag in tags)
+        if statuses:
+            candidates.append(frozenset().union(*[self._by_status.get(status, ()) for status in statuses]))
+        if not candidates:
+            return self.instances
+
+        candidates.sort(key=len)
+        positions = candidates[0]
+        for other in candidates[1:]:
+            if not positions:
+                break
+            positions = positions & other
+        return tuple(self.instances[position] for position in sorted(positions))
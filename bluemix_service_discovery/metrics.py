@@ -0,0 +1,216 @@
+"""
+ Metrics and tracing hooks for Service Discovery calls
+"""
+import bisect
+import threading
+
+# Upper bounds (sec) of the latency histogram buckets
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+PREFIX = 'service_discovery_client_'
+
+
+class Metrics(object):
+    """Instrumentation hooks called on every registry request. This base class records nothing.
+
+    Subclasses set enabled to True and override the hooks they need. start_request may return a
+    context, e.g. a tracing span, which is passed back to end_request.
+    """
+
+    enabled = False
+
+    def start_request(self, operation, method, url):
+        """
+        Called before each attempt of a request.
+
+        :param operation:   Operation name, e.g. 'lookup' or 'heartbeat'.
+        :param method:      HTTP method.
+        :param url:         Request URL.
+        :return:            Context passed to end_request
+        """
+        return None
+
+    def end_request(self, context, operation, status_code, latency, bytes_sent, bytes_received, error):
+        """
+        Called after each attempt of a request.
+
+        :param context:         Value returned by start_request.
+        :param operation:       Operation name.
+        :param status_code:     HTTP status code, or None if the registry could not be reached.
+        :param latency:         Duration (sec) of the attempt.
+        :param bytes_sent:      Size of the request body.
+        :param bytes_received:  Size of the response body.
+        :param error:           Exception raised by the attempt, or None.
+        """
+
+    def observe_retry(self, operation, error):
+        """
+        Called before an attempt retrying a failed one.
+
+        :param operation:   Operation name.
+        :param error:       Exception raised by the failed attempt.
+        """
+
+    def observe_heartbeat_lag(self, lag):
+        """
+        Called when a scheduled heartbeat starts.
+
+        :param lag: Delay (sec) between the scheduled and the actual start of the heartbeat.
+        """
+
+
+NO_METRICS = Metrics()
+
+_default_metrics = NO_METRICS
+
+
+def get_default_metrics():
+    """
+    Returns the process-wide metrics used when no metrics are given to a client.
+
+    :return:    Metrics
+    """
+    return _default_metrics
+
+
+def set_default_metrics(metrics):
+    """
+    Replaces the process-wide metrics, e.g. with a PrometheusCollector.
+
+    :param metrics: Metrics instance, or None to reset to the no-op default.
+    """
+    global _default_metrics
+    _default_metrics = metrics if metrics is not None else NO_METRICS
+
+
+class _Histogram(object):
+    """Cumulative bucket counts, sum and count of observations"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield name + '_bucket', dict(labels, le=_format(bound)), cumulative
+        yield name + '_bucket', dict(labels, le='+Inf'), self.count
+        yield name + '_sum', labels, self.sum
+        yield name + '_count', labels, self.count
+
+
+class PrometheusCollector(Metrics):
+    """In-memory collector rendering its metrics in the Prometheus text exposition format"""
+
+    enabled = True
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, lag_buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets:     Upper bounds (sec) of the request latency histogram buckets.
+        :param lag_buckets: Upper bounds (sec) of the heartbeat lag histogram buckets.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._latency = {}
+        self._requests = {}
+        self._retries = {}
+        self._bytes_sent = {}
+        self._bytes_received = {}
+        self._heartbeat_lag = _Histogram(tuple(sorted(lag_buckets)))
+        self._lock = threading.Lock()
+
+    def end_request(self, context, operation, status_code, latency, bytes_sent, bytes_received, error):
+        status = str(status_code) if status_code is not None else 'error'
+        with self._lock:
+            histogram = self._latency.get(operation)
+            if histogram is None:
+                histogram = self._latency[operation] = _Histogram(self.buckets)
+            histogram.observe(latency)
+            self._requests[(operation, status)] = self._requests.get((operation, status), 0) + 1
+            self._bytes_sent[operation] = self._bytes_sent.get(operation, 0) + bytes_sent
+            self._bytes_received[operation] = self._bytes_received.get(operation, 0) + bytes_received
+
+    def observe_retry(self, operation, error):
+        with self._lock:
+            self._retries[operation] = self._retries.get(operation, 0) + 1
+
+    def observe_heartbeat_lag(self, lag):
+        with self._lock:
+            self._heartbeat_lag.observe(max(0.0, lag))
+
+    def collect(self):
+        """
+        Returns the current samples.
+
+        :return:    List of (metric family, type, help, list of (sample name, labels, value))
+        """
+        with self._lock:
+            latency = [sample for operation, histogram in sorted(self._latency.items())
+                       for sample in histogram.samples(PREFIX + 'request_duration_seconds',
+                                                       {'operation': operation})]
+            requests = [(PREFIX + 'requests_total', {'operation': operation, 'status': status}, value)
+                        for (operation, status), value in sorted(self._requests.items())]
+            retries = [(PREFIX + 'retries_total', {'operation': operation}, value)
+                       for operation, value in sorted(self._retries.items())]
+            sent = [(PREFIX + 'sent_bytes_total', {'operation': operation}, value)
+                    for operation, value in sorted(self._bytes_sent.items())]
+            received = [(PREFIX + 'received_bytes_total', {'operation': operation}, value)
+                        for operation, value in sorted(self._bytes_received.items())]
+            lag = list(self._heartbeat_lag.samples(PREFIX + 'heartbeat_lag_seconds', {}))
+
+        return [
+            (PREFIX + 'request_duration_seconds', 'histogram', 'Duration of registry requests.', latency),
+            (PREFIX + 'requests_total', 'counter', 'Registry requests by operation and status code.', requests),
+            (PREFIX + 'retries_total', 'counter', 'Retried registry requests.', retries),
+            (PREFIX + 'sent_bytes_total', 'counter', 'Request body bytes sent to the registry.', sent),
+            (PREFIX + 'received_bytes_total', 'counter', 'Response body bytes received from the registry.',
+             received),
+            (PREFIX + 'heartbeat_lag_seconds', 'histogram', 'Delay between scheduled and actual heartbeats.', lag)
+        ]
+
+    def get(self, name, **labels):
+        """
+        Returns the value of a sample, e.g. get('service_discovery_client_retries_total', operation='lookup').
+
+        :return:    Sample value, or None if it was never recorded
+        """
+        for _, _, _, samples in self.collect():
+            for sample_name, sample_labels, value in samples:
+                if sample_name == name and sample_labels == labels:
+                    return value
+        return None
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for family, metric_type, description, samples in self.collect():
+            lines.append('# HELP %s %s' % (family, description))
+            lines.append('# TYPE %s %s' % (family, metric_type))
+            for name, labels, value in samples:
+                if labels:
+                    label_text = ','.join('%s="%s"' % (key, _escape(labels[key])) for key in sorted(labels))
+                    lines.append('%s{%s} %s' % (name, label_text, _format(value)))
+                else:
+                    lines.append('%s %s' % (name, _format(value)))
+        return '\n'.join(lines) + '\n'
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
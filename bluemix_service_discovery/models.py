@@ -0,0 +1,139 @@
+"""
+ Parsed Service Discovery resources
+"""
+import json
+from bluemix_service_discovery.index import TagIndex
+
+
+class ServiceInstance(object):
+    """Compact, parsed view of a registered service instance"""
+
+    __slots__ = ('id', 'service_name', 'endpoint', 'protocol', 'tags', 'status', 'ttl', 'last_heartbeat')
+
+    def __init__(self, id=None, service_name=None, endpoint=None, protocol=None, tags=(), status=None,
+                 ttl=None, last_heartbeat=None):
+        """
+        Initializes the instance with all its parameters.
+
+        :param id:              Instance ID assigned by Service Discovery.
+        :param service_name:    Name of the service.
+        :param endpoint:        Endpoint value of the instance.
+        :param protocol:        Endpoint type, e.g. 'http'.
+        :param tags:            Tags associated with the instance.
+        :param status:          Status of the instance.
+        :param ttl:             Time (sec) in which the instance must heartbeat.
+        :param last_heartbeat:  Timestamp of the last heartbeat, as returned by the registry.
+        """
+        self.id = id
+        self.service_name = service_name
+        self.endpoint = endpoint
+        self.protocol = protocol
+        self.tags = tuple(tags) if tags else ()
+        self.status = status
+        self.ttl = ttl
+        self.last_heartbeat = last_heartbeat
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds an instance from a decoded registry object.
+
+        :param data:    Dict as returned by the Service Discovery API.
+        :return:        ServiceInstance
+        """
+        endpoint = data.get('endpoint') or {}
+        return cls(data.get('id'), data.get('service_name'), endpoint.get('value'), endpoint.get('type'),
+                   data.get('tags'), data.get('status'), data.get('ttl'), data.get('last_heartbeat'))
+
+    def to_dict(self):
+        """
+        Converts this instance back to the registry representation.
+
+        :return:    Dict
+        """
+        return {
+            'id': self.id,
+            'service_name': self.service_name,
+            'endpoint': {
+                'value': self.endpoint,
+                'type': self.protocol
+            },
+            'tags': list(self.tags),
+            'status': self.status,
+            'ttl': self.ttl,
+            'last_heartbeat': self.last_heartbeat
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, ServiceInstance):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'ServiceInstance(id=%r, service_name=%r, endpoint=%r, status=%r)' % (
+            self.id, self.service_name, self.endpoint, self.status)
+
+
+class Catalog(object):
+    """A lookup response whose instances are parsed at most once"""
+
+    __slots__ = ('text', 'etag', 'last_modified', '_instances', '_index')
+
+    def __init__(self, text, etag=None, last_modified=None):
+        """
+        Initializes the catalog from a raw response body.
+
+        :param text:            JSON body returned by /api/v1/instances.
+        :param etag:            ETag header of the response, if any.
+        :param last_modified:   Last-Modified header of the response, if any.
+        """
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self._instances = None
+        self._index = None
+
+    @property
+    def validated(self):
+        """
+        Whether the response can be revalidated with a conditional request.
+        """
+        return self.etag is not None or self.last_modified is not None
+
+    @property
+    def instances(self):
+        """
+        Returns the parsed instances. The tuple is shared, so callers must not rely on copying it.
+
+        :return:    Tuple of ServiceInstance
+        """
+        if self._instances is None:
+            self._instances = parse_instances(self.text)
+        return self._instances
+
+    @property
+    def index(self):
+        """
+        Returns the TagIndex of the instances, built at most once.
+
+        :return:    TagIndex
+        """
+        if self._index is None:
+            self._index = TagIndex(self.instances)
+        return self._index
+
+
+def parse_instances(text):
+    """
+    Parses a lookup response body into service instances
+
+    :param text:    JSON body returned by /api/v1/instances.
+    :return:        Tuple of ServiceInstance
+    """
+    return tuple(ServiceInstance.from_dict(data) for data in json.loads(text).get('instances') or ())
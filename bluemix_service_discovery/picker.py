@@ -0,0 +1,233 @@
+"""
+ Client-side load balancing over located service instances
+"""
+import itertools
+import logging
+import random
+import threading
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.utils import monotonic
+
+logger = logging.getLogger(__name__)
+
+
+def tag_weight(instance):
+    """
+    Returns the weight of an instance from a 'weight=N' or 'weight:N' tag, defaulting to 1.
+
+    :param instance:    ServiceInstance
+    :return:            Weight
+    """
+    for tag in instance.tags:
+        if tag.startswith('weight=') or tag.startswith('weight:'):
+            try:
+                return max(float(tag[7:]), 0)
+            except ValueError:
+                pass
+    return 1
+
+
+class RoundRobinStrategy(object):
+    """Cycle through the instances in order"""
+
+    def __init__(self, instances, weight=None):
+        self.instances = instances
+        self._counter = itertools.count()
+
+    def pick(self):
+        return self.instances[next(self._counter) % len(self.instances)]
+
+
+class RandomStrategy(object):
+    """Pick an instance uniformly at random"""
+
+    def __init__(self, instances, weight=None):
+        self.instances = instances
+
+    def pick(self):
+        return self.instances[int(random.random() * len(self.instances))]
+
+
+class WeightedStrategy(object):
+    """Pick an instance at random, proportionally to its weight, using an alias table"""
+
+    def __init__(self, instances, weight=None):
+        self.instances = instances
+        weights = [(weight or tag_weight)(instance) for instance in instances]
+        self._probabilities, self._aliases = self._build_alias_table(weights)
+
+    @staticmethod
+    def _build_alias_table(weights):
+        """
+        Builds Vose's alias table so that each pick is O(1).
+        """
+        count = len(weights)
+        total = float(sum(weights))
+        if total <= 0:
+            return [1.0] * count, list(range(count))
+
+        scaled = [w * count / total for w in weights]
+        probabilities = [1.0] * count
+        aliases = list(range(count))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probabilities[less] = scaled[less]
+            aliases[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        return probabilities, aliases
+
+    def pick(self):
+        column = int(random.random() * len(self.instances))
+        if random.random() < self._probabilities[column]:
+            return self.instances[column]
+        return self.instances[self._aliases[column]]
+
+
+class PowerOfTwoStrategy(object):
+    """Pick the less loaded of two random instances, by outstanding picks not yet released"""
+
+    def __init__(self, instances, weight=None):
+        self.instances = instances
+        self._positions = dict((id(instance), i) for i, instance in enumerate(instances))
+        self._outstanding = [0] * len(instances)
+        self._lock = threading.Lock()
+
+    def pick(self):
+        count = len(self.instances)
+        first = int(random.random() * count)
+        second = int(random.random() * count)
+        with self._lock:
+            chosen = first if self._outstanding[first] <= self._outstanding[second] else second
+            self._outstanding[chosen] += 1
+        return self.instances[chosen]
+
+    def release(self, instance):
+        position = self._positions.get(id(instance))
+        if position is not None and self.instances[position] is instance:
+            with self._lock:
+                self._outstanding[position] = max(self._outstanding[position] - 1, 0)
+
+
+STRATEGIES = {
+    'round_robin': RoundRobinStrategy,
+    'random': RandomStrategy,
+    'weighted': WeightedStrategy,
+    'power_of_two': PowerOfTwoStrategy
+}
+
+
+class EndpointPicker(object):
+    """Pick healthy service instances from a pre-indexed view per service name"""
+
+    def __init__(self, locator, strategy='round_robin', weight=None, refresh_interval=30, status='UP',
+                 retry_interval=5):
+        """
+        Initializes the picker.
+
+        :param locator:             ServiceLocator used to fetch instances.
+        :param strategy:            One of 'round_robin', 'random', 'weighted' or 'power_of_two'.
+        :param weight:              Callable returning the weight of an instance for the 'weighted'
+                                    strategy. Defaults to the 'weight=N' tag.
+        :param refresh_interval:    Time (sec) after which a service's instances are fetched again, in the
+                                    background while the previous ones are picked. None only refreshes on
+                                    demand.
+        :param status:              Status of instances considered healthy.
+        :param retry_interval:      Time (sec) before a failed background refresh is retried. The previous
+                                    instances are picked meanwhile.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError('Unknown strategy %r, expected one of %s' % (strategy, ', '.join(sorted(STRATEGIES))))
+        self.locator = locator
+        self.strategy = strategy
+        self.weight = weight
+        self.refresh_interval = refresh_interval
+        self.status = status
+        self.retry_interval = retry_interval
+
+        # service_name -> (strategy, refreshed_at)
+        self._views = {}
+        # service_name -> monotonic time before which a failed refresh is not retried
+        self._retry_at = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def pick(self, service_name):
+        """
+        Returns a healthy instance of the service. Only the first pick of a service waits for its
+        instances to be fetched.
+
+        :param service_name:    Name of the service.
+        :return:                ServiceInstance
+        """
+        view = self._views.get(service_name)
+        if view is None:
+            view = self.refresh(service_name)
+        elif self.refresh_interval is not None and monotonic() - view[1] >= self.refresh_interval:
+            self._refresh_in_background(service_name)
+        if view[0] is None:
+            raise exceptions.NoInstanceAvailableException('No healthy instance of %s is available' % service_name)
+        return view[0].pick()
+
+    def release(self, service_name, instance):
+        """
+        Reports that a request to a picked instance completed. Required by the 'power_of_two' strategy.
+
+        :param service_name:    Name of the service.
+        :param instance:        ServiceInstance returned by pick().
+        """
+        view = self._views.get(service_name)
+        if view is not None and hasattr(view[0], 'release'):
+            view[0].release(instance)
+
+    def refresh(self, service_name):
+        """
+        Fetches the instances of a service and rebuilds its view.
+
+        :param service_name:    Name of the service.
+        :return:                (strategy, refreshed_at) view
+        """
+        instances = self.locator.get_services(service_name=service_name, status=self.status, parsed=True)
+        return self.update(service_name, instances)
+
+    def _refresh_in_background(self, service_name):
+        """
+        Starts refreshing a service in a background thread, unless it is already being refreshed or its
+        last refresh failed less than retry_interval ago.
+        """
+        with self._lock:
+            if service_name in self._refreshing or monotonic() < self._retry_at.get(service_name, 0):
+                return
+            self._refreshing.add(service_name)
+        thread = threading.Thread(target=self._background_refresh, args=(service_name,),
+                                  name='picker-refresh-%s' % service_name)
+        thread.daemon = True
+        thread.start()
+
+    def _background_refresh(self, service_name):
+        try:
+            self.refresh(service_name)
+        except Exception:
+            # Keep picking the previous instances: the registry may be unavailable for a while
+            logger.exception('Error refreshing instances of %s', service_name)
+            self._retry_at[service_name] = monotonic() + self.retry_interval
+        finally:
+            with self._lock:
+                self._refreshing.discard(service_name)
+
+    def update(self, service_name, instances):
+        """
+        Replaces the view of a service with the given instances.
+
+        :param service_name:    Name of the service.
+        :param instances:       ServiceInstance objects of the service.
+        :return:                (strategy, refreshed_at) view
+        """
+        instances = tuple(instance for instance in instances
+                          if self.status is None or instance.status == self.status)
+        strategy = STRATEGIES[self.strategy](instances, self.weight) if instances else None
+        view = (strategy, monotonic())
+        self._views[service_name] = view
+        return view
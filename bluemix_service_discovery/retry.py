@@ -0,0 +1,120 @@
+"""
+ Retry policy for Service Discovery calls
+"""
+import random
+import threading
+import time
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.utils import monotonic
+
+# Errors worth retrying: the registry could not be reached or failed on its side
+RETRYABLE_EXCEPTIONS = (exceptions.TransportException, exceptions.ServerErrorException)
+
+
+class RetryBudget(object):
+    """Token bucket capping retries to a fraction of requests, shared across calls"""
+
+    def __init__(self, ratio=0.2, max_tokens=10):
+        """
+        :param ratio:       Tokens earned per request. Each retry costs one token.
+        :param max_tokens:  Maximum number of tokens, i.e. of retries allowed in a burst.
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        """
+        Earns tokens for a first attempt.
+        """
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def acquire(self):
+        """
+        Spends a token for a retry.
+
+        :return:    Whether the retry is allowed
+        """
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class RetryPolicy(object):
+    """Retry transient errors with exponential backoff, full jitter and a deadline"""
+
+    def __init__(self, max_attempts=3, backoff=0.1, max_backoff=5, deadline=None, budget=None):
+        """
+        :param max_attempts:    Maximum number of attempts per call, including the first.
+        :param backoff:         Base delay (sec) before the first retry, doubled on every retry.
+        :param max_backoff:     Maximum delay (sec) before a retry.
+        :param deadline:        Time (sec) within which a call, retries included, must complete. Each attempt's
+                                timeout is shortened to the time left, and no retry starts past it.
+        :param budget:          Optional RetryBudget shared by the calls using this policy.
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.budget = budget
+
+    def is_retryable(self, error):
+        """
+        Returns whether an error is transient. Rejected requests, e.g. 400 or 401, are never retried.
+        """
+        return isinstance(error, RETRYABLE_EXCEPTIONS)
+
+    def backoff_delay(self, attempt):
+        """
+        Returns the delay (sec) before the given retry, drawn uniformly up to the exponential backoff.
+
+        :param attempt: Number of attempts already made.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def next_delay(self, error, attempt, started_at, deadline=None):
+        """
+        Decides whether to retry after a failed attempt.
+
+        :param error:       Exception raised by the attempt.
+        :param attempt:     Number of attempts already made.
+        :param started_at:  Monotonic time the call started.
+        :param deadline:    Deadline (sec) of the call, overriding the policy's.
+        :return:            Delay (sec) before retrying, or None to give up
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(error):
+            return None
+        delay = self.backoff_delay(attempt)
+        if deadline is None:
+            deadline = self.deadline
+        if deadline is not None and monotonic() + delay - started_at >= deadline:
+            return None
+        if self.budget is not None and not self.budget.acquire():
+            return None
+        return delay
+
+    def call(self, operation, deadline=None):
+        """
+        Calls operation, retrying it on transient errors.
+
+        :param operation:   Callable making one attempt.
+        :param deadline:    Deadline (sec) of the call, overriding the policy's.
+        :return:            Value returned by the first successful attempt
+        """
+        if self.budget is not None:
+            self.budget.record_request()
+        started_at = monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return operation()
+            except Exception as e:
+                delay = self.next_delay(e, attempt, started_at, deadline)
+                if delay is None:
+                    raise
+            time.sleep(delay)
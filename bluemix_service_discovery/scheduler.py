@@ -0,0 +1,195 @@
+"""
+ Shared heartbeat scheduling for many publishers
+"""
+import heapq
+import itertools
+import logging
+import math
+import random
+import threading
+from bluemix_service_discovery.heartbeat import MIN_INTERVAL
+from bluemix_service_discovery.utils import monotonic
+
+logger = logging.getLogger(__name__)
+
+# Heartbeats per second a worker is sized for: heartbeats are blocking requests, so a worker sends at
+# most 1 / round-trip time of them, i.e. 20 per second at 50 ms
+BEATS_PER_WORKER = 20
+
+# Workers started at least when sized by rate, so that one slow heartbeat does not hold back the others
+MIN_WORKERS = 2
+
+# Workers started at most when sized by rate
+MAX_WORKERS = 32
+
+
+class HeartbeatScheduler(object):
+    """Heartbeat many publishers from a small pool of worker threads
+
+    A worker sends one heartbeat at a time, so it sustains at most 1 / round-trip time heartbeats per
+    second, e.g. 20 at 50 ms: 500 publishers with a TTL of 30 sec beat 33 times per second. By default
+    the pool grows with the heartbeat rate of the added publishers, one worker per BEATS_PER_WORKER.
+    Each heartbeat is bounded by a deadline within the TTL margin, see heartbeat_deadline.
+    """
+
+    def __init__(self, workers=None, jitter=0.1, beats_per_worker=BEATS_PER_WORKER, max_workers=MAX_WORKERS):
+        """
+        Initializes the scheduler. Workers are started when the first publisher is added.
+
+        :param workers:             Fixed number of threads sending heartbeats. Defaults to sizing the pool
+                                    by the heartbeat rate, between MIN_WORKERS and max_workers.
+        :param jitter:              Fraction of the interval by which each beat is randomly moved, so that
+                                    publishers added together do not beat together.
+        :param beats_per_worker:    Heartbeats per second each worker is sized for, when workers is None.
+        :param max_workers:         Maximum number of threads, when workers is None.
+        """
+        self.workers = workers
+        self.jitter = jitter
+        self.beats_per_worker = beats_per_worker
+        self.max_workers = max_workers
+
+        # Heap of [due, sequence, publisher, interval] entries ordered by due time
+        self._heap = []
+        self._entries = {}
+        self._in_flight = set()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = False
+        # Heartbeats per second of the scheduled publishers
+        self._rate = 0.0
+
+    def add(self, publisher, interval):
+        """
+        Starts heartbeating a registered publisher.
+
+        :param publisher:   ServicePublisher to heartbeat.
+        :param interval:    Time lapse (sec) until the first heartbeat. The following ones are sized by
+                            the publisher's interval policy.
+        """
+        with self._condition:
+            self._push(publisher, monotonic() + self._jittered(interval), interval)
+            self._running = True
+            self._start_workers(self._target_workers() - len(self._threads))
+            self._condition.notify()
+
+    def remove(self, publisher, wait=True):
+        """
+        Stops heartbeating a publisher. Other publishers are not affected.
+
+        :param publisher:   ServicePublisher to stop heartbeating.
+        :param wait:        Wait for a heartbeat of this publisher that is already being sent.
+        """
+        with self._condition:
+            entry = self._entries.pop(publisher, None)
+            if entry is not None:
+                self._rate -= self._beat_rate(entry[3])
+            while wait and publisher in self._in_flight:
+                self._condition.wait()
+
+    def stop(self):
+        """
+        Stops all workers. Scheduled publishers are dropped.
+        """
+        with self._condition:
+            self._running = False
+            self._heap = []
+            self._entries.clear()
+            self._rate = 0.0
+            self._condition.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._threads = []
+
+    def __contains__(self, publisher):
+        return publisher in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _jittered(self, interval):
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    @staticmethod
+    def _beat_rate(interval):
+        return 1.0 / max(interval, MIN_INTERVAL)
+
+    def _push(self, publisher, due, interval):
+        previous = self._entries.get(publisher)
+        if previous is not None:
+            self._rate -= self._beat_rate(previous[3])
+        entry = [due, next(self._sequence), publisher, interval]
+        self._entries[publisher] = entry
+        self._rate += self._beat_rate(interval)
+        heapq.heappush(self._heap, entry)
+
+    def _target_workers(self):
+        """
+        Returns the number of workers needed for the current heartbeat rate.
+        """
+        if self.workers is not None:
+            return self.workers
+        needed = int(math.ceil(self._rate / self.beats_per_worker))
+        return min(self.max_workers, max(MIN_WORKERS, needed))
+
+    def _start_workers(self, count):
+        for _ in range(count):
+            thread = threading.Thread(target=self._work, name='heartbeat-scheduler-%d' % len(self._threads))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_due(self):
+        """
+        Waits for and pops the next due entry, or returns None once stopped.
+        """
+        with self._condition:
+            while self._running:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                entry = self._heap[0]
+                if self._entries.get(entry[2]) is not entry:
+                    # Publisher was removed or rescheduled
+                    heapq.heappop(self._heap)
+                    continue
+                delay = entry[0] - monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                self._in_flight.add(entry[2])
+                return entry
+        return None
+
+    def _work(self):
+        """
+        Sends heartbeats as they fall due.
+        """
+        while True:
+            entry = self._next_due()
+            if entry is None:
+                return
+            due, _, publisher, _ = entry
+
+            started_at = monotonic()
+            metrics = getattr(publisher, 'metrics', None)
+            if metrics is not None and metrics.enabled:
+                metrics.observe_heartbeat_lag(started_at - due)
+            try:
+                publisher._beat()
+                succeeded = True
+            except Exception:
+                if getattr(publisher, 'beating', True):
+                    logger.exception('Error heartbeating service %s', getattr(publisher, 'id', None))
+                succeeded = False
+
+            with self._condition:
+                self._in_flight.discard(publisher)
+                if self._entries.get(publisher) is entry:
+                    # Schedule from the previous due time so beats do not drift; retry failures at once
+                    interval = publisher._heartbeat_delay(succeeded)
+                    delay = self._jittered(interval) if succeeded else interval
+                    self._push(publisher, max(due + delay, monotonic()), interval)
+                self._condition.notify_all()
@@ -1,58 +1,224 @@
-import json
-from requests import request
-from bluemix_service_discovery.utils import load_credentials, add_query_string
+import threading
+from collections import OrderedDict
+from bluemix_service_discovery.utils import build_query, lookup_key, monotonic
+from bluemix_service_discovery.cache import LookupCache
+from bluemix_service_discovery.connection import send
+from bluemix_service_discovery.context import ContextClient, resolve_context
+from bluemix_service_discovery.models import Catalog, ServiceInstance
+from bluemix_service_discovery.streaming import iter_instances
+from bluemix_service_discovery.single_flight import SingleFlight
 from bluemix_service_discovery import exceptions
 
+# Number of lookups whose last response is kept for conditional requests
+VALIDATED_MAX_ENTRIES = 128
 
-class ServiceLocator:
+# Errors after which an older cached result is served, if there is one
+UNAVAILABLE_EXCEPTIONS = (exceptions.CircuitOpenException, exceptions.TransportException,
+                          exceptions.ServerErrorException, exceptions.DeadlineExceededException)
+
+
+class ServiceLocator(ContextClient):
     """Search for service instances"""
 
-    def __init__(self, url=None, auth_token=None):
+    def __init__(self, url=None, auth_token=None, pool=None, cache=None, retry=None,
+                 breaker=None, timeouts=None, snapshot=None, shared=None, metrics=None, context=None):
         """
         Initializes the service instance with all its parameters.
 
         :param url:         Service Discovery API endpoint.
         :param auth_token:  Authorization token for Service Discovery.
+        :param pool:        Connection pool used for requests. Defaults to the shared pool.
+        :param cache:       Optional LookupCache for lookup results. While the registry is unavailable,
+                            cached results are served regardless of their age.
+        :param retry:       Optional RetryPolicy for transient errors.
+        :param breaker:     Optional CircuitBreaker, which may be shared with publishers.
+        :param timeouts:    Dict of operation ('lookup') to (connect, read) timeouts (sec), overriding
+                            DEFAULT_TIMEOUTS.
+        :param snapshot:    Optional CatalogSnapshot persisting lookup results. Its results are loaded
+                            into the cache as expired entries, served while they are refreshed.
+        :param shared:      Optional SharedCatalog through which the processes of a host share the
+                            results of its watched queries, refreshed by a single process.
+        :param metrics:     Metrics notified of every request. Defaults to the process-wide metrics.
+        :param context:     Optional RegistryContext to attach to, providing the credentials and any setting
+                            not given here. Defaults to the context shared by the clients of the registry.
         """
 
-        # Get credentials
-        credentials = load_credentials(url, auth_token)
-        self.url = credentials['url']
-        self.token = credentials['auth_token']
+        # Attach to the registry's credentials and settings
+        self.context = resolve_context(context, url, auth_token, pool=pool, retry=retry, breaker=breaker,
+                                       timeouts=timeouts, metrics=metrics)
+        self.cache = cache
+        self.snapshot = snapshot
+        self.shared = shared
+        self.single_flight = SingleFlight()
+        self.not_modified = 0
+        self._validated = OrderedDict()
+        self._validated_lock = threading.Lock()
+
+        # Warm the cache from the last persisted results
+        if snapshot is not None:
+            if self.cache is None:
+                self.cache = LookupCache()
+            expired_at = monotonic() - self.cache.ttl
+            for key, catalog in snapshot.load().items():
+                self.cache.put(key, catalog, stored_at=expired_at)
 
-    def get_services(self, fields=None, tags=None, service_name=None, status=None):
+        # Indexes are served from memory even without a lookup cache
+        self.index_cache = self.cache if self.cache is not None else LookupCache()
+
+        if shared is not None:
+            shared.start(self)
+
+    def get_services(self, fields=None, tags=None, service_name=None, status=None, parsed=False):
         """
         Returns all the currently registered services and their parameters.
 
-        :param fields       Comma separated list of fields to include in response.
-        :param tags         Comma separated list of tags that returned instances must have.
+        :param fields       Comma separated list, or list, of fields to include in response.
+        :param tags         Comma separated list, or list, of tags that returned instances must have.
         :param service_name Name of instances to return.
-        :param status       State of instances to be return.
+        :param status       State, or list of states, of instances to be return.
+        :param parsed       Return a tuple of ServiceInstance instead of the response text.
 
         :return response
         """
+        catalog = self._catalog(lookup_key(fields, tags, service_name, status))
+        return catalog.instances if parsed else catalog.text
 
-        # Add filters to query
-        status_query = add_query_string(('fields', fields), ('tags', tags),
-                                        ('service_name', service_name), ('status', status))
+    def get_index(self, tags=None, service_name=None, status=None):
+        """
+        Returns an index of the currently registered services by tag and status, to route requests
+        with TagIndex.select and TagIndex.prefer. The index is built once per lookup response and
+        served from the locator's cache, or from index_cache if the locator has none.
+
+        :param tags         Comma separated list, or list, of tags that indexed instances must have.
+        :param service_name Name of instances to index.
+        :param status       State, or list of states, of instances to index.
+
+        :return TagIndex
+        """
+        return self._catalog(lookup_key(None, tags, service_name, status), self.index_cache).index
 
-        retrieve_services_url = '%s/api/v1/instances%s' % (self.url, status_query)
-        headers = {'Authorization': 'Bearer %s' % self.token}
+    def _catalog(self, key, cache=None):
+        """
+        Returns the Catalog of a lookup, from the shared catalog, the cache or the registry.
+
+        :param cache:   LookupCache to use instead of the locator's.
+        """
+        cache = cache if cache is not None else self.cache
+        if self.shared is not None:
+            catalog = self.shared.get(key)
+            if catalog is not None:
+                return catalog
 
         try:
-            response = request("GET", retrieve_services_url, headers=headers)
-        except Exception as e:
-            raise exceptions.APIException('Error on service lookup', str(e))
-
-        # Check for possible errors in response
-        if response.status_code == 400:
-            raise exceptions.ValidationException('Bad request to service registry',
-                                                 internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 401:
-            raise exceptions.AuthenticationException('Unauthorized service lookup: token is not valid',
-                                                     internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 404:
-            raise exceptions.NotFoundException('Bad Service Discovery URL',
-                                               internal_details=response.text)
-
-        return response.text
+            if cache is None:
+                catalog = self._coalesced_fetch(key)
+            else:
+                catalog = cache.get(key, lambda: self._coalesced_fetch(key))
+        except UNAVAILABLE_EXCEPTIONS:
+            # Serve an older result while the registry is unavailable
+            catalog = cache.peek(key) if cache is not None else None
+            if catalog is None:
+                raise
+        return catalog
+
+    def iter_services(self, fields=None, tags=None, service_name=None, status=None, chunk_size=65536):
+        """
+        Yields the currently registered services as they are received, without buffering the response.
+        Cached and shared results are not used.
+
+        :param fields       Comma separated list, or list, of fields to include in response.
+        :param tags         Comma separated list, or list, of tags that returned instances must have.
+        :param service_name Name of instances to return.
+        :param status       State, or list of states, of instances to be return.
+        :param chunk_size   Number of bytes read from the connection at a time.
+
+        :return generator of ServiceInstance
+        """
+        response = send(self.pool, "GET", self._services_url(*lookup_key(fields, tags, service_name, status)),
+                        'service lookup', 'Error on service lookup', retry=self.retry, breaker=self.breaker,
+                        timeout=self.timeouts['lookup'],
+                        metrics=self.metrics, operation='lookup', stream=True,
+                        headers=self.context.auth_headers)
+        try:
+            for data in iter_instances(response.iter_content(chunk_size)):
+                yield ServiceInstance.from_dict(data)
+        finally:
+            response.close()
+
+    @property
+    def coalesced(self):
+        """
+        Number of lookups that shared the request of an identical lookup in flight.
+        """
+        return self.single_flight.coalesced
+
+    def _coalesced_fetch(self, key):
+        """
+        Retrieves the registered services, sharing the request of an identical lookup in flight.
+        """
+        return self.single_flight.do(key, lambda: self._fetch_services(*key))
+
+    def _fetch_services(self, fields, tags, service_name, status):
+        """
+        Retrieves the registered services from Service Discovery, bypassing any cache.
+
+        :return:    Catalog wrapping the response
+        """
+        key = (fields, tags, service_name, status)
+        headers, previous = self._lookup_headers(key)
+        response = send(self.pool, "GET", self._services_url(fields, tags, service_name, status),
+                        'service lookup', 'Error on service lookup', retry=self.retry, breaker=self.breaker,
+                        timeout=self.timeouts['lookup'],
+                        metrics=self.metrics, operation='lookup',
+                        headers=headers)
+
+        catalog = self._catalog_from(key, response, previous)
+        if self.snapshot is not None and catalog is not previous:
+            self.snapshot.update(key, catalog)
+        return catalog
+
+    def _lookup_headers(self, key):
+        """
+        Returns the headers of a lookup, conditional on the last response to the same lookup.
+
+        :return:    (headers, last Catalog the registry may answer is unchanged or None)
+        """
+        headers = self.context.lookup_headers
+        with self._validated_lock:
+            previous = self._validated.get(key)
+        if previous is not None:
+            headers = dict(headers)
+            if previous.etag is not None:
+                headers['If-None-Match'] = previous.etag
+            if previous.last_modified is not None:
+                headers['If-Modified-Since'] = previous.last_modified
+        return headers, previous
+
+    def _catalog_from(self, key, response, previous):
+        """
+        Returns the Catalog of a lookup response, reusing the previous one, already parsed, on 304.
+        """
+        if response.status_code == 304 and previous is not None:
+            self.not_modified += 1
+            return previous
+
+        headers = getattr(response, 'headers', None) or {}
+        catalog = Catalog(response.text, headers.get('ETag'), headers.get('Last-Modified'))
+        with self._validated_lock:
+            self._validated.pop(key, None)
+            if catalog.validated:
+                self._validated[key] = catalog
+                while len(self._validated) > VALIDATED_MAX_ENTRIES:
+                    self._validated.popitem(last=False)
+        return catalog
+
+    def _services_url(self, fields, tags, service_name, status):
+        """
+        Returns the /instances URL with the given filters applied.
+        """
+
+        # Add filters to query
+        status_query = build_query(('fields', fields), ('tags', tags),
+                                   ('service_name', service_name), ('status', status))
+
+        return self.context.instances_url + status_query
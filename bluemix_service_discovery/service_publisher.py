@@ -1,15 +1,26 @@
 import json
+import logging
 import time
-from requests import request
-from threading import Thread
-from bluemix_service_discovery.utils import load_credentials
-from bluemix_service_discovery import exceptions
+from threading import Event, Thread, current_thread
+from bluemix_service_discovery.utils import monotonic
+from bluemix_service_discovery.connection import send
+from bluemix_service_discovery.context import ContextClient, resolve_context
+from bluemix_service_discovery.heartbeat import (DEFAULT_CAPACITY, FixedInterval, HeartbeatHistory, failure_delay,
+                                                 format_heartbeat, heartbeat_deadline)
+from bluemix_service_discovery.models import ServiceInstance
 
+logger = logging.getLogger(__name__)
 
-class ServicePublisher:
+# Interval policy of publishers not given one, stateless so shared
+DEFAULT_INTERVAL_POLICY = FixedInterval()
+
+
+class ServicePublisher(ContextClient):
     """Register and heartbeat a new service instance"""
 
-    def __init__(self, name, ttl, status, endpoint, protocol, tags=None, url=None, auth_token=None):
+    def __init__(self, name, ttl, status, endpoint, protocol, tags=None, url=None, auth_token=None,
+                 pool=None, scheduler=None, retry=None, breaker=None, timeouts=None, metrics=None,
+                 history_size=DEFAULT_CAPACITY, interval_policy=None, context=None):
         """
         Initializes the service instance with all its parameters.
 
@@ -21,7 +32,25 @@ class ServicePublisher:
         :param tags:        Tags to associate with the service.
         :param url:         Service Discovery API endpoint.
         :param auth_token:  Authorization token for Service Discovery.
+        :param pool:        Connection pool used for requests. Defaults to the shared pool.
+        :param scheduler:   Optional HeartbeatScheduler sending heartbeats instead of a dedicated thread.
+        :param retry:       Optional RetryPolicy for transient errors.
+        :param breaker:     Optional CircuitBreaker, which may be shared with locators.
+        :param timeouts:    Dict of operation ('register', 'heartbeat', 'deregister') to (connect, read)
+                            timeouts (sec), overriding DEFAULT_TIMEOUTS.
+        :param metrics:     Metrics notified of every request and heartbeat. Defaults to the process-wide
+                            metrics.
+        :param history_size: Number of recent heartbeats kept for get_heartbeat_success_rate and
+                            get_heartbeat_jitter.
+        :param interval_policy: Policy sizing the time between heartbeats, e.g. AdaptiveInterval.
+                            Defaults to FixedInterval, beating every half TTL.
+        :param context:     Optional RegistryContext to attach to, providing the credentials and any setting
+                            not given here. Defaults to the context shared by the clients of the registry.
         """
+        # Attach to the registry's credentials and settings
+        self.context = resolve_context(context, url, auth_token, pool=pool, scheduler=scheduler, retry=retry,
+                                       breaker=breaker, timeouts=timeouts, metrics=metrics)
+
         self.name = name
         self.ttl = ttl
         self.status = status
@@ -30,79 +59,97 @@ class ServicePublisher:
             'type': protocol
         }
         self.tags = [] if tags is None else tags
-
-        # Get credentials
-        credentials = load_credentials(url, auth_token)
-        self.url = credentials['url']
-        self.token = credentials['auth_token']
+        self.interval_policy = interval_policy if interval_policy is not None else DEFAULT_INTERVAL_POLICY
 
         # Uninitialized vars
-        self.heartbeats = []
+        self.heartbeats = HeartbeatHistory(history_size)
         self.heartbeat_thread = None
         self.heartbeat_url = None
         self.id = None
+        self.heartbeat_failures = 0
+        self._stopped = Event()
 
         # Flags
         self.beating = False
         self.registered = False
 
-    def register_service(self, heartbeat=True):
+    def register_service(self, heartbeat=True, parsed=False):
         """
         Registers the service with Service Discovery.
 
-        :param heartbeat:   Indicates whether or not to spawn a heartbeat thread.
+        :param heartbeat:   Indicates whether or not to heartbeat the service.
+        :param parsed:      Return a ServiceInstance instead of the response text.
         :return:            Successful service registration object
         """
 
-        # Create the API request payload and headers
-        registration_payload = {
+        # Call Service Discovery /instances to register the service
+        response = send(self.pool, "POST", self.context.instances_url,
+                        'service registration', 'Error registering controller service', retry=self.retry,
+                        breaker=self.breaker, timeout=self.timeouts['register'],
+                        metrics=self.metrics, operation='register',
+                        data=json.dumps(self._registration_payload()),
+                        headers=self.context.json_headers)
+
+        # Set instance values based on returned object
+        registration = self._complete_registration(response.text, parsed)
+
+        # Hand over to the scheduler, or spawn thread responsible for sending heartbeat
+        if heartbeat and self.scheduler is not None:
+            self.beating = True
+            self.scheduler.add(self, self.interval_policy.interval(self.ttl))
+        elif heartbeat:
+            self.beating = True
+            self._stopped.clear()
+            self.heartbeat_thread = Thread(target=self._heartbeater)
+            # Do not keep the process alive, so that it exits and runs its atexit hooks, e.g. ShutdownManager
+            self.heartbeat_thread.daemon = True
+            self.heartbeat_thread.start()
+
+        return registration
+
+    def _registration_payload(self):
+        """
+        Returns the API request payload registering this service.
+        """
+        return {
             'tags': self.tags,
             'status': self.status,
             'service_name': self.name,
             'ttl': self.ttl,
             'endpoint': self.endpoint
         }
-        headers = {
-            'content-type': 'application/json',
-            'Authorization': 'Bearer %s' % self.token
-        }
 
-        # Call Service Discovery /instances to register the service
-        try:
-            response = request("POST",
-                               '%s/api/v1/instances' % self.url,
-                               data=json.dumps(registration_payload),
-                               headers=headers)
-        except Exception as e:
-            raise exceptions.APIException('Error registering controller service', internal_details=str(e))
-
-        # Check for possible errors in response
-        if response.status_code == 400:
-            raise exceptions.ValidationException('Bad request to service registry',
-                                                 internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 401:
-            raise exceptions.AuthenticationException('Unauthorized service registration: token is not valid',
-                                                     internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 404:
-            raise exceptions.NotFoundException('Bad Service Discovery URL',
-                                               internal_details=response.text)
+    def _complete_registration(self, text, parsed):
+        """
+        Records the instance values returned by a successful registration.
 
-        # Set instance values based on returned object
+        :param text:    Registration response body.
+        :param parsed:  Return a ServiceInstance instead of the response text.
+        :return:        Successful service registration object
+        """
+        registration = json.loads(text)
         self.registered = True
-        self.id = json.loads(response.text)['id']
-        self.heartbeat_url = json.loads(response.text)['links']['heartbeat']
+        self.id = registration['id']
+        self.heartbeat_url = registration['links']['heartbeat']
 
-        # Spawn thread responsible for sending heartbeat
-        if heartbeat:
-            self.heartbeat_thread = Thread(target=self._heartbeater,
-                                           kwargs={'interval': round(self.ttl*.5)})
-            self.heartbeat_thread.start()
-
-        return response.text
+        if parsed:
+            return ServiceInstance(self.id, self.name, self.endpoint['value'], self.endpoint['type'],
+                                   self.tags, self.status, registration.get('ttl', self.ttl))
+        return text
 
     def heartbeat_service(self):
         """
         Heartbeats the service with Service Discovery.
+
+        :return:    Datetime string of the heartbeat
+        """
+        return format_heartbeat(self._beat())
+
+    def _beat(self):
+        """
+        Sends a heartbeat and records its outcome in the history.
+
+        :return:    Epoch time (sec) of the heartbeat
         """
 
         # First make sure service has been registered
@@ -110,42 +157,59 @@ class ServicePublisher:
             raise Exception('Service instance is not registered')
 
         # Call Service Discovery /instances/XXX/heartbeat to heartbeat the service
+        started_at = monotonic()
         try:
-            response = request("PUT",
-                               self.heartbeat_url,
-                               headers={'Authorization': 'Bearer %s' % self.token})
-        except Exception as e:
-            raise exceptions.APIException('Error heartbeating service', internal_details=str(e))
-
-        # Check for possible errors in response
-        if response.status_code == 400:
-            raise exceptions.ValidationException('Bad request to service registry',
-                                                 internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 401:
-            raise exceptions.AuthenticationException('Unauthorized service heartbeat: token is not valid',
-                                                     internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 404:
-            raise exceptions.NotFoundException('Bad Service Discovery URL',
-                                               internal_details=response.text)
-        elif response.status_code == 410:
-            raise exceptions.ResourceGoneException('Service instance not found',
-                                                   internal_details=json.loads(response.text).get('Error'))
-
-        # Add heartbeat to list
-        heartbeat_time = time.strftime("%m/%d/%Y %H:%M:%S", time.gmtime())
-        self.heartbeats.append(heartbeat_time)
+            send(self.pool, "PUT", self.heartbeat_url,
+                 'service heartbeat', 'Error heartbeating service', retry=self.retry,
+                 breaker=self.breaker, timeout=self.timeouts['heartbeat'],
+                 deadline=heartbeat_deadline(self.ttl, self.interval_policy.interval(self.ttl)),
+                 metrics=self.metrics, operation='heartbeat',
+                 headers=self.context.auth_headers)
+        except Exception:
+            self.heartbeats.record(time.time(), succeeded=False)
+            raise
+
+        self.interval_policy.observe(monotonic() - started_at)
+        heartbeat_time = time.time()
+        self.heartbeats.record(heartbeat_time)
         return heartbeat_time
 
-    def _heartbeater(self, interval):
+    def _heartbeat_delay(self, succeeded):
         """
-        Handles the service heartbeat
+        Returns the time (sec) until the next heartbeat, counted from the start of the last one.
+        A failed heartbeat is retried at once, then with a growing delay.
 
-        :param: interval    Time lapse (sec) between heartbeats
+        :param succeeded:   Whether the last heartbeat succeeded.
+        """
+        interval = self.interval_policy.interval(self.ttl)
+        if succeeded:
+            self.heartbeat_failures = 0
+            return interval
+        self.heartbeat_failures += 1
+        return failure_delay(self.heartbeat_failures, interval)
+
+    def _heartbeater(self):
+        """
+        Handles the service heartbeat
         """
-        self.beating = True
-        while self.beating:
-            time.sleep(interval)
-            self.heartbeat_service()
+        due = monotonic() + self.interval_policy.interval(self.ttl)
+        # Wait on the stop event rather than sleep, so that stop_heartbeat wakes the thread at once
+        while not self._stopped.wait(max(0, due - monotonic())) and self.beating:
+            started_at = monotonic()
+            if self.metrics.enabled:
+                self.metrics.observe_heartbeat_lag(started_at - due)
+            try:
+                self._beat()
+                succeeded = True
+            except Exception:
+                # Keep beating: the registry may recover before the instance expires. A heartbeat that
+                # overlapped the de-registration is expected to be refused
+                if self.beating:
+                    logger.exception('Error heartbeating service %s', self.id)
+                succeeded = False
+
+            # Schedule from the start of this beat, so that the time it took does not add up
+            due = started_at + self._heartbeat_delay(succeeded)
 
     def get_last_heartbeat(self):
         """
@@ -153,42 +217,58 @@ class ServicePublisher:
 
         :return:    Datetime string of the last service heartbeat
         """
-        if len(self.heartbeats) > 0:
-            return self.heartbeats[-1]
+        if self.heartbeats.last_success is not None:
+            return format_heartbeat(self.heartbeats.last_success)
         else:
             return ''
 
-    def deregister_service(self):
+    def get_heartbeat_success_rate(self):
+        """
+        Returns the fraction of the recent heartbeats the registry accepted
+
+        :return:    Success rate between 0 and 1, or None before the first heartbeat
+        """
+        return self.heartbeats.success_rate()
+
+    def get_heartbeat_jitter(self):
+        """
+        Returns how irregularly the recent heartbeats were sent
+
+        :return:    Standard deviation (sec) of the intervals between successful heartbeats, or None
+                    with too few heartbeats
+        """
+        return self.heartbeats.jitter()
+
+    def stop_heartbeat(self, wait=True):
+        """
+        Stops heartbeating the service, without waiting for the next heartbeat to fall due.
+
+        :param wait:    Wait for a heartbeat that is already being sent.
+        """
+        self.beating = False
+        self._stopped.set()
+        if self.scheduler is not None:
+            self.scheduler.remove(self, wait=wait)
+        elif wait and self.heartbeat_thread is not None and self.heartbeat_thread is not current_thread():
+            self.heartbeat_thread.join()
+
+    def deregister_service(self, wait_heartbeat=True):
         """
         De-register the service with Service Discovery
+
+        :param wait_heartbeat:  Wait for a heartbeat that is already being sent. If False, the instance is
+                                de-registered at once, e.g. on shutdown, and a late heartbeat is refused.
         """
 
         # Stop the heartbeats
-        if self.beating:
-            self.beating = False
-            self.heartbeat_thread.join()
-            self.heartbeats = []
+        self.stop_heartbeat(wait=wait_heartbeat)
+        self.heartbeats.clear()
 
-        # Call Service Discovery /instances/XXX to re-register the service
-        try:
-            response = request("DELETE",
-                               '%s/api/v1/instances/%s' % (self.url, self.id),
-                               headers={'Authorization': 'Bearer %s' % self.token})
-        except Exception as e:
-            raise exceptions.APIException('Error de-registering service', internal_details=str(e))
-
-        # Check for possible errors in response
-        if response.status_code == 400:
-            raise exceptions.ValidationException('Bad request to service registry',
-                                                 internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 401:
-            raise exceptions.AuthenticationException('Unauthorized service de-registration: token is not valid',
-                                                     internal_details=json.loads(response.text).get('Error'))
-        elif response.status_code == 404:
-            raise exceptions.NotFoundException('Bad Service Discovery URL',
-                                               internal_details=response.text)
-        elif response.status_code == 410:
-            raise exceptions.ResourceGoneException('Service instance not found',
-                                                   internal_details=json.loads(response.text).get('Error'))
+        # Call Service Discovery /instances/XXX to de-register the service
+        send(self.pool, "DELETE", '%s/%s' % (self.context.instances_url, self.id),
+             'service de-registration', 'Error de-registering service', retry=self.retry,
+             breaker=self.breaker, timeout=self.timeouts['deregister'],
+             metrics=self.metrics, operation='deregister',
+             headers=self.context.auth_headers)
 
         self.registered = False
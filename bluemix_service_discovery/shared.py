@@ -0,0 +1,270 @@
+"""
+ Lookup results shared between the processes of a host through a memory-mapped file
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from bluemix_service_discovery.models import Catalog
+from bluemix_service_discovery.utils import key_from_json, lookup_key, single_line_json
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'BSDC'
+VERSION = 1
+DEFAULT_CAPACITY = 16 * 1024 * 1024
+
+# magic, version, sequence, payload length, written at (epoch sec)
+_HEADER = struct.Struct('<4sIQQd')
+_SEQUENCE = struct.Struct('<Q')
+_SEQUENCE_OFFSET = 8
+# magic and version, before the sequence
+_PREFIX = struct.Struct('<4sI')
+# payload length and written at, after the sequence
+_CONTENT = struct.Struct('<Qd')
+_CONTENT_OFFSET = 16
+
+
+def default_path(url):
+    """
+    Returns the segment path shared by all processes of the host using the given registry.
+
+    :param url: Service Discovery API endpoint.
+    """
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(directory, 'bluemix-service-discovery-%s.catalog' % digest)
+
+
+class SharedCatalog(object):
+    """Lookup results refreshed by one process per host and read by all others
+
+    One process holds an exclusive lock on the segment and refreshes the watched queries into it.
+    The others read from the mapped segment, using a sequence number that is odd while a write is
+    in progress to detect torn reads. If the refreshing process exits, another one takes over.
+    """
+
+    def __init__(self, path=None, interval=30, max_age=None, capacity=DEFAULT_CAPACITY):
+        """
+        :param path:        Segment file. Defaults to a file in /dev/shm derived from the registry URL.
+        :param interval:    Time (sec) between refreshes.
+        :param max_age:     Time (sec) after which shared results are ignored. Defaults to 3 intervals.
+        :param capacity:    Size (bytes) of the segment.
+        """
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age if max_age is not None else 3 * interval
+        self.capacity = capacity
+
+        self._queries = []
+        self._mapped = None
+        self._lock_file = None
+        self._index = (None, {})
+        # Catalogs decoded from the current segment, so that each is parsed and indexed once
+        self._catalogs = (None, {})
+        self._stop = threading.Event()
+        self._thread = None
+        self._locator = None
+
+    def watch(self, fields=None, tags=None, service_name=None, status=None):
+        """
+        Adds a query for the refreshing process to keep in the segment.
+        All processes sharing the segment should watch the same queries.
+        """
+        key = lookup_key(fields, tags, service_name, status)
+        if key not in self._queries:
+            self._queries.append(key)
+
+    @property
+    def is_refresher(self):
+        """
+        Whether this process currently refreshes the segment.
+        """
+        return self._lock_file is not None
+
+    def start(self, locator):
+        """
+        Maps the segment and starts the background thread refreshing or taking over refreshing.
+
+        :param locator: ServiceLocator used to fetch the watched queries.
+        """
+        if self._thread is not None:
+            return
+        self._locator = locator
+        if self.path is None:
+            self.path = default_path(locator.url)
+        self._map()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='shared-catalog')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops refreshing and releases the refresher lock so another process can take over.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def close(self):
+        """
+        Stops refreshing and unmaps the segment.
+        """
+        self.stop()
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    def get(self, key):
+        """
+        Reads a lookup result from the segment without locking.
+
+        :param key:     Lookup key, a (fields, tags, service_name, status) tuple.
+        :return:        Catalog, or None if the result is missing or too old
+        """
+        mapped = self._mapped
+        if mapped is None:
+            return None
+
+        for _ in range(100):
+            magic, _, sequence, length, written_at = _HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or sequence == 0:
+                return None
+            if sequence % 2:
+                # Write in progress
+                time.sleep(0)
+                continue
+            if time.time() - written_at > self.max_age:
+                return None
+
+            catalogs_sequence, catalogs = self._catalogs
+            if catalogs_sequence == sequence and key in catalogs:
+                return catalogs[key]
+
+            index_sequence, index = self._index
+            if index_sequence != sequence:
+                index = self._build_index(mapped, length)
+            span = index.get(key)
+            body = bytes(mapped[span[0]:span[1]]) if span is not None else None
+
+            if _SEQUENCE.unpack_from(mapped, _SEQUENCE_OFFSET)[0] != sequence:
+                continue
+            self._index = (sequence, index)
+            if body is None:
+                return None
+            if catalogs_sequence != sequence:
+                catalogs = {}
+                self._catalogs = (sequence, catalogs)
+            catalog = catalogs[key] = Catalog(body.decode('utf-8'))
+            return catalog
+        return None
+
+    def publish(self, entries):
+        """
+        Writes lookup results to the segment, replacing its content.
+
+        :param entries: Dict of lookup key to Catalog.
+        """
+        payload = b''.join(('%s\t%s\n' % (json.dumps(key), single_line_json(catalog.text))).encode('utf-8')
+                           for key, catalog in entries.items())
+        mapped = self._mapped
+        if _HEADER.size + len(payload) > len(mapped):
+            logger.warning('Shared catalog %s is too small for %d bytes of lookup results',
+                           self.path, len(payload))
+            return
+
+        sequence = _HEADER.unpack_from(mapped, 0)[2]
+        if sequence % 2:
+            # A previous refresher died mid-write
+            sequence += 1
+        _SEQUENCE.pack_into(mapped, _SEQUENCE_OFFSET, sequence + 1)
+        mapped[_HEADER.size:_HEADER.size + len(payload)] = payload
+        _PREFIX.pack_into(mapped, 0, MAGIC, VERSION)
+        _CONTENT.pack_into(mapped, _CONTENT_OFFSET, len(payload), time.time())
+        # Publish the even sequence last, so that a reader seeing it also sees the header written with it
+        _SEQUENCE.pack_into(mapped, _SEQUENCE_OFFSET, sequence + 2)
+
+    def refresh(self):
+        """
+        Fetches the watched queries from the registry and publishes them. Queries that fail keep
+        their previous result.
+        """
+        entries = {}
+        for key in self._queries:
+            try:
+                entries[key] = self._locator._fetch_services(*key)
+            except Exception:
+                logger.exception('Error refreshing shared catalog query %s', key)
+                previous = self.get(key)
+                if previous is not None:
+                    entries[key] = previous
+        self.publish(entries)
+
+    def _map(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < _HEADER.size:
+                os.ftruncate(fd, self.capacity)
+            self._mapped = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+
+    def _try_lock(self):
+        """
+        Tries to become the refreshing process of the host.
+        """
+        lock_file = open(self.path + '.lock', 'a')
+        if fcntl is None:
+            # No way to elect a refresher: every process refreshes
+            self._lock_file = lock_file
+            return True
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.is_refresher or self._try_lock():
+                self.refresh()
+            self._stop.wait(self.interval)
+
+    @staticmethod
+    def _build_index(mapped, length):
+        """
+        Maps each lookup key in the payload to the offsets of its response body.
+        """
+        index = {}
+        position = _HEADER.size
+        end = _HEADER.size + length
+        while position < end:
+            line_end = mapped.find(b'\n', position, end)
+            separator = mapped.find(b'\t', position, line_end)
+            if line_end < 0 or separator < 0:
+                break
+            try:
+                key = key_from_json(json.loads(mapped[position:separator].decode('utf-8')))
+            except ValueError:
+                # Torn read, detected by the caller's sequence check
+                break
+            index[key] = (separator + 1, line_end)
+            position = line_end + 1
+        return index
@@ -0,0 +1,136 @@
+"""
+ Graceful shutdown: stop heartbeats and de-register all service instances within a deadline
+"""
+import atexit
+import logging
+import signal
+import threading
+from bluemix_service_discovery import bulk
+
+logger = logging.getLogger(__name__)
+
+# Time (sec) within which all instances are de-registered
+DEFAULT_DEADLINE = 5
+
+# De-registrations in flight, so that shutdown does not take longer with more instances
+DEFAULT_MAX_WORKERS = 64
+
+
+class ShutdownManager(object):
+    """De-register the added publishers when the process exits or is terminated
+
+    On shutdown, all heartbeat loops are woken and stopped at once, then the instances are
+    de-registered concurrently. De-registrations not completed by the deadline are abandoned, so the
+    process exits in a fixed short time however many instances it registered.
+    """
+
+    def __init__(self, deadline=DEFAULT_DEADLINE, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        :param deadline:    Time (sec) within which shutdown returns.
+        :param max_workers: Maximum number of de-registrations in flight.
+        """
+        self.deadline = deadline
+        self.max_workers = max_workers
+        self.results = None
+
+        self._publishers = []
+        self._previous_handlers = {}
+        self._installed = False
+        self._done = False
+        # Reentrant, as the signal handler may interrupt add or remove in the main thread
+        self._lock = threading.RLock()
+
+    def add(self, publisher):
+        """
+        Adds a publisher to de-register on shutdown.
+
+        :param publisher:   ServicePublisher, registered now or later.
+        :return:            The publisher
+        :raises TypeError:  For an AsyncServicePublisher, which must be de-registered from its event loop.
+        """
+        bulk.require_synchronous(publisher)
+        with self._lock:
+            if publisher not in self._publishers:
+                self._publishers.append(publisher)
+        return publisher
+
+    def remove(self, publisher):
+        """
+        Stops tracking a publisher, e.g. one de-registered by the application.
+        """
+        with self._lock:
+            if publisher in self._publishers:
+                self._publishers.remove(publisher)
+
+    def __contains__(self, publisher):
+        return publisher in self._publishers
+
+    def __len__(self):
+        return len(self._publishers)
+
+    def install(self, signals=(signal.SIGTERM,)):
+        """
+        Runs shutdown when the interpreter exits and when one of the given signals is received.
+        Must be called from the main thread. Previous signal handlers are called after shutdown.
+
+        :param signals: Signal numbers to handle.
+        :return:        This manager
+        """
+        if not self._installed:
+            atexit.register(self._at_exit)
+            self._installed = True
+        for signum in signals:
+            if signum not in self._previous_handlers:
+                self._previous_handlers[signum] = signal.signal(signum, self._handle_signal)
+        return self
+
+    def uninstall(self):
+        """
+        Restores the previous signal handlers and no longer runs shutdown at exit.
+        """
+        for signum, handler in self._previous_handlers.items():
+            signal.signal(signum, handler if handler is not None else signal.SIG_DFL)
+        self._previous_handlers.clear()
+        self._installed = False
+
+    def shutdown(self):
+        """
+        Stops the heartbeats of all publishers and de-registers them concurrently within the deadline.
+        Only the first call has an effect.
+
+        :return:    List of BulkResult, in the order publishers were added
+        """
+        with self._lock:
+            if self._done:
+                return self.results
+            self._done = True
+            publishers = list(self._publishers)
+
+        # Wake every heartbeat loop now, rather than after its current interval
+        for publisher in publishers:
+            try:
+                publisher.stop_heartbeat(wait=False)
+            except Exception:
+                logger.exception('Error stopping heartbeats of service %s', getattr(publisher, 'id', None))
+
+        # Heartbeats in flight may take longer than the deadline: de-register without waiting for them
+        self.results = bulk.deregister_services(publishers, max_workers=self.max_workers, timeout=self.deadline,
+                                                wait_heartbeat=False)
+        for result in self.results:
+            if not result.succeeded:
+                logger.error('Error de-registering service %s: %s', getattr(result.publisher, 'id', None),
+                             result.error)
+        return self.results
+
+    def _at_exit(self):
+        if self._installed:
+            self.shutdown()
+
+    def _handle_signal(self, signum, frame):
+        self.shutdown()
+        previous = self._previous_handlers.get(signum)
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            # Terminate as the default handler would
+            raise SystemExit(128 + signum)
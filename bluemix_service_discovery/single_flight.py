@@ -0,0 +1,66 @@
+"""
+ Deduplication of concurrent identical calls
+"""
+import threading
+
+
+class _Call(object):
+    """Outcome of an in-flight call, shared by its callers"""
+
+    __slots__ = ('done', 'completed', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.completed = False
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Share one in-flight call between the threads requesting the same key"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, operation):
+        """
+        Calls operation, unless a call for the same key is in flight, in which case its outcome is
+        waited for and shared. If that call is interrupted without an outcome, e.g. by KeyboardInterrupt,
+        the waiting callers call again.
+
+        :param key:         Hashable key identifying identical calls.
+        :param operation:   Function called without arguments.
+        :return:            Result of the operation
+        :raises:            The exception raised by the operation.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if not call.completed:
+                # The leader was interrupted, e.g. by KeyboardInterrupt: call again, one of us leading
+                return self.do(key, operation)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = operation()
+            call.completed = True
+            return call.result
+        except Exception as e:
+            call.error = e
+            call.completed = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
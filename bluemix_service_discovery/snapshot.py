@@ -0,0 +1,133 @@
+"""
+ Persistent on-disk snapshot of lookup results
+"""
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from bluemix_service_discovery.models import Catalog
+from bluemix_service_discovery.utils import key_from_json, monotonic, single_line_json
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 'bluemix-service-discovery-catalog'
+VERSION = 1
+
+
+class CatalogSnapshot(object):
+    """Last good lookup results, persisted atomically to a JSON-lines file
+
+    The first line is a header object holding the format name and version. Every following
+    line holds the JSON-encoded lookup key, a tab, and the single-line response body.
+    """
+
+    def __init__(self, path, write_interval=30, max_entries=128):
+        """
+        :param path:            File the snapshot is stored in.
+        :param write_interval:  Minimum time (sec) between two writes of the file.
+        :param max_entries:     Maximum number of lookup results kept, least recently updated first out.
+        """
+        self.path = path
+        self.write_interval = write_interval
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._written_at = None
+        self._writing = False
+
+    def load(self):
+        """
+        Reads the snapshot file. Response bodies are only parsed when their instances are used.
+
+        :return:    Dict of lookup key to Catalog, empty if the file is missing or unreadable
+        """
+        entries = OrderedDict()
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return entries
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    header = json.loads(mapped.readline().decode('utf-8'))
+                    if header.get('format') != FORMAT or header.get('version') != VERSION:
+                        logger.warning('Ignoring catalog snapshot %s with unsupported format', self.path)
+                        return entries
+                    for line in iter(mapped.readline, b''):
+                        key, body = line.decode('utf-8').rstrip('\n').split('\t', 1)
+                        entries[key_from_json(json.loads(key))] = Catalog(body)
+                finally:
+                    mapped.close()
+        except (IOError, OSError):
+            return OrderedDict()
+        except ValueError:
+            logger.warning('Ignoring corrupt catalog snapshot %s', self.path)
+            return OrderedDict()
+
+        with self._lock:
+            for key, catalog in entries.items():
+                self._entries.setdefault(key, catalog)
+        return entries
+
+    def update(self, key, catalog):
+        """
+        Records a fresh lookup result. The file is written in the background, at most every write_interval.
+
+        :param key:     Lookup key.
+        :param catalog: Catalog returned by the lookup.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = catalog
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self._writing:
+                return
+            self._writing = True
+            delay = 0
+            if self._written_at is not None:
+                delay = max(0, self.write_interval - (monotonic() - self._written_at))
+
+        writer = threading.Thread(target=self._write_in_background, args=(delay,), name='catalog-snapshot')
+        writer.daemon = True
+        writer.start()
+
+    def save(self):
+        """
+        Writes all recorded lookup results to the file, atomically replacing it.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+            self._written_at = monotonic()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix='.catalog-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                header = {'format': FORMAT, 'version': VERSION, 'written_at': time.time()}
+                f.write((json.dumps(header) + '\n').encode('utf-8'))
+                for key, catalog in entries:
+                    f.write(('%s\t%s\n' % (json.dumps(key), single_line_json(catalog.text))).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            _replace(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def _write_in_background(self, delay):
+        try:
+            time.sleep(delay)
+            self.save()
+        except Exception:
+            logger.exception('Error writing catalog snapshot %s', self.path)
+        finally:
+            with self._lock:
+                self._writing = False
+
+
+_replace = getattr(os, 'replace', os.rename)
@@ -0,0 +1,87 @@
+"""
+ Incremental parsing of instance listings as they are received
+"""
+import codecs
+import json
+import re
+
+# Start of the instances array in a lookup response
+_INSTANCES_START = re.compile(r'"instances"\s*:\s*\[')
+_SKIPPED = ' \t\r\n,'
+
+
+class InstanceStreamParser(object):
+    """Decode the objects of a lookup response's instances array one by one
+
+    Bytes are fed as they arrive. Only the instance being received is buffered, so memory does not
+    grow with the size of the listing.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._in_array = False
+        self._done = False
+
+    def feed(self, chunk):
+        """
+        Parses the next chunk of the response body.
+
+        :param chunk:   Bytes of the response body.
+        :return:        List of the instance dicts completed by this chunk
+        """
+        if self._done:
+            return []
+        buffer = self._buffer + self._decoder.decode(chunk)
+        position = 0
+
+        if not self._in_array:
+            match = _INSTANCES_START.search(buffer)
+            if match is None:
+                self._buffer = buffer
+                return []
+            self._in_array = True
+            position = match.end()
+
+        instances = []
+        end = len(buffer)
+        while True:
+            while position < end and buffer[position] in _SKIPPED:
+                position += 1
+            if position == end:
+                break
+            if buffer[position] == ']':
+                self._done = True
+                break
+            try:
+                instance, position = self._json.raw_decode(buffer, position)
+            except ValueError:
+                # Instance not fully received yet
+                break
+            instances.append(instance)
+
+        self._buffer = '' if self._done else buffer[position:]
+        return instances
+
+    def close(self):
+        """
+        Checks that the whole instances array was received.
+
+        :raises ValueError: If the response ended before the end of the array.
+        """
+        if not self._done:
+            raise ValueError('Incomplete instance listing: %r' % self._buffer[:100])
+
+
+def iter_instances(chunks):
+    """
+    Yields the instance dicts of a lookup response body received in chunks.
+
+    :param chunks:  Iterable of bytes.
+    """
+    parser = InstanceStreamParser()
+    for chunk in chunks:
+        for instance in parser.feed(chunk):
+            yield instance
+    parser.close()
@@ -0,0 +1,429 @@
+"""
+ In-process stub of the Service Discovery HTTP API for local testing and benchmarking
+
+ Run it standalone with e.g. python -m bluemix_service_discovery.stub_registry --instances 5000
+"""
+import argparse
+import calendar
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from email.utils import formatdate, parsedate
+from bluemix_service_discovery.utils import monotonic
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, parse_qs
+
+INSTANCES_PATH = '/api/v1/instances'
+
+
+class StubRegistry(object):
+    """In-memory service registry implementing the /api/v1/instances resource
+
+    Instances expire when not heartbeated within their TTL: they are no longer returned by lookups and
+    their heartbeats and de-registrations get 410. Latency and errors can be injected into every
+    request to reproduce a slow or failing registry.
+    """
+
+    def __init__(self, auth_token=None, latency=0, latency_jitter=0, error_rate=0, error_status=503,
+                 seed=None, clock=monotonic):
+        """
+        :param auth_token:      Token clients must present. None accepts any token.
+        :param latency:         Time (sec) each request is delayed by.
+        :param latency_jitter:  Additional random delay (sec), uniformly distributed up to this value.
+        :param error_rate:      Fraction of requests failed with error_status instead of being processed.
+        :param error_status:    HTTP status code of injected errors.
+        :param seed:            Seed of the random generator for latency and errors, for repeatable runs.
+        :param clock:           Function returning the current time (sec), used for TTL expiry.
+        """
+        self.auth_token = auth_token
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.clock = clock
+        self.base_url = ''
+        self.instances = {}
+        self.modified_at = int(time.time())
+        self.not_modified = 0
+        self.expired = 0
+        self.injected_errors = 0
+
+        self._expires_at = {}
+        # Heap of (expiry time, instance id); entries superseded by a heartbeat are skipped
+        self._expiry = []
+        self._by_service = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def authorized(self, authorization):
+        return self.auth_token is None or authorization == 'Bearer %s' % self.auth_token
+
+    def fault(self):
+        """
+        Draws the injected delay and error of a request.
+
+        :return:    (delay in sec, error status code or None)
+        """
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.injected_errors += 1
+        return delay, self.error_status if failed else None
+
+    def register(self, payload):
+        """
+        Registers an instance.
+
+        :param payload: Decoded registration request.
+        :return:        (status code, response body)
+        """
+        if not isinstance(payload, dict) or not payload.get('service_name') or not payload.get('endpoint'):
+            return 400, {'Error': 'service_name and endpoint are required'}
+
+        instance = self._add(payload['service_name'], payload['endpoint'], payload.get('tags') or [],
+                             payload.get('status') or 'UP', payload.get('ttl') or 30)
+        return 201, {
+            'id': instance['id'],
+            'ttl': instance['ttl'],
+            'links': {
+                'self': '%s%s/%s' % (self.base_url, INSTANCES_PATH, instance['id']),
+                'heartbeat': '%s%s/%s/heartbeat' % (self.base_url, INSTANCES_PATH, instance['id'])
+            }
+        }
+
+    def populate(self, count, service_names=('service',), tags=(), status='UP', ttl=300):
+        """
+        Registers simulated instances directly, e.g. thousands of them for a load test.
+
+        :param count:           Number of instances.
+        :param service_names:   Names the instances are spread over, round robin.
+        :param tags:            Tag lists the instances are spread over, round robin.
+        :param status:          Status of the instances.
+        :param ttl:             Time (sec) after which the instances expire unless heartbeated.
+        :return:                List of the instance ids
+        """
+        ids = []
+        for i in range(count):
+            name = service_names[i % len(service_names)]
+            endpoint = {'value': 'http://%s-%d.stub' % (name, i), 'type': 'http'}
+            instance_tags = list(tags[i % len(tags)]) if tags else []
+            ids.append(self._add(name, endpoint, instance_tags, status, ttl)['id'])
+        return ids
+
+    def _add(self, service_name, endpoint, tags, status, ttl):
+        instance_id = uuid.uuid4().hex
+        instance = {
+            'id': instance_id,
+            'service_name': service_name,
+            'endpoint': endpoint,
+            'tags': tags,
+            'status': status,
+            'ttl': ttl
+        }
+        with self._lock:
+            self.instances[instance_id] = instance
+            self._by_service.setdefault(service_name, set()).add(instance_id)
+            self._renew(instance_id, ttl)
+            self.modified_at = int(time.time())
+        return instance
+
+    def _renew(self, instance_id, ttl):
+        expires_at = self.clock() + ttl
+        self._expires_at[instance_id] = expires_at
+        heapq.heappush(self._expiry, (expires_at, instance_id))
+
+    def _remove(self, instance_id):
+        instance = self.instances.pop(instance_id, None)
+        if instance is not None:
+            self._expires_at.pop(instance_id, None)
+            ids = self._by_service[instance['service_name']]
+            ids.discard(instance_id)
+            if not ids:
+                del self._by_service[instance['service_name']]
+        return instance
+
+    def expire(self):
+        """
+        Removes the instances whose TTL elapsed since their last heartbeat.
+
+        :return:    Number of instances removed
+        """
+        with self._lock:
+            return self._expire()
+
+    def _expire(self):
+        now = self.clock()
+        removed = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, instance_id = heapq.heappop(self._expiry)
+            if self._expires_at.get(instance_id) == expires_at:
+                self._remove(instance_id)
+                removed += 1
+        if removed:
+            self.expired += removed
+            self.modified_at = int(time.time())
+        return removed
+
+    def heartbeat(self, instance_id):
+        """
+        Renews an instance.
+
+        :return:    (status code, response body)
+        """
+        with self._lock:
+            self._expire()
+            instance = self.instances.get(instance_id)
+            if instance is None:
+                return 410, {'Error': 'Instance %s not found' % instance_id}
+            self._renew(instance_id, instance['ttl'])
+        return 200, {}
+
+    def deregister(self, instance_id):
+        """
+        Removes an instance.
+
+        :return:    (status code, response body)
+        """
+        with self._lock:
+            self._expire()
+            if self._remove(instance_id) is None:
+                return 410, {'Error': 'Instance %s not found' % instance_id}
+            self.modified_at = int(time.time())
+        return 200, {}
+
+    def lookup(self, query):
+        """
+        Returns the live instances matching the query filters.
+
+        :param query:   Dict of query parameter to list of values, as returned by parse_qs.
+        :return:        (status code, response body)
+        """
+        fields = _split(query.get('fields'))
+        tags = set(_split(query.get('tags')))
+        service_names = set(_split(query.get('service_name')))
+        statuses = set(_split(query.get('status')))
+
+        with self._lock:
+            self._expire()
+            if service_names:
+                instances = [self.instances[instance_id] for name in service_names
+                             for instance_id in self._by_service.get(name, ())]
+            else:
+                instances = list(self.instances.values())
+
+        matches = []
+        for instance in instances:
+            if statuses and instance['status'] not in statuses:
+                continue
+            if tags and not tags.issubset(instance['tags']):
+                continue
+            matches.append(dict((f, instance[f]) for f in fields if f in instance) if fields else instance)
+        return 200, {'instances': matches}
+
+
+def _gzip(payload):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+        f.write(payload)
+    return buffer.getvalue()
+
+
+def _split(values):
+    """
+    Splits repeated and comma separated query values.
+    """
+    return [part for value in values or () for part in value.split(',') if part]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Routes HTTP requests to the server's StubRegistry."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        if payload and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            payload = _gzip(payload)
+            headers = dict(headers or {}, **{'Content-Encoding': 'gzip'})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _reply_lookup(self, registry, query):
+        """
+        Answers a lookup, or 304 if the client's ETag or Last-Modified date is still current.
+        """
+        modified_at = registry.modified_at
+        status, body = registry.lookup(query)
+        etag = '"%s"' % hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()
+        headers = {'ETag': etag, 'Last-Modified': formatdate(modified_at, usegmt=True)}
+
+        if_none_match = self.headers.get('If-None-Match')
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_none_match is not None:
+            not_modified = etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match == '*'
+        elif if_modified_since is not None:
+            since = parsedate(if_modified_since)
+            not_modified = since is not None and modified_at <= calendar.timegm(since)
+        else:
+            not_modified = False
+
+        if not_modified:
+            registry.not_modified += 1
+            return self._reply(304, None, headers)
+        return self._reply(status, body, headers)
+
+    def _route(self, method):
+        registry = self.server.registry
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if not url.path.startswith(INSTANCES_PATH):
+            return self._reply(404, {'Error': 'Not found'})
+        if not registry.authorized(self.headers.get('Authorization')):
+            return self._reply(401, {'Error': 'Invalid token'})
+
+        delay, error_status = registry.fault()
+        if delay:
+            time.sleep(delay)
+        if error_status is not None:
+            return self._reply(error_status, {'Error': 'Injected failure'})
+
+        parts = [part for part in url.path[len(INSTANCES_PATH):].split('/') if part]
+        if method == 'GET' and not parts:
+            return self._reply_lookup(registry, parse_qs(url.query))
+        if method == 'POST' and not parts:
+            try:
+                payload = json.loads(body.decode('utf-8'))
+            except ValueError:
+                return self._reply(400, {'Error': 'Invalid JSON'})
+            return self._reply(*registry.register(payload))
+        if method == 'PUT' and len(parts) == 2 and parts[1] == 'heartbeat':
+            return self._reply(*registry.heartbeat(parts[0]))
+        if method == 'DELETE' and len(parts) == 1:
+            return self._reply(*registry.deregister(parts[0]))
+        return self._reply(404, {'Error': 'Not found'})
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def do_PUT(self):
+        self._route('PUT')
+
+    def do_DELETE(self):
+        self._route('DELETE')
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Accept bursts of connections, e.g. a heartbeat storm
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on a slow reply, e.g. at their deadline, are expected
+        if not isinstance(sys.exc_info()[1], (IOError, OSError)):
+            HTTPServer.handle_error(self, request, client_address)
+
+
+class StubRegistryServer(object):
+    """Serve a StubRegistry over HTTP on localhost from a background thread"""
+
+    def __init__(self, registry=None, host='127.0.0.1', port=0):
+        """
+        :param registry:    StubRegistry to serve. Defaults to a new one accepting any token.
+        :param host:        Interface to listen on.
+        :param port:        Port to listen on. 0 picks a free port.
+        """
+        self.registry = registry if registry is not None else StubRegistry()
+        self._server = _ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.registry = self.registry
+        self.url = 'http://%s:%d' % (host, self._server.server_port)
+        self.registry.base_url = self.url
+        self._thread = None
+
+    def start(self):
+        """
+        Starts serving requests.
+
+        :return:    This server
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-registry')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving requests and closes the socket.
+        """
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve an in-memory Service Discovery registry.')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on, 0 picks a free port')
+    parser.add_argument('--token', help='token clients must present, any token if omitted')
+    parser.add_argument('--instances', type=int, default=0, help='simulated instances to register')
+    parser.add_argument('--services', type=int, default=1, help='service names the instances are spread over')
+    parser.add_argument('--ttl', type=int, default=300, help='TTL (sec) of the simulated instances')
+    parser.add_argument('--latency', type=float, default=0, help='delay (sec) of every request')
+    parser.add_argument('--latency-jitter', type=float, default=0, help='additional random delay (sec)')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests failed')
+    parser.add_argument('--error-status', type=int, default=503, help='status code of failed requests')
+    parser.add_argument('--seed', type=int, help='random seed, for repeatable latency and errors')
+    args = parser.parse_args(argv)
+
+    registry = StubRegistry(auth_token=args.token, latency=args.latency, latency_jitter=args.latency_jitter,
+                            error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    registry.populate(args.instances, ['service-%d' % i for i in range(args.services)], ttl=args.ttl)
+    server = StubRegistryServer(registry, args.host, args.port).start()
+    print('Serving %d instances on %s' % (len(registry.instances), server.url))
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,47 @@
 import json
+import time
 from os import environ as env
 
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+# Clock for measuring intervals, immune to wall-clock changes where available
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+# (VCAP_SERVICES value, credentials parsed from it) of the last load
+_vcap_credentials = (None, None)
+
 
 def load_credentials(url=None, auth_token=None):
     """
     Returns the Service Discovery credentials, if available
 
+    VCAP_SERVICES is parsed once, and again only if the environment variable changes.
+
     :param url:         Service Discovery API URL
     :param auth_token:  Access token for Service Discovery
     :return:            The URL and Auth credentials
     """
-    if env.get('VCAP_SERVICES') is not None:
-        return {
-            'url': json.loads(env['VCAP_SERVICES'])['service_discovery'][0]['credentials']['url'],
-            'auth_token': json.loads(env['VCAP_SERVICES'])['service_discovery'][0]['credentials']['auth_token']
-        }
+    global _vcap_credentials
+    vcap_services = env.get('VCAP_SERVICES')
+    if vcap_services is not None:
+        loaded_from, credentials = _vcap_credentials
+        if loaded_from is not vcap_services and loaded_from != vcap_services:
+            service_credentials = json.loads(vcap_services)['service_discovery'][0]['credentials']
+            credentials = {
+                'url': service_credentials['url'],
+                'auth_token': service_credentials['auth_token']
+            }
+            _vcap_credentials = (vcap_services, credentials)
+        return dict(credentials)
     else:
         if auth_token is None:
             raise Exception("An auth token is required for Service Discovery")
@@ -24,6 +51,52 @@ def load_credentials(url=None, auth_token=None):
         }
 
 
+def normalize_filter(value):
+    """
+    Returns a lookup filter in canonical, hashable form
+
+    :param value:   None, a string, or a list of values to match.
+    :return:        None for no filter, the string, or a sorted tuple of the distinct values
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, string_types):
+        return value
+    values = tuple(sorted(set(value)))
+    return values if values else None
+
+
+def lookup_key(fields=None, tags=None, service_name=None, status=None):
+    """
+    Returns the key identifying a lookup in caches and coalesced requests
+
+    :return:    (fields, tags, service_name, status) tuple of normalized filters
+    """
+    return (normalize_filter(fields), normalize_filter(tags), normalize_filter(service_name),
+            normalize_filter(status))
+
+
+def build_query(*filters):
+    """
+    Compose a URL-encoded query string from input filters
+
+    :param filters: List of (filter, value) tuples, where value is None, a string, or a list of
+                    values sent comma separated.
+
+    :return:        Query string, empty without filters
+    """
+    parameters = []
+    for name, value in filters:
+        if value is None or value == '':
+            continue
+        values = [value] if isinstance(value, string_types) else value
+        encoded = ','.join(quote(str(item), safe='') for item in values)
+        if encoded:
+            parameters.append('%s=%s' % (quote(name, safe=''), encoded))
+
+    return '?' + '&'.join(parameters) if parameters else ''
+
+
 def add_query_string(*filters):
     """
     Compose a query string from input filters
@@ -32,10 +105,26 @@ def add_query_string(*filters):
 
     :return:        Query string
     """
-    status_query = ''
-    for fil in filters:
-        if fil[1] is not None and fil[1] != '':
-            status_query = '?' if status_query == '' else status_query + '&'
-            status_query += '%s=%s' % (fil[0], fil[1])
+    return build_query(*filters)
+
 
-    return status_query
+def key_from_json(value):
+    """
+    Converts a JSON-decoded lookup key back to the hashable tuple it was encoded from
+
+    :param value:   Decoded key, where tuples became lists.
+    :return:        Lookup key
+    """
+    if isinstance(value, list):
+        return tuple(key_from_json(item) for item in value)
+    return value
+
+
+def single_line_json(text):
+    """
+    Returns a JSON document with no line breaks, re-encoding it only if needed
+
+    :param text:    JSON document.
+    :return:        JSON document on a single line
+    """
+    return json.dumps(json.loads(text)) if '\n' in text else text
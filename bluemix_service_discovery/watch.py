@@ -0,0 +1,218 @@
+"""
+ Background refresh of service catalogs with change notification
+"""
+import logging
+import threading
+from bluemix_service_discovery.utils import monotonic
+
+logger = logging.getLogger(__name__)
+
+# Fields whose change is reported; last_heartbeat changes on every heartbeat of a live instance
+CHANGE_FIELDS = ('endpoint', 'protocol', 'tags', 'status', 'ttl')
+
+
+class CatalogDiff(object):
+    """Instances added, removed and changed between two refreshes of a catalog"""
+
+    __slots__ = ('added', 'removed', 'changed')
+
+    def __init__(self, added=(), removed=(), changed=()):
+        """
+        :param added:   Instances that were not in the previous snapshot.
+        :param removed: Instances that are no longer registered.
+        :param changed: Instances whose CHANGE_FIELDS changed, as in the new snapshot.
+        """
+        self.added = tuple(added)
+        self.removed = tuple(removed)
+        self.changed = tuple(changed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return 'CatalogDiff(added=%d, removed=%d, changed=%d)' % (
+            len(self.added), len(self.removed), len(self.changed))
+
+
+class Snapshot(object):
+    """Immutable view of a catalog query at one refresh"""
+
+    __slots__ = ('instances', 'version', 'refreshed_at', '_by_id')
+
+    def __init__(self, instances, version, refreshed_at):
+        """
+        :param instances:       Tuple of ServiceInstance.
+        :param version:         Number of changes seen for this query, starting at 1.
+        :param refreshed_at:    Monotonic time the catalog was fetched.
+        """
+        self.instances = instances
+        self.version = version
+        self.refreshed_at = refreshed_at
+        self._by_id = dict((instance.id, instance) for instance in instances)
+
+    def get(self, instance_id):
+        """
+        Returns the instance with the given ID, or None.
+        """
+        return self._by_id.get(instance_id)
+
+    def diff(self, instances):
+        """
+        Compares this snapshot with a newer list of instances.
+
+        :param instances:   ServiceInstance objects of the newer catalog.
+        :return:            CatalogDiff
+        """
+        added, changed = [], []
+        seen = set()
+        for instance in instances:
+            seen.add(instance.id)
+            previous = self._by_id.get(instance.id)
+            if previous is None:
+                added.append(instance)
+            elif any(getattr(previous, field) != getattr(instance, field) for field in CHANGE_FIELDS):
+                changed.append(instance)
+        removed = [instance for instance in self.instances if instance.id not in seen]
+        return CatalogDiff(added, removed, changed)
+
+    def __iter__(self):
+        return iter(self.instances)
+
+    def __len__(self):
+        return len(self.instances)
+
+
+_EMPTY = Snapshot((), 0, None)
+
+
+class CatalogWatcher(object):
+    """Refresh a set of catalog queries in the background and notify subscribers of changes"""
+
+    def __init__(self, locator, interval=30):
+        """
+        Initializes the watcher.
+
+        :param locator:     ServiceLocator used to fetch the catalogs.
+        :param interval:    Time (sec) between refreshes.
+        """
+        self.locator = locator
+        self.interval = interval
+
+        self._queries = {}
+        self._snapshots = {}
+        self._subscribers = ()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, name, fields=None, tags=None, service_name=None, status=None):
+        """
+        Adds a catalog query to refresh.
+
+        :param name:            Name the query's snapshots and notifications are reported under.
+        :param fields:          Comma separated list of fields to include in response.
+        :param tags:            Comma separated list of tags that returned instances must have.
+        :param service_name:    Name of instances to return.
+        :param status:          State of instances to be return.
+        """
+        with self._lock:
+            self._queries[name] = (fields, tags, service_name, status)
+
+    def unwatch(self, name):
+        """
+        Stops refreshing a catalog query and drops its snapshot.
+        """
+        with self._lock:
+            self._queries.pop(name, None)
+            self._snapshots.pop(name, None)
+
+    def subscribe(self, callback):
+        """
+        Registers a callback called as callback(name, diff, snapshot) whenever a catalog changes.
+        """
+        with self._lock:
+            self._subscribers = self._subscribers + (callback,)
+
+    def unsubscribe(self, callback):
+        """
+        Removes a callback registered with subscribe().
+        """
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s != callback)
+
+    def snapshot(self, name):
+        """
+        Returns the latest snapshot of a query without locking. Empty until the first refresh.
+
+        :param name:    Name of the query.
+        :return:        Snapshot
+        """
+        return self._snapshots.get(name, _EMPTY)
+
+    def refresh(self, name=None):
+        """
+        Refreshes one query, or all of them, and notifies subscribers of changes.
+
+        :param name:    Name of the query. Defaults to all queries.
+        :return:        Dict of query name to CatalogDiff, for queries that changed
+        """
+        with self._lock:
+            queries = dict(self._queries) if name is None else {name: self._queries[name]}
+
+        changes = {}
+        for query_name, filters in queries.items():
+            try:
+                instances = self.locator.get_services(*filters, parsed=True)
+            except Exception:
+                logger.exception('Error refreshing catalog %s', query_name)
+                continue
+
+            previous = self.snapshot(query_name)
+            diff = previous.diff(instances)
+            if not diff and previous is not _EMPTY:
+                continue
+
+            snapshot = Snapshot(tuple(instances), previous.version + 1, monotonic())
+            with self._lock:
+                if query_name not in self._queries:
+                    continue
+                self._snapshots[query_name] = snapshot
+            if diff:
+                changes[query_name] = diff
+                self._notify(query_name, diff, snapshot)
+
+        return changes
+
+    def start(self):
+        """
+        Starts refreshing in a background thread. The first refresh happens immediately.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='catalog-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def _notify(self, name, diff, snapshot):
+        for callback in self._subscribers:
+            try:
+                callback(name, diff, snapshot)
+            except Exception:
+                logger.exception('Error notifying catalog subscriber')
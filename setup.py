@@ -37,4 +37,7 @@ setup(
     keywords='service-discovery service-registry microservices',
     packages=find_packages(exclude=['tests']),
     install_requires=['requests>=2'],
+    extras_require={
+        'async': ['aiohttp>=3'],
+    },
 )
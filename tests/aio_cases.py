@@ -0,0 +1,208 @@
+"""
+Test cases of the asyncio clients, imported by test_aio on Python 3.6+ only as they use async def
+"""
+import unittest
+import asyncio
+import gc
+import threading
+import warnings
+try:
+    from http.server import HTTPServer
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+from bluemix_service_discovery import aio
+from bluemix_service_discovery.breaker import CircuitBreaker, HALF_OPEN
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.context import RegistryContext
+from bluemix_service_discovery.heartbeat import FixedInterval
+from bluemix_service_discovery.stub_registry import StubRegistry, StubRegistryServer
+from bluemix_service_discovery.utils import monotonic
+from tests.test_connection import _StandInHandler
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(AsyncClientTestCase('test_concurrent_lookups'))
+    test_suite.addTest(AsyncClientTestCase('test_identical_lookups_coalesced'))
+    test_suite.addTest(AsyncClientTestCase('test_conditional_lookup'))
+    test_suite.addTest(AsyncClientTestCase('test_publisher_lifecycle'))
+    test_suite.addTest(AsyncClientTestCase('test_default_pool_across_loops'))
+    test_suite.addTest(AsyncClientTestCase('test_blocking_pool_rejected'))
+    test_suite.addTest(AsyncClientTestCase('test_heartbeat_task_survives_errors'))
+    test_suite.addTest(AsyncClientTestCase('test_index_kept_without_cache'))
+    test_suite.addTest(AsyncClientTestCase('test_cancelled_probe_not_recorded'))
+    test_suite.addTest(AsyncClientTestCase('test_iter_services'))
+    return test_suite
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+@unittest.skipIf(aio.aiohttp is None, 'asyncio support requires aiohttp')
+class AsyncClientTestCase(unittest.TestCase):
+    """Tests for AsyncServiceLocator and AsyncServicePublisher."""
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), _StandInHandler)
+        self.server.ports = []
+        self.server.url = 'http://127.0.0.1:%d' % self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.loop = asyncio.new_event_loop()
+        self.pool = aio.AsyncConnectionPool(pool_connections=1, pool_maxsize=1)
+
+    def test_concurrent_lookups(self):
+        """Do concurrent lookups complete over one pooled connection?"""
+        locator = aio.AsyncServiceLocator(self.server.url, 'token', pool=self.pool)
+
+        async def lookups():
+            return await asyncio.gather(*[locator.get_services(service_name='service-%d' % i, parsed=True)
+                                          for i in range(10)])
+
+        results = self.loop.run_until_complete(lookups())
+        self.assertEqual(results, [()] * 10)
+        self.assertEqual(len(self.server.ports), 10)
+        self.assertEqual(len(set(self.server.ports)), 1)
+
+    def test_identical_lookups_coalesced(self):
+        """Do concurrent identical lookups share one request?"""
+        locator = aio.AsyncServiceLocator(self.server.url, 'token', pool=self.pool)
+
+        async def lookups():
+            return await asyncio.gather(*[locator.get_services(parsed=True) for _ in range(10)])
+
+        results = self.loop.run_until_complete(lookups())
+        self.assertEqual(results, [()] * 10)
+        self.assertEqual(len(self.server.ports), 1)
+        self.assertEqual(locator.coalesced, 9)
+
+    def test_conditional_lookup(self):
+        """Is an unchanged catalog revalidated and reused?"""
+        with StubRegistryServer() as server:
+            server.registry.register({'service_name': 'test-service', 'endpoint': {'value': 'https://test'}})
+            locator = aio.AsyncServiceLocator(server.url, 'token', pool=self.pool)
+
+            async def lookups():
+                return [await locator.get_services(parsed=True) for _ in range(2)]
+
+            first, second = self.loop.run_until_complete(lookups())
+            self.assertIs(second, first)
+            self.assertEqual(locator.not_modified, 1)
+
+    def test_publisher_lifecycle(self):
+        """Can a service be registered, heartbeated and de-registered?"""
+        publisher = aio.AsyncServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net',
+                                              'http', url=self.server.url, auth_token='token', pool=self.pool)
+
+        async def lifecycle():
+            instance = await publisher.register_service(True, parsed=True)
+            heartbeat_time = await publisher.heartbeat_service()
+            await publisher.deregister_service()
+            return instance, heartbeat_time
+
+        instance, heartbeat_time = self.loop.run_until_complete(lifecycle())
+        self.assertEqual(instance.id, 'abc')
+        self.assertIsInstance(heartbeat_time, str)
+        self.assertFalse(publisher.registered)
+        self.assertTrue(publisher.heartbeat_task.done())
+
+    def test_default_pool_across_loops(self):
+        """Does the shared pool serve successive event loops, closing the session of each?"""
+        with StubRegistryServer() as server:
+            locator = aio.AsyncServiceLocator(server.url, 'token')
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                for _ in range(2):
+                    loop = asyncio.new_event_loop()
+                    self.assertEqual(loop.run_until_complete(locator.get_services(parsed=True)), ())
+                    loop.run_until_complete(loop.shutdown_asyncgens())
+                    loop.close()
+                gc.collect()
+            self.assertEqual([w for w in caught if issubclass(w.category, ResourceWarning)], [])
+
+    def test_blocking_pool_rejected(self):
+        """Is a context without an AsyncConnectionPool rejected before any request is sent?"""
+        for context in (RegistryContext(self.server.url, 'token', pool=ConnectionPool()),
+                        RegistryContext(self.server.url, 'token')):
+            self.assertRaises(TypeError, aio.AsyncServiceLocator, context=context)
+            self.assertRaises(TypeError, aio.AsyncServicePublisher, 'test-service', 300, 'UP', 'https://test',
+                              'http', context=context)
+        self.assertEqual(self.server.ports, [])
+        context = RegistryContext(self.server.url, 'token', pool=self.pool)
+        self.assertIs(aio.AsyncServiceLocator(context=context).pool, self.pool)
+
+    def test_heartbeat_task_survives_errors(self):
+        """Does the heartbeat task keep beating after an error that is not from the registry?"""
+        publisher = aio.AsyncServicePublisher('test-service', 1, 'UP', 'https://test-service.mybluemix.net',
+                                              'http', url=self.server.url, auth_token='token', pool=self.pool,
+                                              interval_policy=FixedInterval(fraction=.1))
+        beats = []
+
+        async def failing_beat():
+            beats.append(1)
+            raise ValueError('Unexpected error')
+
+        async def beat_with_errors():
+            await publisher.register_service(True)
+            publisher._beat = failing_beat
+            await asyncio.sleep(.5)
+            running = not publisher.heartbeat_task.done()
+            await publisher.deregister_service()
+            return running
+
+        self.assertTrue(self.loop.run_until_complete(beat_with_errors()))
+        self.assertGreaterEqual(len(beats), 2)
+        self.assertTrue(publisher.heartbeat_task.done())
+
+    def test_index_kept_without_cache(self):
+        """Is the index of a locator without a cache reused instead of fetched again?"""
+        with StubRegistryServer() as server:
+            server.registry.populate(10, tags=[['zone=a'], ['zone=b']])
+            locator = aio.AsyncServiceLocator(server.url, 'token', pool=self.pool)
+
+            async def indexes():
+                return [await locator.get_index(status='UP') for _ in range(2)]
+
+            first, second = self.loop.run_until_complete(indexes())
+            self.assertIs(second, first)
+            self.assertEqual(len(first.select('zone=a')), 5)
+            self.assertEqual((locator.index_cache.misses, locator.index_cache.hits), (1, 1))
+
+    def test_cancelled_probe_not_recorded(self):
+        """Does a probe cancelled by a timeout leave a half-open circuit half-open?"""
+        breaker = CircuitBreaker(min_requests=1, reset_timeout=60)
+        breaker.record_failure()
+        breaker._opened_at = monotonic() - 61
+        with StubRegistryServer(StubRegistry(latency=.5)) as server:
+            lookup = aio.send(self.pool, 'GET', server.url + '/api/v1/instances', 'service lookup',
+                              'Error on service lookup', breaker=breaker)
+            self.assertRaises(asyncio.TimeoutError, self.loop.run_until_complete, asyncio.wait_for(lookup, .05))
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.before_request()
+
+    def test_iter_services(self):
+        """Are the instances of a lookup streamed in chunks the same as those of a buffered lookup?"""
+        with StubRegistryServer() as server:
+            server.registry.populate(5, tags=[['zone=a'], ['zone=b']])
+            locator = aio.AsyncServiceLocator(server.url, 'token', pool=self.pool)
+
+            async def lookups():
+                first = [instance async for instance in locator.iter_services(chunk_size=16)]
+                second = [instance async for instance in locator.iter_services(tags='zone=a')]
+                return first, second, await locator.get_services(parsed=True)
+
+            first, second, buffered = self.loop.run_until_complete(lookups())
+            self.assertEqual([instance.id for instance in first], [instance.id for instance in buffered])
+            self.assertEqual(len(second), 3)
+            self.assertTrue(all('zone=a' in instance.tags for instance in second))
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.pool.close())
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
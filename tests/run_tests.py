@@ -6,7 +6,29 @@ import unittest
 
 test_modules = [
     'tests.test_service_publisher',
-    'tests.test_service_locator'
+    'tests.test_service_locator',
+    'tests.test_connection',
+    'tests.test_cache',
+    'tests.test_models',
+    'tests.test_aio',
+    'tests.test_scheduler',
+    'tests.test_bulk',
+    'tests.test_picker',
+    'tests.test_watch',
+    'tests.test_retry',
+    'tests.test_stub_registry',
+    'tests.test_breaker',
+    'tests.test_snapshot',
+    'tests.test_shared',
+    'tests.test_single_flight',
+    'tests.test_metrics',
+    'tests.test_heartbeat',
+    'tests.test_utils',
+    'tests.test_streaming',
+    'tests.test_conditional',
+    'tests.test_context',
+    'tests.test_shutdown',
+    'tests.test_index'
     ]
 
 suite = unittest.TestSuite()
@@ -0,0 +1,12 @@
+import unittest
+import sys
+
+# The test cases use async def (Python 3.6+ for the clients), so they are only imported where they compile
+if sys.version_info >= (3, 6):
+    from tests.aio_cases import AsyncClientTestCase, suite
+else:
+    def suite():
+        return unittest.TestSuite()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import json
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+from bluemix_service_discovery.cache import LookupCache
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.utils import monotonic
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(CircuitBreakerTestCase('test_opens_on_failure_rate'))
+    test_suite.addTest(CircuitBreakerTestCase('test_half_open_probe'))
+    test_suite.addTest(CircuitBreakerTestCase('test_abandoned_probe_released'))
+    test_suite.addTest(CircuitBreakerTestCase('test_locator_fails_fast'))
+    test_suite.addTest(CircuitBreakerTestCase('test_locator_serves_cache_while_open'))
+    test_suite.addTest(CircuitBreakerTestCase('test_timeouts_per_operation'))
+    return test_suite
+
+
+class _Response(object):
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+
+class _Pool(object):
+    """Pool stand-in failing while down, recording request timeouts."""
+
+    def __init__(self):
+        self.down = False
+        self.timeouts = []
+
+    def request(self, method, url, **kwargs):
+        self.timeouts.append(kwargs.get('timeout'))
+        if self.down:
+            raise IOError('connection refused')
+        return _Response(200, {'instances': [{'id': 'abc'}]})
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    """Tests for CircuitBreaker."""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_rate=0.5, min_requests=4, reset_timeout=60)
+        self.pool = _Pool()
+
+    def test_opens_on_failure_rate(self):
+        """Does the circuit open once enough requests failed?"""
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertRaises(exceptions.CircuitOpenException, self.breaker.before_request)
+
+    def test_half_open_probe(self):
+        """Is a single probe let through after the reset timeout?"""
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.breaker._opened_at = monotonic() - 61
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertRaises(exceptions.CircuitOpenException, self.breaker.before_request)
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_abandoned_probe_released(self):
+        """Does an abandoned probe free its slot without closing the circuit?"""
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.breaker._opened_at = monotonic() - 61
+        self.breaker.before_request()
+        self.breaker.release()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.before_request()
+        self.assertRaises(exceptions.CircuitOpenException, self.breaker.before_request)
+
+    def test_locator_fails_fast(self):
+        """Are lookups refused without a request while the circuit is open?"""
+        locator = ServiceLocator('http://registry', 'token', pool=self.pool, breaker=self.breaker)
+        self.pool.down = True
+        for _ in range(4):
+            self.assertRaises(exceptions.TransportException, locator.get_services)
+        self.assertRaises(exceptions.CircuitOpenException, locator.get_services)
+        self.assertEqual(len(self.pool.timeouts), 4)
+
+    def test_locator_serves_cache_while_open(self):
+        """Is an expired cached result served while the circuit is open?"""
+        cache = LookupCache(ttl=60, stale_ttl=0)
+        locator = ServiceLocator('http://registry', 'token', pool=self.pool, cache=cache, breaker=self.breaker)
+        locator.get_services()
+        cache.put((None, None, None, None), cache.peek((None, None, None, None)), stored_at=monotonic() - 120)
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.assertEqual(locator.get_services(parsed=True)[0].id, 'abc')
+
+    def test_timeouts_per_operation(self):
+        """Are the configured timeouts passed with each request?"""
+        locator = ServiceLocator('http://registry', 'token', pool=self.pool, timeouts={'lookup': (1, 2)})
+        locator.get_services()
+        ServiceLocator('http://registry', 'token', pool=self.pool).get_services()
+        self.assertEqual(self.pool.timeouts[0], (1, 2))
+        self.assertEqual(self.pool.timeouts[1], (3.05, 10))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import time
+from bluemix_service_discovery import bulk, exceptions
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(BulkTestCase('test_register_services_concurrently'))
+    test_suite.addTest(BulkTestCase('test_register_services_errors'))
+    test_suite.addTest(BulkTestCase('test_deregister_services'))
+    return test_suite
+
+
+class _Publisher(object):
+    """Publisher stand-in whose calls take a fixed time."""
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.registered = False
+
+    def register_service(self, heartbeat=True, parsed=False):
+        time.sleep(0.1)
+        if self.fail:
+            raise exceptions.ValidationException('Bad request to service registry')
+        self.registered = True
+        return self.name
+
+    def deregister_service(self, wait_heartbeat=True):
+        time.sleep(0.1)
+        self.registered = False
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class BulkTestCase(unittest.TestCase):
+    """Tests for bulk registration and de-registration."""
+
+    def test_register_services_concurrently(self):
+        """Are registrations run in parallel and returned in order?"""
+        publishers = [_Publisher('service-%d' % i) for i in range(8)]
+        start = time.time()
+        results = bulk.register_services(publishers, max_workers=8)
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual([result.result for result in results], [p.name for p in publishers])
+        self.assertTrue(all(result.succeeded for result in results))
+
+    def test_register_services_errors(self):
+        """Is a failing registration reported without affecting the others?"""
+        publishers = [_Publisher('ok'), _Publisher('bad', fail=True)]
+        results = bulk.register_services(publishers, max_workers=2)
+        self.assertTrue(results[0].succeeded)
+        self.assertIsInstance(results[1].error, exceptions.ValidationException)
+        self.assertFalse(publishers[1].registered)
+
+    def test_deregister_services(self):
+        """Are registered publishers drained in parallel?"""
+        publishers = [_Publisher('service-%d' % i) for i in range(8)]
+        for publisher in publishers[:6]:
+            publisher.registered = True
+        start = time.time()
+        results = bulk.deregister_services(publishers)
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertFalse(any(publisher.registered for publisher in publishers))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import time
+from bluemix_service_discovery.cache import LookupCache
+from bluemix_service_discovery.utils import monotonic
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(LookupCacheTestCase('test_hit_and_miss'))
+    test_suite.addTest(LookupCacheTestCase('test_lru_eviction'))
+    test_suite.addTest(LookupCacheTestCase('test_stale_while_revalidate'))
+    test_suite.addTest(LookupCacheTestCase('test_expired_entry_reloaded'))
+    return test_suite
+
+
+class _Loader(object):
+    """Callable that counts invocations and returns the call number."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.calls
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class LookupCacheTestCase(unittest.TestCase):
+    """Tests for LookupCache."""
+
+    def test_hit_and_miss(self):
+        """Is the loader only called on a miss?"""
+        cache = LookupCache(ttl=60)
+        loader = _Loader()
+        self.assertEqual(cache.get(('a',), loader), 1)
+        self.assertEqual(cache.get(('a',), loader), 1)
+        self.assertEqual(loader.calls, 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_lru_eviction(self):
+        """Is the least recently used entry evicted past max_size?"""
+        cache = LookupCache(ttl=60, max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a', _Loader())
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.peek('b'))
+        self.assertEqual(cache.peek('a'), 1)
+
+    def test_stale_while_revalidate(self):
+        """Is a stale entry served while it is refreshed in the background?"""
+        cache = LookupCache(ttl=60)
+        loader = _Loader()
+        cache.put('a', 'old', stored_at=monotonic() - 3600)
+        self.assertEqual(cache.get('a', loader), 'old')
+        for _ in range(100):
+            if cache.stats()['refreshes']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+        self.assertEqual(cache.stats()['refreshes'], 1)
+        self.assertEqual(cache.get('a', loader), 1)
+
+    def test_expired_entry_reloaded(self):
+        """With stale serving disabled, is an expired entry reloaded inline?"""
+        cache = LookupCache(ttl=60, stale_ttl=0)
+        loader = _Loader()
+        cache.put('a', 'old', stored_at=monotonic() - 3600)
+        self.assertEqual(cache.get('a', loader), 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import json
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.metrics import PrometheusCollector
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(ConditionalLookupTestCase('test_unchanged_catalog_reused'))
+    test_suite.addTest(ConditionalLookupTestCase('test_changed_catalog_fetched'))
+    test_suite.addTest(ConditionalLookupTestCase('test_validators_per_filter'))
+    test_suite.addTest(ConditionalLookupTestCase('test_stub_headers'))
+    return test_suite
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class ConditionalLookupTestCase(unittest.TestCase):
+    """Tests for compressed and conditional lookups."""
+
+    def setUp(self):
+        self.server = StubRegistryServer().start()
+        self.pool = ConnectionPool()
+        self.register('test-service')
+        self.metrics = PrometheusCollector()
+        self.locator = ServiceLocator(self.server.url, 'token', pool=self.pool, metrics=self.metrics)
+
+    def register(self, name):
+        ServicePublisher(name, 300, 'UP', 'https://%s.mybluemix.net' % name, 'http', url=self.server.url,
+                         auth_token='token', pool=self.pool).register_service(False)
+
+    def test_unchanged_catalog_reused(self):
+        """Is an unchanged catalog revalidated and its parsed instances reused?"""
+        first = self.locator.get_services(parsed=True)
+        second = self.locator.get_services(parsed=True)
+        self.assertIs(second, first)
+        self.assertEqual(self.locator.not_modified, 1)
+        self.assertEqual(self.server.registry.not_modified, 1)
+        self.assertEqual(self.metrics.get('service_discovery_client_requests_total', operation='lookup',
+                                          status='304'), 1)
+
+    def test_changed_catalog_fetched(self):
+        """Is a changed catalog downloaded again?"""
+        self.assertEqual(len(self.locator.get_services(parsed=True)), 1)
+        self.register('other-service')
+        self.assertEqual(len(self.locator.get_services(parsed=True)), 2)
+        self.assertEqual(self.locator.not_modified, 0)
+
+    def test_validators_per_filter(self):
+        """Are validators remembered per filter tuple?"""
+        self.register('other-service')
+        self.locator.get_services(service_name='test-service')
+        self.locator.get_services(service_name='other-service')
+        self.assertEqual(self.locator.not_modified, 0)
+        text = self.locator.get_services(service_name='other-service')
+        self.assertEqual(self.locator.not_modified, 1)
+        self.assertEqual([i['service_name'] for i in json.loads(text)['instances']], ['other-service'])
+
+    def test_stub_headers(self):
+        """Does the stub registry compress and honor If-None-Match and If-Modified-Since?"""
+        url = self.server.url + '/api/v1/instances'
+        auth = {'Authorization': 'Bearer token'}
+        response = self.pool.request('GET', url, headers=dict(auth, **{'Accept-Encoding': 'gzip'}))
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(len(response.json()['instances']), 1)
+
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+        self.assertEqual(self.pool.request('GET', url, headers=dict(auth, **{'If-None-Match': etag})).status_code,
+                         304)
+        self.assertEqual(self.pool.request('GET', url, headers=dict(auth, **{'If-None-Match': '"other"'}))
+                         .status_code, 200)
+        self.assertEqual(self.pool.request('GET', url, headers=dict(auth, **{'If-Modified-Since': last_modified}))
+                         .status_code, 304)
+        self.assertEqual(self.pool.request('GET', url, headers=dict(
+            auth, **{'If-Modified-Since': 'Thu, 01 Jan 2015 00:00:00 GMT'})).status_code, 200)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import json
+import threading
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(ConnectionPoolTestCase('test_connections_reused'))
+    test_suite.addTest(ConnectionPoolTestCase('test_pool_shared_by_clients'))
+    return test_suite
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Answers every Service Discovery call and records the client port used."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, body):
+        self.server.ports.append(self.client_address[1])
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._reply(200, {'instances': []})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self._reply(201, {'id': 'abc', 'links': {'heartbeat': self.server.url + '/api/v1/instances/abc/heartbeat'}})
+
+    def do_PUT(self):
+        self._reply(200, {})
+
+    def do_DELETE(self):
+        self._reply(200, {})
+
+    def log_message(self, *args):
+        pass
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    """Tests for ConnectionPool."""
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), _StandInHandler)
+        self.server.ports = []
+        self.server.url = 'http://127.0.0.1:%d' % self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.pool = ConnectionPool(pool_connections=1, pool_maxsize=1)
+
+    def test_connections_reused(self):
+        """Do consecutive lookups share one keep-alive connection?"""
+        locator = ServiceLocator(self.server.url, 'token', pool=self.pool)
+        for _ in range(5):
+            locator.get_services()
+        self.assertEqual(len(self.server.ports), 5)
+        self.assertEqual(len(set(self.server.ports)), 1)
+
+    def test_pool_shared_by_clients(self):
+        """Do a locator and a publisher go through the injected pool?"""
+        locator = ServiceLocator(self.server.url, 'token', pool=self.pool)
+        publisher = ServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                     url=self.server.url, auth_token='token', pool=self.pool)
+        publisher.register_service(False)
+        publisher.heartbeat_service()
+        locator.get_services()
+        publisher.deregister_service()
+        self.assertEqual(len(self.server.ports), 4)
+        self.assertEqual(len(set(self.server.ports)), 1)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
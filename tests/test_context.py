@@ -0,0 +1,144 @@
+import unittest
+import gc
+import json
+import weakref
+from bluemix_service_discovery import context as registry_context
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.context import RegistryContext, get_context
+from bluemix_service_discovery.retry import RetryPolicy
+from bluemix_service_discovery.scheduler import HeartbeatScheduler
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(RegistryContextTestCase('test_context_shared'))
+    test_suite.addTest(RegistryContextTestCase('test_own_settings'))
+    test_suite.addTest(RegistryContextTestCase('test_headers_reused'))
+    test_suite.addTest(RegistryContextTestCase('test_explicit_context'))
+    test_suite.addTest(RegistryContextTestCase('test_unused_contexts_released'))
+    test_suite.addTest(RegistryContextTestCase('test_assignable_credentials'))
+    return test_suite
+
+
+class _RecordingPool(object):
+    """Pool recording the headers of the requests it sends."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.headers = []
+
+    def request(self, method, url, **kwargs):
+        self.headers.append(kwargs.get('headers'))
+        return self.pool.request(method, url, **kwargs)
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class RegistryContextTestCase(unittest.TestCase):
+    """Tests for RegistryContext."""
+
+    def setUp(self):
+        self.server = StubRegistryServer().start()
+        self.pool = ConnectionPool()
+
+    def publisher(self, name='test-service', tags=None, **kwargs):
+        if 'context' not in kwargs:
+            kwargs.update(url=self.server.url, auth_token='token', pool=self.pool)
+        return ServicePublisher(name, 300, 'UP', 'https://%s.mybluemix.net' % name, 'http', tags=tags, **kwargs)
+
+    def test_context_shared(self):
+        """Do clients of the same registry share one context?"""
+        first, second = self.publisher('a', ['web', 'v1']), self.publisher('b', ['web', 'v1'])
+        locator = ServiceLocator(self.server.url, 'token', pool=self.pool)
+        self.assertIs(first.context, second.context)
+        self.assertIs(locator.context, first.context)
+        self.assertIs(first.context, get_context(self.server.url, 'token', self.pool))
+        self.assertEqual(first.tags, ['web', 'v1'])
+        for attribute in ('url', 'token', 'pool', 'scheduler', 'retry', 'breaker', 'timeouts', 'metrics'):
+            self.assertNotIn(attribute, vars(first))
+        self.assertEqual(first.url, self.server.url)
+
+        other = ServicePublisher('c', 300, 'UP', 'https://c', 'http', url=self.server.url, auth_token='other',
+                                 pool=self.pool)
+        self.assertIsNot(other.context, first.context)
+
+    def test_own_settings(self):
+        """Does a client with its own settings keep the shared credentials?"""
+        retry = RetryPolicy()
+        publisher = self.publisher(retry=retry, timeouts={'heartbeat': 1})
+        self.assertIsNot(publisher.context, self.publisher().context)
+        self.assertIs(publisher.retry, retry)
+        self.assertEqual(publisher.timeouts['heartbeat'], 1)
+        self.assertEqual(publisher.token, 'token')
+
+    def test_headers_reused(self):
+        """Are the same prebuilt headers sent by every heartbeat?"""
+        pool = _RecordingPool(self.pool)
+        publisher = self.publisher(context=RegistryContext(self.server.url, 'token', pool=pool))
+        publisher.register_service(False)
+        publisher.heartbeat_service()
+        publisher.heartbeat_service()
+        publisher.deregister_service()
+        register, first, second, deregister = pool.headers
+        self.assertIs(first, second)
+        self.assertIs(deregister, first)
+        self.assertEqual(first, {'Authorization': 'Bearer token'})
+        self.assertEqual(register['content-type'], 'application/json')
+
+    def test_explicit_context(self):
+        """Do publishers attached to a context use its scheduler and settings?"""
+        scheduler = HeartbeatScheduler()
+        context = RegistryContext(self.server.url, 'token', pool=self.pool, scheduler=scheduler)
+        publishers = [self.publisher('service-%d' % i, context=context) for i in range(3)]
+        for publisher in publishers:
+            self.assertIs(publisher.context, context)
+            publisher.register_service()
+            self.assertIn(publisher, scheduler)
+
+        locator = ServiceLocator(context=context)
+        self.assertEqual(len(json.loads(locator.get_services())['instances']), 3)
+        for publisher in publishers:
+            publisher.deregister_service()
+        self.assertEqual(len(scheduler), 0)
+        scheduler.stop()
+
+    def test_unused_contexts_released(self):
+        """Are shared contexts, with their scheduler, released with their last client?"""
+        publishers = [self.publisher('service-%d' % i, scheduler=HeartbeatScheduler()) for i in range(100)]
+        contexts = set(publisher.context for publisher in publishers)
+        self.assertEqual(len(contexts), 100)
+        scheduler = weakref.ref(publishers[0].scheduler)
+        del publishers, contexts
+        gc.collect()
+        self.assertIsNone(scheduler())
+        self.assertEqual([key for key in registry_context._contexts.keys() if key[0] == self.server.url], [])
+
+    def test_assignable_credentials(self):
+        """Does assigning url or token move only that client to the new credentials?"""
+        first, second = self.publisher('a', ['web']), self.publisher('b')
+        first.tags.append('v2')
+        first.token = 'other'
+        self.assertEqual(first.token, 'other')
+        self.assertEqual(first.context.auth_headers, {'Authorization': 'Bearer other'})
+        self.assertEqual(second.token, 'token')
+
+        with StubRegistryServer() as server:
+            first.url = server.url
+            self.assertEqual(first.context.instances_url, server.url + '/api/v1/instances')
+            first.register_service(False)
+            self.assertEqual(list(server.registry.instances.values())[0]['tags'], ['web', 'v2'])
+            self.assertEqual(self.server.registry.instances, {})
+            first.deregister_service()
+        self.assertEqual(second.url, self.server.url)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+import time
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.heartbeat import (AdaptiveInterval, FixedInterval, HeartbeatHistory, failure_delay,
+                                                 format_heartbeat, heartbeat_deadline)
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.stub_registry import StubRegistry, StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(HeartbeatHistoryTestCase('test_capacity_bounded'))
+    test_suite.addTest(HeartbeatHistoryTestCase('test_success_rate'))
+    test_suite.addTest(HeartbeatHistoryTestCase('test_jitter'))
+    test_suite.addTest(HeartbeatHistoryTestCase('test_publisher_history'))
+    test_suite.addTest(HeartbeatIntervalTestCase('test_fixed_interval'))
+    test_suite.addTest(HeartbeatIntervalTestCase('test_adaptive_interval'))
+    test_suite.addTest(HeartbeatIntervalTestCase('test_slow_registry_interval'))
+    test_suite.addTest(HeartbeatIntervalTestCase('test_heartbeat_deadline'))
+    test_suite.addTest(HeartbeatIntervalTestCase('test_failure_delay'))
+    test_suite.addTest(HeartbeatIntervalTestCase('test_failed_heartbeat_retried'))
+    return test_suite
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class HeartbeatHistoryTestCase(unittest.TestCase):
+    """Tests for HeartbeatHistory."""
+
+    def test_capacity_bounded(self):
+        """Are only the latest attempts kept, and the last success remembered?"""
+        history = HeartbeatHistory(capacity=4)
+        for second in range(10):
+            history.record(1000.0 + second)
+        self.assertEqual(len(history), 4)
+        self.assertEqual(history.last_success, 1009.0)
+
+        for second in range(10, 14):
+            history.record(1000.0 + second, succeeded=False)
+        self.assertEqual(history.last_success, 1009.0)
+        self.assertEqual(history.success_rate(), 0)
+
+        history.clear()
+        self.assertEqual(len(history), 0)
+        self.assertIsNone(history.last_success)
+        self.assertIsNone(history.success_rate())
+
+    def test_success_rate(self):
+        """Is the success rate computed over the kept attempts?"""
+        history = HeartbeatHistory(capacity=4)
+        for second, succeeded in enumerate([False, False, True, False, True, True]):
+            history.record(1000.0 + second, succeeded)
+        self.assertEqual(history.success_rate(), .75)
+
+    def test_jitter(self):
+        """Is jitter the deviation of the intervals between successful beats?"""
+        history = HeartbeatHistory()
+        self.assertIsNone(history.jitter())
+        for timestamp in (0.0, 10.0, 20.0, 30.0):
+            history.record(timestamp)
+        self.assertEqual(history.jitter(), 0)
+
+        history.record(35.0, succeeded=False)
+        history.record(44.0)
+        history.record(50.0)
+        # Intervals 10, 10, 10, 14, 6
+        self.assertAlmostEqual(history.jitter(), (32 / 5.0) ** .5)
+
+    def test_publisher_history(self):
+        """Does a publisher record its heartbeats and expose their success rate?"""
+        with StubRegistryServer() as server:
+            pool = ConnectionPool()
+            publisher = ServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                         url=server.url, auth_token='token', pool=pool)
+            publisher.register_service(False)
+            heartbeat_time = publisher.heartbeat_service()
+            self.assertEqual(publisher.get_last_heartbeat(), heartbeat_time)
+            self.assertEqual(format_heartbeat(publisher.heartbeats.last_success), heartbeat_time)
+
+            server.registry.deregister(publisher.id)
+            self.assertRaises(exceptions.ResourceGoneException, publisher.heartbeat_service)
+            self.assertEqual(publisher.get_heartbeat_success_rate(), .5)
+            self.assertEqual(publisher.get_last_heartbeat(), heartbeat_time)
+            self.assertIsNone(publisher.get_heartbeat_jitter())
+            pool.close()
+
+
+class HeartbeatIntervalTestCase(unittest.TestCase):
+    """Tests for FixedInterval, AdaptiveInterval and heartbeat retries."""
+
+    def test_fixed_interval(self):
+        """Is a short TTL never given a zero interval?"""
+        self.assertEqual(FixedInterval().interval(30), 15)
+        self.assertEqual(FixedInterval().interval(1), .5)
+        self.assertEqual(FixedInterval().interval(.1), .1)
+
+    def test_adaptive_interval(self):
+        """Is the interval sized from the TTL margin and the smoothed round-trip time?"""
+        policy = AdaptiveInterval(margin=.2)
+        self.assertEqual(policy.interval(30), 15)
+
+        for _ in range(50):
+            policy.observe(.1)
+        self.assertAlmostEqual(policy.rtt, .1)
+        self.assertAlmostEqual(policy.interval(30), 23.9, places=2)
+
+        # A slower registry shortens the interval at once
+        policy.observe(2)
+        self.assertLess(policy.interval(30), 22)
+        self.assertEqual(policy.interval(.2), policy.min_interval)
+
+    def test_slow_registry_interval(self):
+        """Does a slow registry never get heartbeats more often than every half TTL?"""
+        policy = AdaptiveInterval(margin=.2)
+        for rtt in [2, 7, 3, 6, 2, 7] * 5:
+            policy.observe(rtt)
+        self.assertEqual(policy.interval(15), 7.5)
+
+    def test_heartbeat_deadline(self):
+        """Does a heartbeat leave time for a retry before the instance expires?"""
+        self.assertEqual(heartbeat_deadline(30, 15), 7.5)
+        self.assertEqual(heartbeat_deadline(30, 24), 3)
+        self.assertEqual(heartbeat_deadline(.2, .2), .1)
+
+        with StubRegistryServer(StubRegistry(latency=.5)) as server:
+            pool = ConnectionPool()
+            publisher = ServicePublisher('test-service', 1, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                         url=server.url, auth_token='token', pool=pool)
+            publisher.register_service(heartbeat=False)
+            start = time.time()
+            self.assertRaises(exceptions.DeadlineExceededException, publisher.heartbeat_service)
+            self.assertLess(time.time() - start, .4)
+            pool.close()
+
+    def test_failure_delay(self):
+        """Is a failed heartbeat retried at once, then with a growing delay?"""
+        self.assertEqual([failure_delay(failures, 1) for failures in range(1, 7)], [0, .1, .2, .4, .8, 1])
+
+    def test_failed_heartbeat_retried(self):
+        """Does the heartbeat thread retry a failed heartbeat without waiting the interval?"""
+        with StubRegistryServer() as server:
+            pool = ConnectionPool()
+            publisher = ServicePublisher('test-service', 20, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                         url=server.url, auth_token='token', pool=pool,
+                                         interval_policy=FixedInterval(fraction=.02))
+            publisher.register_service()
+            time.sleep(.5)
+            self.assertGreater(publisher.heartbeats.success_rate(), 0)
+
+            # Registry forgets the instance: failed beats are retried within the 0.4 sec interval
+            server.registry.deregister(publisher.id)
+            time.sleep(.7)
+            failures = publisher.heartbeat_failures
+            publisher.stop_heartbeat()
+            self.assertGreaterEqual(failures, 3)
+            pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from bluemix_service_discovery.cache import LookupCache
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.index import TagIndex
+from bluemix_service_discovery.models import ServiceInstance
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(TagIndexTestCase('test_select'))
+    test_suite.addTest(TagIndexTestCase('test_prefer'))
+    test_suite.addTest(TagIndexTestCase('test_queries_memoized'))
+    test_suite.addTest(TagIndexTestCase('test_locator_index'))
+    return test_suite
+
+
+def _instances():
+    return [ServiceInstance('1', 'orders', 'http://1', 'http', ['zone=a', 'region=x', 'v1'], 'UP'),
+            ServiceInstance('2', 'orders', 'http://2', 'http', ['zone=b', 'region=x', 'v1'], 'UP'),
+            ServiceInstance('3', 'orders', 'http://3', 'http', ['zone=c', 'region=y', 'v2', 'canary'], 'UP'),
+            ServiceInstance('4', 'orders', 'http://4', 'http', ['zone=a', 'region=x', 'v2'], 'CRITICAL')]
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class TagIndexTestCase(unittest.TestCase):
+    """Tests for TagIndex."""
+
+    def setUp(self):
+        self.index = TagIndex(_instances())
+
+    def ids(self, instances):
+        return [instance.id for instance in instances]
+
+    def test_select(self):
+        """Are instances selected by all their tags and any of the statuses, in order?"""
+        self.assertEqual(self.ids(self.index.select()), ['1', '2', '3', '4'])
+        self.assertEqual(self.ids(self.index.select('zone=a')), ['1', '4'])
+        self.assertEqual(self.ids(self.index.select('region=x,v2')), ['4'])
+        self.assertEqual(self.ids(self.index.select(['region=x', 'v1'], status='UP')), ['1', '2'])
+        self.assertEqual(self.ids(self.index.select('zone=a', status=['UP', 'CRITICAL'])), ['1', '4'])
+        self.assertEqual(self.index.select('zone=a', status='DOWN'), ())
+        self.assertEqual(self.index.select(['zone=a', 'unknown']), ())
+        self.assertEqual(self.index.count('region=x'), 3)
+        self.assertEqual(len(self.index), 4)
+
+    def test_prefer(self):
+        """Are the instances of the first matched preference returned?"""
+        preferences = [['zone=a'], ['region=x'], None]
+        self.assertEqual(self.ids(self.index.prefer(preferences, status='UP')), ['1'])
+        self.assertEqual(self.ids(self.index.prefer(preferences, tags='v2', status='UP')), ['3'])
+        self.assertEqual(self.ids(self.index.prefer([['zone=z'], 'region=y'])), ['3'])
+        self.assertEqual(self.index.prefer([['zone=z']]), ())
+
+    def test_queries_memoized(self):
+        """Are query results kept, up to the configured number of queries?"""
+        self.assertIs(self.index.select('zone=a,v1'), self.index.select(['v1', 'zone=a']))
+        index = TagIndex(_instances(), max_queries=1)
+        index.select('zone=a')
+        self.assertIsNot(index.select('zone=b'), index.select('zone=b'))
+
+    def test_locator_index(self):
+        """Is the index built once per cached lookup response, with or without a lookup cache?"""
+        with StubRegistryServer() as server:
+            registry = server.registry
+            for zone in ('a', 'b', 'a'):
+                registry.register({'service_name': 'orders', 'endpoint': {'value': 'http://orders', 'type': 'http'},
+                                   'tags': ['zone=%s' % zone], 'ttl': 300})
+            pool = ConnectionPool()
+            locator = ServiceLocator(server.url, 'token', pool=pool, cache=LookupCache(ttl=60))
+            index = locator.get_index(service_name='orders', status='UP')
+            self.assertEqual(len(index.prefer([['zone=a'], None])), 2)
+            self.assertIs(locator.get_index(service_name='orders', status='UP'), index)
+            self.assertEqual(locator.cache.misses, 1)
+
+            # Without a lookup cache, indexes are kept in the locator's index cache
+            locator = ServiceLocator(server.url, 'token', pool=pool)
+            index = locator.get_index(tags='zone=b')
+            self.assertEqual(len(index), 1)
+            self.assertIs(locator.get_index(tags='zone=b'), index)
+            self.assertEqual(locator.index_cache.misses, 1)
+            self.assertIsNone(locator.cache)
+            pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
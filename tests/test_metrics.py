@@ -0,0 +1,133 @@
+import unittest
+import time
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.metrics import Metrics, PrometheusCollector, get_default_metrics
+from bluemix_service_discovery.retry import RetryPolicy
+from bluemix_service_discovery.scheduler import HeartbeatScheduler
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+PREFIX = 'service_discovery_client_'
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(MetricsTestCase('test_operations_recorded'))
+    test_suite.addTest(MetricsTestCase('test_retries_recorded'))
+    test_suite.addTest(MetricsTestCase('test_heartbeat_lag_recorded'))
+    test_suite.addTest(MetricsTestCase('test_exposition_format'))
+    test_suite.addTest(MetricsTestCase('test_no_op_default'))
+    return test_suite
+
+
+class _FlakyPool(object):
+    """Pool failing the first requests it is given."""
+
+    def __init__(self, pool, failures):
+        self.pool = pool
+        self.failures = failures
+
+    def request(self, method, url, **kwargs):
+        if self.failures > 0:
+            self.failures -= 1
+            raise IOError('connection reset')
+        return self.pool.request(method, url, **kwargs)
+
+
+class _RecordingMetrics(Metrics):
+    """Metrics recording the hooks called."""
+
+    enabled = True
+
+    def __init__(self):
+        self.calls = []
+
+    def start_request(self, operation, method, url):
+        return 'span-%s' % operation
+
+    def end_request(self, context, operation, status_code, latency, bytes_sent, bytes_received, error):
+        self.calls.append((context, status_code, error is None))
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class MetricsTestCase(unittest.TestCase):
+    """Tests for the metrics hooks and PrometheusCollector."""
+
+    def setUp(self):
+        self.server = StubRegistryServer().start()
+        self.pool = ConnectionPool()
+        self.metrics = PrometheusCollector()
+
+    def publisher(self, **kwargs):
+        return ServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                url=self.server.url, auth_token='token', pool=self.pool, metrics=self.metrics,
+                                **kwargs)
+
+    def test_operations_recorded(self):
+        """Are latency, status codes and bytes recorded per operation?"""
+        publisher = self.publisher()
+        publisher.register_service(False)
+        publisher.heartbeat_service()
+        ServiceLocator(self.server.url, 'token', pool=self.pool, metrics=self.metrics).get_services()
+        publisher.deregister_service()
+        self.assertRaises(Exception, publisher.heartbeat_service)
+
+        get = self.metrics.get
+        self.assertEqual(get(PREFIX + 'requests_total', operation='register', status='201'), 1)
+        self.assertEqual(get(PREFIX + 'requests_total', operation='heartbeat', status='200'), 1)
+        self.assertEqual(get(PREFIX + 'requests_total', operation='lookup', status='200'), 1)
+        self.assertEqual(get(PREFIX + 'requests_total', operation='deregister', status='200'), 1)
+        self.assertEqual(get(PREFIX + 'request_duration_seconds_count', operation='lookup'), 1)
+        self.assertEqual(get(PREFIX + 'request_duration_seconds_bucket', operation='lookup', le='+Inf'), 1)
+        self.assertGreater(get(PREFIX + 'sent_bytes_total', operation='register'), 0)
+        self.assertGreater(get(PREFIX + 'received_bytes_total', operation='lookup'), 0)
+        self.assertIsNone(get(PREFIX + 'retries_total', operation='lookup'))
+
+    def test_retries_recorded(self):
+        """Are failed attempts and their retries recorded?"""
+        locator = ServiceLocator(self.server.url, 'token', pool=_FlakyPool(self.pool, 2), metrics=self.metrics,
+                                 retry=RetryPolicy(max_attempts=3, backoff=.001))
+        locator.get_services()
+        self.assertEqual(self.metrics.get(PREFIX + 'retries_total', operation='lookup'), 2)
+        self.assertEqual(self.metrics.get(PREFIX + 'requests_total', operation='lookup', status='error'), 2)
+        self.assertEqual(self.metrics.get(PREFIX + 'requests_total', operation='lookup', status='200'), 1)
+
+    def test_heartbeat_lag_recorded(self):
+        """Is the lag of scheduled heartbeats recorded?"""
+        scheduler = HeartbeatScheduler(jitter=0)
+        publisher = self.publisher(scheduler=scheduler)
+        publisher.ttl = 2
+        publisher.register_service()
+        time.sleep(1.5)
+        publisher.deregister_service()
+        scheduler.stop()
+        self.assertGreater(self.metrics.get(PREFIX + 'heartbeat_lag_seconds_count'), 0)
+
+    def test_exposition_format(self):
+        """Are metrics rendered in the Prometheus text format?"""
+        ServiceLocator(self.server.url, 'token', pool=self.pool, metrics=self.metrics).get_services()
+        lines = self.metrics.render().splitlines()
+        self.assertIn('# TYPE %srequest_duration_seconds histogram' % PREFIX, lines)
+        self.assertIn('%srequests_total{operation="lookup",status="200"} 1' % PREFIX, lines)
+        self.assertIn('%srequest_duration_seconds_bucket{le="+Inf",operation="lookup"} 1' % PREFIX, lines)
+        self.assertIn('%sheartbeat_lag_seconds_count 0' % PREFIX, lines)
+
+    def test_no_op_default(self):
+        """Are clients uninstrumented by default, and custom hooks given the attempt context?"""
+        self.assertFalse(get_default_metrics().enabled)
+        self.assertIs(ServiceLocator(self.server.url, 'token').metrics, get_default_metrics())
+
+        metrics = _RecordingMetrics()
+        ServiceLocator(self.server.url, 'token', pool=self.pool, metrics=metrics).get_services()
+        self.assertEqual(metrics.calls, [('span-lookup', 200, True)])
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import json
+from bluemix_service_discovery.models import Catalog, ServiceInstance, parse_instances
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(ServiceInstanceTestCase('test_parse_instances'))
+    test_suite.addTest(ServiceInstanceTestCase('test_round_trip'))
+    test_suite.addTest(CatalogTestCase('test_parsed_once'))
+    return test_suite
+
+
+INSTANCE = {
+    'id': 'abc',
+    'service_name': 'test-service',
+    'endpoint': {'value': 'https://test-service.mybluemix.net', 'type': 'http'},
+    'tags': ['test', 'db'],
+    'status': 'UP',
+    'ttl': 300,
+    'last_heartbeat': '2016-10-05T17:59:25.066Z'
+}
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class ServiceInstanceTestCase(unittest.TestCase):
+    """Tests for ServiceInstance."""
+
+    def test_parse_instances(self):
+        """Are all fields of a lookup response parsed?"""
+        instances = parse_instances(json.dumps({'instances': [INSTANCE, {'id': 'def'}]}))
+        self.assertEqual(len(instances), 2)
+        self.assertEqual(instances[0].endpoint, 'https://test-service.mybluemix.net')
+        self.assertEqual(instances[0].protocol, 'http')
+        self.assertEqual(instances[0].tags, ('test', 'db'))
+        self.assertEqual(instances[0].ttl, 300)
+        self.assertEqual(instances[1].id, 'def')
+        self.assertIsNone(instances[1].endpoint)
+        self.assertFalse(hasattr(instances[0], '__dict__'))
+
+    def test_round_trip(self):
+        """Does to_dict reproduce the registry representation?"""
+        instance = ServiceInstance.from_dict(INSTANCE)
+        self.assertEqual(instance.to_dict(), INSTANCE)
+        self.assertEqual(ServiceInstance.from_dict(instance.to_dict()), instance)
+
+
+class CatalogTestCase(unittest.TestCase):
+    """Tests for Catalog."""
+
+    def test_parsed_once(self):
+        """Is the response body parsed only on first access?"""
+        catalog = Catalog(json.dumps({'instances': [INSTANCE]}))
+        self.assertIs(catalog.instances, catalog.instances)
+        self.assertEqual(catalog.instances[0].id, 'abc')
+
+if __name__ == '__main__':
+    unittest.main()
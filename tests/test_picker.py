@@ -0,0 +1,127 @@
+import unittest
+import time
+from collections import Counter
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.models import ServiceInstance
+from bluemix_service_discovery.picker import EndpointPicker
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(EndpointPickerTestCase('test_round_robin'))
+    test_suite.addTest(EndpointPickerTestCase('test_weighted'))
+    test_suite.addTest(EndpointPickerTestCase('test_power_of_two'))
+    test_suite.addTest(EndpointPickerTestCase('test_unhealthy_filtered'))
+    test_suite.addTest(EndpointPickerTestCase('test_no_instance_available'))
+    test_suite.addTest(EndpointPickerTestCase('test_background_refresh'))
+    test_suite.addTest(EndpointPickerTestCase('test_failed_refresh_keeps_view'))
+    return test_suite
+
+
+class _Locator(object):
+    """Locator stand-in returning fixed instances."""
+
+    def __init__(self, instances):
+        self.instances = instances
+        self.lookups = 0
+        self.error = None
+
+    def get_services(self, fields=None, tags=None, service_name=None, status=None, parsed=False):
+        self.lookups += 1
+        if self.error is not None:
+            raise self.error
+        return tuple(i for i in self.instances if i.service_name == service_name)
+
+
+def _wait_refreshed(picker):
+    deadline = time.time() + 5
+    while picker._refreshing and time.time() < deadline:
+        time.sleep(.01)
+
+
+def _instance(id, tags=(), status='UP'):
+    return ServiceInstance(id, 'test-service', 'https://%s.mybluemix.net' % id, 'http', tags, status, 300)
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class EndpointPickerTestCase(unittest.TestCase):
+    """Tests for EndpointPicker."""
+
+    def test_round_robin(self):
+        """Are instances picked in turn from a single lookup?"""
+        locator = _Locator([_instance('a'), _instance('b'), _instance('c')])
+        picker = EndpointPicker(locator)
+        picks = [picker.pick('test-service').id for _ in range(6)]
+        self.assertEqual(picks, ['a', 'b', 'c', 'a', 'b', 'c'])
+        self.assertEqual(locator.lookups, 1)
+
+    def test_weighted(self):
+        """Are instances picked proportionally to their weight tag?"""
+        locator = _Locator([_instance('a', ['weight=3']), _instance('b'), _instance('c', ['weight=0'])])
+        picker = EndpointPicker(locator, strategy='weighted')
+        picks = Counter(picker.pick('test-service').id for _ in range(4000))
+        self.assertNotIn('c', picks)
+        self.assertAlmostEqual(picks['a'] / float(picks['b']), 3, delta=0.6)
+
+    def test_power_of_two(self):
+        """Are busy instances avoided until released?"""
+        locator = _Locator([_instance('a'), _instance('b')])
+        picker = EndpointPicker(locator, strategy='power_of_two')
+        busy = picker.pick('test-service')
+        busy_picks = 0
+        for _ in range(200):
+            picked = picker.pick('test-service')
+            if picked is busy:
+                busy_picks += 1
+            else:
+                picker.release('test-service', picked)
+        # The busy instance only wins when both choices land on it
+        self.assertTrue(busy_picks < 80)
+
+    def test_unhealthy_filtered(self):
+        """Are instances that are not UP skipped?"""
+        locator = _Locator([_instance('a', status='OUT_OF_SERVICE'), _instance('b')])
+        picker = EndpointPicker(locator, strategy='random')
+        self.assertEqual(set(picker.pick('test-service').id for _ in range(10)), set(['b']))
+
+    def test_no_instance_available(self):
+        """Is the correct error thrown when no instance is available?"""
+        picker = EndpointPicker(_Locator([]))
+        self.assertRaises(exceptions.NoInstanceAvailableException, picker.pick, 'test-service')
+        self.assertRaises(ValueError, EndpointPicker, _Locator([]), strategy='fastest')
+
+    def test_background_refresh(self):
+        """Are expired instances picked while they are fetched again in the background?"""
+        locator = _Locator([_instance('a')])
+        picker = EndpointPicker(locator, refresh_interval=0)
+        self.assertEqual(picker.pick('test-service').id, 'a')
+        locator.instances = [_instance('b')]
+        self.assertEqual(picker.pick('test-service').id, 'a')
+        _wait_refreshed(picker)
+        self.assertEqual(picker.pick('test-service').id, 'b')
+
+    def test_failed_refresh_keeps_view(self):
+        """Are the previous instances picked while the registry is unavailable, and the refresh retried later?"""
+        locator = _Locator([_instance('a')])
+        picker = EndpointPicker(locator, refresh_interval=0, retry_interval=60)
+        picker.pick('test-service')
+        locator.error = exceptions.TransportException('Error on service lookup')
+        self.assertEqual(picker.pick('test-service').id, 'a')
+        _wait_refreshed(picker)
+        self.assertEqual([picker.pick('test-service').id for _ in range(10)], ['a'] * 10)
+        _wait_refreshed(picker)
+        self.assertEqual(locator.lookups, 2)
+
+        picker.retry_interval = 0
+        picker._retry_at.clear()
+        locator.error = None
+        locator.instances = [_instance('b')]
+        picker.pick('test-service')
+        _wait_refreshed(picker)
+        self.assertEqual(picker.pick('test-service').id, 'b')
+
+if __name__ == '__main__':
+    unittest.main()
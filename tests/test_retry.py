@@ -0,0 +1,125 @@
+import unittest
+import json
+import time
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.retry import RetryBudget, RetryPolicy
+from bluemix_service_discovery.service_locator import ServiceLocator
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(RetryPolicyTestCase('test_server_error_retried'))
+    test_suite.addTest(RetryPolicyTestCase('test_transport_error_retried'))
+    test_suite.addTest(RetryPolicyTestCase('test_client_error_not_retried'))
+    test_suite.addTest(RetryPolicyTestCase('test_attempts_exhausted'))
+    test_suite.addTest(RetryPolicyTestCase('test_deadline'))
+    test_suite.addTest(RetryPolicyTestCase('test_deadline_bounds_attempts'))
+    test_suite.addTest(RetryPolicyTestCase('test_budget'))
+    return test_suite
+
+
+class _Response(object):
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+
+class _Pool(object):
+    """Pool stand-in replaying a list of responses, raising those that are exceptions."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = 0
+        self.timeouts = []
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        self.timeouts.append(kwargs.get('timeout'))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class _SlowPool(_Pool):
+    """Pool stand-in timing out after the timeout it is given."""
+
+    def request(self, method, url, **kwargs):
+        time.sleep(kwargs['timeout'][1])
+        return _Pool.request(self, method, url, **kwargs)
+
+
+OK = _Response(200, {'instances': []})
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class RetryPolicyTestCase(unittest.TestCase):
+    """Tests for RetryPolicy."""
+
+    def setUp(self):
+        self.policy = RetryPolicy(max_attempts=3, backoff=0.001)
+
+    def _locator(self, pool, policy=None):
+        return ServiceLocator('http://registry', 'token', pool=pool, retry=policy or self.policy)
+
+    def test_server_error_retried(self):
+        """Is a 5xx response retried?"""
+        pool = _Pool(_Response(503, {'Error': 'unavailable'}), OK)
+        self.assertEqual(self._locator(pool).get_services(parsed=True), ())
+        self.assertEqual(pool.requests, 2)
+
+    def test_transport_error_retried(self):
+        """Is a connection error retried?"""
+        pool = _Pool(IOError('connection reset'), OK)
+        self.assertEqual(self._locator(pool).get_services(parsed=True), ())
+        self.assertEqual(pool.requests, 2)
+
+    def test_client_error_not_retried(self):
+        """Are 400 and 401 responses raised without retrying?"""
+        pool = _Pool(_Response(400, {'Error': 'bad'}), _Response(401, {'Error': 'token'}))
+        locator = self._locator(pool)
+        self.assertRaises(exceptions.ValidationException, locator.get_services)
+        self.assertRaises(exceptions.AuthenticationException, locator.get_services)
+        self.assertEqual(pool.requests, 2)
+
+    def test_attempts_exhausted(self):
+        """Is the last error raised once all attempts failed?"""
+        pool = _Pool(*[_Response(500, {'Error': 'down'})] * 3)
+        self.assertRaises(exceptions.ServerErrorException, self._locator(pool).get_services)
+        self.assertEqual(pool.requests, 3)
+
+    def test_deadline(self):
+        """Is a call no longer retried past its deadline?"""
+        policy = RetryPolicy(max_attempts=10, backoff=1, deadline=0.01)
+        pool = _Pool(IOError('timed out'), OK)
+        self.assertRaises(exceptions.TransportException, self._locator(pool, policy).get_services)
+        self.assertEqual(pool.requests, 1)
+
+    def test_deadline_bounds_attempts(self):
+        """Is every attempt's timeout shortened to the deadline, and the call failed once it passed?"""
+        policy = RetryPolicy(max_attempts=10, backoff=0.001, deadline=0.3)
+        pool = _SlowPool(*[IOError('timed out')] * 10)
+        start = time.time()
+        self.assertRaises(exceptions.DeadlineExceededException, self._locator(pool, policy).get_services)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(pool.requests, 1)
+
+        pool = _Pool(OK)
+        self._locator(pool, policy).get_services()
+        connect, read = pool.timeouts[0]
+        self.assertTrue(0.2 < connect <= 0.3 and 0.2 < read <= 0.3)
+
+    def test_budget(self):
+        """Are retries refused once the shared budget is spent?"""
+        policy = RetryPolicy(max_attempts=3, backoff=0.001, budget=RetryBudget(ratio=0, max_tokens=1))
+        pool = _Pool(IOError('reset'), OK, IOError('reset'))
+        locator = self._locator(pool, policy)
+        locator.get_services()
+        self.assertRaises(exceptions.TransportException, locator.get_services)
+        self.assertEqual(pool.requests, 3)
+
+if __name__ == '__main__':
+    unittest.main()
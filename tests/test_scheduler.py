@@ -0,0 +1,116 @@
+import unittest
+import threading
+import time
+from bluemix_service_discovery.scheduler import MIN_WORKERS, HeartbeatScheduler
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(HeartbeatSchedulerTestCase('test_publishers_share_worker'))
+    test_suite.addTest(HeartbeatSchedulerTestCase('test_remove_publisher'))
+    test_suite.addTest(HeartbeatSchedulerTestCase('test_failing_heartbeat_rescheduled'))
+    test_suite.addTest(HeartbeatSchedulerTestCase('test_workers_sized_by_rate'))
+    test_suite.addTest(HeartbeatSchedulerTestCase('test_slow_heartbeat_isolated'))
+    return test_suite
+
+
+class _Publisher(object):
+    """Records the threads its heartbeats are sent from."""
+
+    def __init__(self, fail=False, interval=0.05, duration=0):
+        self.fail = fail
+        self.interval = interval
+        self.duration = duration
+        self.threads = []
+        self.outcomes = []
+
+    def _beat(self):
+        self.threads.append(threading.current_thread().name)
+        time.sleep(self.duration)
+        if self.fail:
+            raise Exception('Heartbeat failed')
+
+    def _heartbeat_delay(self, succeeded):
+        self.outcomes.append(succeeded)
+        return self.interval
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class HeartbeatSchedulerTestCase(unittest.TestCase):
+    """Tests for HeartbeatScheduler."""
+
+    def setUp(self):
+        self.scheduler = HeartbeatScheduler(workers=1, jitter=0.1)
+
+    def test_publishers_share_worker(self):
+        """Are many publishers heartbeated from a single worker thread?"""
+        publishers = [_Publisher() for _ in range(50)]
+        for publisher in publishers:
+            self.scheduler.add(publisher, 0.05)
+        time.sleep(0.3)
+        threads = set()
+        for publisher in publishers:
+            self.assertTrue(len(publisher.threads) >= 2)
+            threads.update(publisher.threads)
+        self.assertEqual(len(threads), 1)
+
+    def test_remove_publisher(self):
+        """Does a removed publisher stop beating while others continue?"""
+        removed, kept = _Publisher(), _Publisher()
+        self.scheduler.add(removed, 0.05)
+        self.scheduler.add(kept, 0.05)
+        time.sleep(0.1)
+        self.scheduler.remove(removed)
+        self.assertNotIn(removed, self.scheduler)
+        beats = len(removed.threads)
+        kept_beats = len(kept.threads)
+        time.sleep(0.2)
+        self.assertEqual(len(removed.threads), beats)
+        self.assertTrue(len(kept.threads) > kept_beats)
+
+    def test_failing_heartbeat_rescheduled(self):
+        """Does a failing heartbeat keep being scheduled?"""
+        publisher = _Publisher(fail=True)
+        self.scheduler.add(publisher, 0.05)
+        time.sleep(0.2)
+        self.assertTrue(len(publisher.threads) >= 2)
+        self.assertFalse(any(publisher.outcomes))
+
+    def test_workers_sized_by_rate(self):
+        """Does the default pool grow with the heartbeat rate, within its bounds?"""
+        scheduler = HeartbeatScheduler(beats_per_worker=20, max_workers=8)
+        try:
+            scheduler.add(_Publisher(interval=10), 10)
+            self.assertEqual(len(scheduler._threads), MIN_WORKERS)
+            for _ in range(100):
+                scheduler.add(_Publisher(interval=2), 2)
+            self.assertEqual(len(scheduler._threads), 3)
+            for _ in range(1000):
+                scheduler.add(_Publisher(interval=2), 2)
+            self.assertEqual(len(scheduler._threads), 8)
+        finally:
+            scheduler.stop()
+
+    def test_slow_heartbeat_isolated(self):
+        """Do other publishers keep beating while a heartbeat is slow?"""
+        scheduler = HeartbeatScheduler()
+        try:
+            slow, kept = _Publisher(duration=1), _Publisher()
+            scheduler.add(slow, 0.01)
+            time.sleep(0.05)
+            scheduler.add(kept, 0.05)
+            time.sleep(0.3)
+            self.assertEqual(len(slow.threads), 1)
+            self.assertTrue(len(kept.threads) >= 3)
+        finally:
+            scheduler.remove(slow, wait=False)
+            scheduler.stop()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 from json import loads
 from os import environ as env
-from bluemix_service_discovery.service_publisher import ServicePublisher, exceptions
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.service_publisher import ServicePublisher
 
 
 def suite():
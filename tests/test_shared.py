@@ -0,0 +1,125 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from bluemix_service_discovery import shared
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.models import Catalog
+from bluemix_service_discovery.shared import SharedCatalog
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+KEY = (None, None, 'test-service', None)
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(SharedCatalogTestCase('test_single_refresher'))
+    test_suite.addTest(SharedCatalogTestCase('test_reader_skips_registry'))
+    test_suite.addTest(SharedCatalogTestCase('test_unwatched_query'))
+    test_suite.addTest(SharedCatalogTestCase('test_sequence_published_last'))
+    return test_suite
+
+
+class _CountingPool(object):
+    """Pool counting the requests it sends."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.requests = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        return self.pool.request(method, url, **kwargs)
+
+
+class _RecordingSequence(object):
+    """Sequence struct recording the header content each sequence is written with."""
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.writes = []
+
+    def pack_into(self, buffer, offset, sequence):
+        length = shared._HEADER.unpack_from(buffer, 0)[3]
+        self.writes.append((sequence, length))
+        self.sequence.pack_into(buffer, offset, sequence)
+
+    def unpack_from(self, buffer, offset):
+        return self.sequence.unpack_from(buffer, offset)
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class SharedCatalogTestCase(unittest.TestCase):
+    """Tests for SharedCatalog."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'catalog.shm')
+        self.server = StubRegistryServer().start()
+        self.pool = ConnectionPool()
+        ServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net', 'http', tags=['test'],
+                         url=self.server.url, auth_token='token', pool=self.pool).register_service(False)
+
+        self.writer = SharedCatalog(self.path, interval=60)
+        self.writer.watch(service_name='test-service')
+        self.writer_locator = ServiceLocator(self.server.url, 'token', pool=self.pool, shared=self.writer)
+        deadline = time.time() + 5
+        while self.writer.get(KEY) is None and time.time() < deadline:
+            time.sleep(.01)
+
+        self.reader = SharedCatalog(self.path, interval=60)
+        self.reader.watch(service_name='test-service')
+
+    def test_single_refresher(self):
+        """Does only one of the processes sharing the segment refresh it?"""
+        self.reader.start(ServiceLocator(self.server.url, 'token', pool=self.pool))
+        time.sleep(.1)
+        self.assertTrue(self.writer.is_refresher)
+        self.assertFalse(self.reader.is_refresher)
+
+    def test_reader_skips_registry(self):
+        """Does a locator attached to the segment answer without calling the registry?"""
+        pool = _CountingPool(self.pool)
+        locator = ServiceLocator(self.server.url, 'token', pool=pool, shared=self.reader)
+        instances = locator.get_services(service_name='test-service', parsed=True)
+        self.assertEqual([instance.service_name for instance in instances], ['test-service'])
+        self.assertEqual(locator.get_services(service_name='test-service'),
+                         self.writer_locator.get_services(service_name='test-service'))
+        self.assertEqual(pool.requests, 0)
+
+    def test_unwatched_query(self):
+        """Are queries missing from the segment sent to the registry?"""
+        pool = _CountingPool(self.pool)
+        locator = ServiceLocator(self.server.url, 'token', pool=pool, shared=self.reader)
+        self.assertIsNone(self.reader.get((None, 'test', None, None)))
+        locator.get_services(tags='test')
+        self.assertEqual(pool.requests, 1)
+
+    def test_sequence_published_last(self):
+        """Is the even sequence written after the payload length it publishes?"""
+        catalog = Catalog('{"instances": []}')
+        original = shared._SEQUENCE
+        recording = shared._SEQUENCE = _RecordingSequence(original)
+        try:
+            self.writer.publish({KEY: catalog})
+        finally:
+            shared._SEQUENCE = original
+        (odd, _), (even, length) = recording.writes
+        self.assertEqual((odd % 2, even, length), (1, odd + 1, shared._HEADER.unpack_from(self.writer._mapped, 0)[3]))
+        self.assertEqual(self.writer.get(KEY).text, catalog.text)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+        self.pool.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+if __name__ == '__main__':
+    unittest.main()
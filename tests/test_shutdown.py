@@ -0,0 +1,214 @@
+import unittest
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+from bluemix_service_discovery import bulk, exceptions
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.heartbeat import FixedInterval
+from bluemix_service_discovery.scheduler import HeartbeatScheduler
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.shutdown import ShutdownManager
+from bluemix_service_discovery.stub_registry import StubRegistry, StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(ShutdownTestCase('test_deregister_wakes_heartbeat_thread'))
+    test_suite.addTest(ShutdownTestCase('test_shutdown_deregisters_all'))
+    test_suite.addTest(ShutdownTestCase('test_shutdown_deadline'))
+    test_suite.addTest(ShutdownTestCase('test_shutdown_during_heartbeat'))
+    test_suite.addTest(ShutdownTestCase('test_signal_handler'))
+    test_suite.addTest(ShutdownTestCase('test_signal_during_add'))
+    test_suite.addTest(ShutdownTestCase('test_exit_deregisters'))
+    test_suite.addTest(ShutdownTestCase('test_async_publisher_rejected'))
+    return test_suite
+
+
+class _SlowPublisher(object):
+    """Publisher stand-in whose de-registration hangs."""
+
+    def __init__(self):
+        self.id = 'slow'
+        self.registered = True
+        self.stopped = False
+
+    def stop_heartbeat(self, wait=True):
+        self.stopped = True
+
+    def deregister_service(self, wait_heartbeat=True):
+        time.sleep(2)
+
+
+class _SlowHeartbeatRegistry(StubRegistry):
+    """Stub registry whose heartbeats take longer than a shutdown deadline."""
+
+    def heartbeat(self, instance_id):
+        time.sleep(1.5)
+        return StubRegistry.heartbeat(self, instance_id)
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class ShutdownTestCase(unittest.TestCase):
+    """Tests for ShutdownManager."""
+
+    def setUp(self):
+        self.server = StubRegistryServer().start()
+        self.pool = ConnectionPool()
+
+    def publisher(self, name='test-service', **kwargs):
+        return ServicePublisher(name, 300, 'UP', 'https://%s.mybluemix.net' % name, 'http',
+                                url=self.server.url, auth_token='token', pool=self.pool, **kwargs)
+
+    def test_deregister_wakes_heartbeat_thread(self):
+        """Does de-registration stop the heartbeat thread without waiting for its interval?"""
+        publisher = self.publisher()
+        publisher.register_service()
+        start = time.time()
+        publisher.deregister_service()
+        self.assertLess(time.time() - start, 1)
+        self.assertFalse(publisher.heartbeat_thread.is_alive())
+        self.assertEqual(self.server.registry.instances, {})
+
+    def test_shutdown_deregisters_all(self):
+        """Are all publishers de-registered concurrently, with thread and scheduler heartbeats?"""
+        scheduler = HeartbeatScheduler()
+        manager = ShutdownManager(deadline=5)
+        publishers = [manager.add(self.publisher('service-%d' % i)) for i in range(20)]
+        publishers += [manager.add(self.publisher('scheduled-%d' % i, scheduler=scheduler)) for i in range(5)]
+        manager.add(self.publisher('never-registered'))
+        for publisher in publishers:
+            publisher.register_service()
+        self.assertEqual(len(self.server.registry.instances), 25)
+
+        start = time.time()
+        results = manager.shutdown()
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(len(results), 26)
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(self.server.registry.instances, {})
+        self.assertEqual(len(scheduler), 0)
+        for publisher in publishers[:20]:
+            self.assertFalse(publisher.heartbeat_thread.is_alive())
+
+        # Only the first call has an effect
+        self.assertIs(manager.shutdown(), results)
+        scheduler.stop()
+
+    def test_shutdown_deadline(self):
+        """Does shutdown return by its deadline, reporting the pending de-registrations?"""
+        manager = ShutdownManager(deadline=.3)
+        slow = manager.add(_SlowPublisher())
+        publisher = manager.add(self.publisher())
+        publisher.register_service()
+
+        start = time.time()
+        results = manager.shutdown()
+        self.assertLess(time.time() - start, 1)
+        self.assertTrue(slow.stopped)
+        self.assertIsInstance(results[0].error, exceptions.DeadlineExceededException)
+        self.assertIn('within 0.3 sec', str(results[0].error))
+        self.assertTrue(results[1].succeeded)
+
+    def test_shutdown_during_heartbeat(self):
+        """Is an instance de-registered by the deadline while its heartbeat is still being sent?"""
+        scheduler = HeartbeatScheduler(jitter=0)
+        with StubRegistryServer(_SlowHeartbeatRegistry()) as server:
+            manager = ShutdownManager(deadline=1)
+            publishers = [manager.add(ServicePublisher(name, 10, 'UP', 'https://%s.mybluemix.net' % name, 'http',
+                                                       url=server.url, auth_token='token', pool=self.pool,
+                                                       scheduler=scheduler if name == 'scheduled' else None,
+                                                       interval_policy=FixedInterval(fraction=.05)))
+                          for name in ('threaded', 'scheduled')]
+            for publisher in publishers:
+                publisher.register_service()
+            # Both first heartbeats are in flight
+            time.sleep(.8)
+
+            start = time.time()
+            results = manager.shutdown()
+            self.assertLess(time.time() - start, 1)
+            self.assertTrue(all(result.succeeded for result in results))
+            self.assertEqual(server.registry.instances, {})
+        scheduler.stop()
+
+    @unittest.skipUnless(hasattr(signal, 'SIGUSR1'), 'requires POSIX signals')
+    def test_signal_handler(self):
+        """Does a handled signal shut down, then call the previous handler?"""
+        received = []
+        previous = signal.signal(signal.SIGUSR1, lambda signum, frame: received.append(signum))
+        manager = ShutdownManager().install(signals=(signal.SIGUSR1,))
+        try:
+            publisher = manager.add(self.publisher())
+            publisher.register_service()
+            os.kill(os.getpid(), signal.SIGUSR1)
+            time.sleep(.1)
+            self.assertEqual(received, [signal.SIGUSR1])
+            self.assertFalse(publisher.registered)
+            self.assertEqual(self.server.registry.instances, {})
+        finally:
+            manager.uninstall()
+            signal.signal(signal.SIGUSR1, previous)
+
+    @unittest.skipUnless(hasattr(signal, 'SIGUSR1'), 'requires POSIX signals')
+    def test_signal_during_add(self):
+        """Does a signal received while the manager's lock is held shut down without deadlocking?"""
+        manager = ShutdownManager().install(signals=(signal.SIGUSR1,))
+        previous = manager._previous_handlers[signal.SIGUSR1]
+        manager._previous_handlers[signal.SIGUSR1] = signal.SIG_IGN
+        try:
+            publisher = manager.add(self.publisher())
+            publisher.register_service()
+            with manager._lock:
+                os.kill(os.getpid(), signal.SIGUSR1)
+                time.sleep(.1)
+            self.assertFalse(publisher.registered)
+        finally:
+            manager._previous_handlers[signal.SIGUSR1] = previous
+            manager.uninstall()
+
+    def test_exit_deregisters(self):
+        """Does a process with a heartbeating publisher exit and de-register it on a normal exit?"""
+        script = textwrap.dedent('''
+            from bluemix_service_discovery.service_publisher import ServicePublisher
+            from bluemix_service_discovery.shutdown import ShutdownManager
+            manager = ShutdownManager(deadline=2).install()
+            publisher = ServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                         url=%r, auth_token='token')
+            manager.add(publisher).register_service()
+            print(publisher.id)
+        ''' % self.server.url)
+        process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE)
+        deadline = time.time() + 10
+        while process.poll() is None and time.time() < deadline:
+            time.sleep(.05)
+        if process.poll() is None:
+            process.kill()
+        instance_id = process.communicate()[0].decode('utf-8').strip()
+        self.assertEqual(process.returncode, 0)
+        self.assertTrue(instance_id)
+        self.assertNotIn(instance_id, self.server.registry.instances)
+        self.assertEqual(self.server.registry.instances, {})
+
+    def test_async_publisher_rejected(self):
+        """Are asynchronous publishers rejected rather than reported as de-registered?"""
+        try:
+            from bluemix_service_discovery.aio import AsyncServicePublisher
+        except (ImportError, SyntaxError):
+            self.skipTest('asyncio support requires Python 3.5+')
+        publisher = AsyncServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                          url=self.server.url, auth_token='token')
+        self.assertRaises(TypeError, ShutdownManager().add, publisher)
+        self.assertRaises(TypeError, bulk.deregister_services, [publisher])
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
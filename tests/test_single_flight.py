@@ -0,0 +1,133 @@
+import unittest
+import threading
+import time
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.single_flight import SingleFlight
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(SingleFlightTestCase('test_concurrent_calls_shared'))
+    test_suite.addTest(SingleFlightTestCase('test_error_shared'))
+    test_suite.addTest(SingleFlightTestCase('test_interrupted_leader'))
+    test_suite.addTest(SingleFlightTestCase('test_concurrent_lookups_coalesced'))
+    return test_suite
+
+
+class _SlowPool(object):
+    """Pool delaying and counting the requests it sends."""
+
+    def __init__(self, pool, delay):
+        self.pool = pool
+        self.delay = delay
+        self.requests = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        time.sleep(self.delay)
+        return self.pool.request(method, url, **kwargs)
+
+
+def _run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Tests for SingleFlight and its use by ServiceLocator."""
+
+    def test_concurrent_calls_shared(self):
+        """Do concurrent calls with the same key run the operation once?"""
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def operation():
+            calls.append(1)
+            time.sleep(.2)
+            return 'result'
+
+        _run_threads(lambda: results.append(flight.do('key', operation)), 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 10)
+        self.assertEqual(flight.coalesced, 9)
+
+        # Completed calls are not reused
+        self.assertEqual(flight.do('key', operation), 'result')
+        self.assertEqual(len(calls), 2)
+
+    def test_error_shared(self):
+        """Do callers waiting on a failed call receive its exception?"""
+        flight = SingleFlight()
+        errors = []
+
+        def operation():
+            time.sleep(.2)
+            raise ValueError('lookup failed')
+
+        def call():
+            try:
+                flight.do('key', operation)
+            except ValueError as e:
+                errors.append(e)
+
+        _run_threads(call, 5)
+        self.assertEqual(len(errors), 5)
+        self.assertEqual(flight.coalesced, 4)
+
+    def test_interrupted_leader(self):
+        """Do callers waiting on a call interrupted by a BaseException call again instead of returning None?"""
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def operation():
+            calls.append(1)
+            time.sleep(.2)
+            if len(calls) == 1:
+                raise KeyboardInterrupt()
+            return 'result'
+
+        def call():
+            try:
+                results.append(flight.do('key', operation))
+            except KeyboardInterrupt:
+                results.append('interrupted')
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        time.sleep(.05)
+        _run_threads(call, 4)
+        leader.join()
+        self.assertEqual(sorted(results), ['interrupted'] + ['result'] * 4)
+        self.assertEqual(len(calls), 2)
+
+    def test_concurrent_lookups_coalesced(self):
+        """Do concurrent identical lookups share one request?"""
+        with StubRegistryServer() as server:
+            pool = ConnectionPool()
+            slow_pool = _SlowPool(pool, .2)
+            locator = ServiceLocator(server.url, 'token', pool=slow_pool)
+            results = []
+
+            _run_threads(lambda: results.append(locator.get_services(service_name='test-service')), 10)
+            self.assertEqual(slow_pool.requests, 1)
+            self.assertEqual(locator.coalesced, 9)
+            self.assertEqual(len(set(results)), 1)
+
+            # Different filters are not coalesced
+            _run_threads(lambda: locator.get_services(tags=str(threading.current_thread().ident)), 3)
+            self.assertEqual(slow_pool.requests, 4)
+            pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
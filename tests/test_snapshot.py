@@ -0,0 +1,69 @@
+import unittest
+import os
+import shutil
+import tempfile
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.snapshot import CatalogSnapshot
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(CatalogSnapshotTestCase('test_round_trip'))
+    test_suite.addTest(CatalogSnapshotTestCase('test_offline_cold_start'))
+    test_suite.addTest(CatalogSnapshotTestCase('test_corrupt_file_ignored'))
+    return test_suite
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class CatalogSnapshotTestCase(unittest.TestCase):
+    """Tests for CatalogSnapshot."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'catalog.jsonl')
+        self.server = StubRegistryServer().start()
+        self.pool = ConnectionPool()
+        ServicePublisher('test-service', 300, 'UP', 'https://test-service.mybluemix.net', 'http', tags=['test'],
+                         url=self.server.url, auth_token='token', pool=self.pool).register_service(False)
+
+    def test_round_trip(self):
+        """Are lookup results written and read back unchanged?"""
+        locator = ServiceLocator(self.server.url, 'token', pool=self.pool, snapshot=CatalogSnapshot(self.path))
+        text = locator.get_services(service_name='test-service')
+        locator.snapshot.save()
+
+        entries = CatalogSnapshot(self.path).load()
+        self.assertEqual(list(entries.keys()), [(None, None, 'test-service', None)])
+        self.assertEqual(entries[(None, None, 'test-service', None)].text, text)
+
+    def test_offline_cold_start(self):
+        """Does a new locator answer from the snapshot while the registry is down?"""
+        locator = ServiceLocator(self.server.url, 'token', pool=self.pool, snapshot=CatalogSnapshot(self.path))
+        expected = locator.get_services(parsed=True)
+        locator.snapshot.save()
+        self.server.stop()
+
+        locator = ServiceLocator(self.server.url, 'token', pool=ConnectionPool(),
+                                 snapshot=CatalogSnapshot(self.path))
+        self.assertEqual(locator.get_services(parsed=True), expected)
+
+    def test_corrupt_file_ignored(self):
+        """Is an unreadable snapshot ignored?"""
+        with open(self.path, 'w') as f:
+            f.write('not a snapshot\n')
+        self.assertEqual(len(CatalogSnapshot(self.path).load()), 0)
+        self.assertEqual(len(CatalogSnapshot(os.path.join(self.directory, 'missing')).load()), 0)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import threading
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.streaming import InstanceStreamParser, iter_instances
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(InstanceStreamParserTestCase('test_any_chunking'))
+    test_suite.addTest(InstanceStreamParserTestCase('test_empty_and_truncated'))
+    test_suite.addTest(InstanceStreamParserTestCase('test_iter_services'))
+    test_suite.addTest(InstanceStreamParserTestCase('test_first_instance_before_end'))
+    return test_suite
+
+
+class _SlowListingHandler(BaseHTTPRequestHandler):
+    """Sends one instance, then waits for the client to have parsed it before finishing the listing."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"instances": [{"id": "first", "service_name": "slow"},')
+        self.wfile.flush()
+        self.server.first_parsed.wait(5)
+        self.wfile.write(b' {"id": "second", "service_name": "slow"}]}')
+
+    def log_message(self, *args):
+        pass
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class InstanceStreamParserTestCase(unittest.TestCase):
+    """Tests for InstanceStreamParser and ServiceLocator.iter_services()."""
+
+    def test_any_chunking(self):
+        """Are instances decoded whatever the chunk boundaries?"""
+        instances = [{'id': str(i), 'service_name': u'sérvice-%d' % i, 'tags': ['a', ']', '{'],
+                      'endpoint': {'value': 'https://x', 'type': 'http'}} for i in range(5)]
+        body = json.dumps({'count': 5, 'instances': instances}, indent=1, ensure_ascii=False).encode('utf-8')
+
+        for size in (1, 2, 3, 7, 64, len(body)):
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            self.assertEqual(list(iter_instances(chunks)), instances)
+
+    def test_empty_and_truncated(self):
+        """Are empty listings accepted and truncated ones rejected?"""
+        self.assertEqual(list(iter_instances([b'{"instances"', b': [ ]}'])), [])
+
+        parser = InstanceStreamParser()
+        self.assertEqual(parser.feed(b'{"instances": [{"id": "a"}, {"id"'), [{'id': 'a'}])
+        self.assertRaises(ValueError, parser.close)
+
+    def test_iter_services(self):
+        """Are filtered instances streamed from the registry?"""
+        with StubRegistryServer() as server:
+            pool = ConnectionPool()
+            for i in range(200):
+                ServicePublisher('stream-%d' % (i % 2), 300, 'UP', 'https://stream-%d.mybluemix.net' % i, 'http',
+                                 tags=['stream'], url=server.url, auth_token='token',
+                                 pool=pool).register_service(False)
+            locator = ServiceLocator(server.url, 'token', pool=pool)
+
+            streamed = list(locator.iter_services(service_name='stream-1', chunk_size=256))
+            self.assertEqual(len(streamed), 100)
+            self.assertEqual(streamed, list(locator.get_services(service_name='stream-1', parsed=True)))
+            pool.close()
+
+    def test_first_instance_before_end(self):
+        """Is the first instance yielded before the response is complete?"""
+        server = HTTPServer(('127.0.0.1', 0), _SlowListingHandler)
+        server.first_parsed = threading.Event()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        pool = ConnectionPool()
+        try:
+            instances = ServiceLocator('http://127.0.0.1:%d' % server.server_port, 'token',
+                                       pool=pool).iter_services(chunk_size=1)
+            self.assertEqual(next(instances).id, 'first')
+            server.first_parsed.set()
+            self.assertEqual([instance.id for instance in instances], ['second'])
+        finally:
+            server.first_parsed.set()
+            pool.close()
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import subprocess
+import sys
+import time
+from bluemix_service_discovery import exceptions
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.stub_registry import StubRegistry, StubRegistryServer
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(StubRegistryTestCase('test_publisher_lifecycle'))
+    test_suite.addTest(StubRegistryTestCase('test_filtered_lookup'))
+    test_suite.addTest(StubRegistryTestCase('test_invalid_token'))
+    test_suite.addTest(StubRegistryTestCase('test_ttl_expiry'))
+    test_suite.addTest(StubRegistryTestCase('test_injected_faults'))
+    test_suite.addTest(StubRegistryTestCase('test_populate'))
+    test_suite.addTest(StubRegistryTestCase('test_command_line'))
+    return test_suite
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class StubRegistryTestCase(unittest.TestCase):
+    """Tests for the stub registry, driven through the client."""
+
+    def setUp(self):
+        self.server = StubRegistryServer(StubRegistry(auth_token='token')).start()
+        self.pool = ConnectionPool()
+
+    def _publisher(self, name, tags=None):
+        return ServicePublisher(name, 300, 'UP', 'https://%s.mybluemix.net' % name, 'http', tags=tags,
+                                url=self.server.url, auth_token='token', pool=self.pool)
+
+    def test_publisher_lifecycle(self):
+        """Can a service be registered, heartbeated and de-registered?"""
+        publisher = self._publisher('test-service')
+        publisher.register_service(False)
+        self.assertIn(publisher.id, self.server.registry.instances)
+        self.assertIsInstance(publisher.heartbeat_service(), str)
+        publisher.deregister_service()
+        self.assertEqual(self.server.registry.instances, {})
+        publisher.registered = True
+        self.assertRaises(exceptions.ResourceGoneException, publisher.heartbeat_service)
+
+    def test_filtered_lookup(self):
+        """Are lookups filtered by name, tags and fields?"""
+        self._publisher('test-service-1', ['test']).register_service(False)
+        self._publisher('test-service-2', ['test', 'db']).register_service(False)
+        locator = ServiceLocator(self.server.url, 'token', pool=self.pool)
+        self.assertEqual(len(locator.get_services(parsed=True)), 2)
+        self.assertEqual([i.service_name for i in locator.get_services(tags='test,db', parsed=True)],
+                         ['test-service-2'])
+        instances = locator.get_services(service_name='test-service-1', fields='id', parsed=True)
+        self.assertEqual(len(instances), 1)
+        self.assertIsNone(instances[0].service_name)
+
+    def test_invalid_token(self):
+        """With an invalid token, is correct error thrown?"""
+        locator = ServiceLocator(self.server.url, 'ABC123', pool=self.pool)
+        self.assertRaises(exceptions.AuthenticationException, locator.get_services)
+
+    def test_ttl_expiry(self):
+        """Do instances expire without heartbeats, and get 410 afterwards?"""
+        now = [0]
+        registry = StubRegistry(clock=lambda: now[0])
+        with StubRegistryServer(registry) as server:
+            publisher = ServicePublisher('test-service', 30, 'UP', 'https://test-service.mybluemix.net', 'http',
+                                         url=server.url, auth_token='token', pool=self.pool)
+            locator = ServiceLocator(server.url, 'token', pool=self.pool)
+            publisher.register_service(False)
+            now[0] = 20
+            publisher.heartbeat_service()
+            now[0] = 40
+            self.assertEqual(len(locator.get_services(parsed=True)), 1)
+            now[0] = 50
+            self.assertEqual(locator.get_services(parsed=True), ())
+            self.assertEqual(registry.expired, 1)
+            self.assertRaises(exceptions.ResourceGoneException, publisher.heartbeat_service)
+            self.assertRaises(exceptions.ResourceGoneException, publisher.deregister_service)
+
+    def test_injected_faults(self):
+        """Are the configured latency and error rate injected into requests?"""
+        registry = StubRegistry(latency=.1, error_rate=.5, seed=1)
+        with StubRegistryServer(registry) as server:
+            locator = ServiceLocator(server.url, 'token', pool=self.pool)
+            start = time.time()
+            errors = 0
+            for _ in range(10):
+                try:
+                    locator.get_services()
+                except exceptions.ServerErrorException:
+                    errors += 1
+            self.assertGreaterEqual(time.time() - start, 1)
+            self.assertEqual(errors, registry.injected_errors)
+            self.assertTrue(0 < errors < 10)
+
+            registry.latency, registry.error_rate = 0, 1
+            self.assertRaises(exceptions.ServerErrorException, locator.get_services)
+
+    def test_populate(self):
+        """Are thousands of simulated instances served and filtered?"""
+        registry = self.server.registry
+        ids = registry.populate(5000, ['service-%d' % i for i in range(10)], tags=[['zone-a'], ['zone-b']])
+        self.assertEqual(len(set(ids)), 5000)
+        locator = ServiceLocator(self.server.url, 'token', pool=self.pool)
+        self.assertEqual(len(locator.get_services(parsed=True)), 5000)
+        self.assertEqual(len(locator.get_services(service_name='service-3', parsed=True)), 500)
+        self.assertEqual(len(locator.get_services(tags='zone-b', parsed=True)), 2500)
+
+    def test_command_line(self):
+        """Does python -m serve a populated registry?"""
+        process = subprocess.Popen([sys.executable, '-m', 'bluemix_service_discovery.stub_registry', '--port', '0',
+                                    '--instances', '100', '--services', '4'], stdout=subprocess.PIPE)
+        try:
+            line = process.stdout.readline().decode('utf-8')
+            self.assertTrue(line.startswith('Serving 100 instances on http://'))
+            locator = ServiceLocator(line.split()[-1], 'token', pool=self.pool)
+            self.assertEqual(len(locator.get_services(service_name='service-0', parsed=True)), 25)
+        finally:
+            process.terminate()
+            process.wait()
+            process.stdout.close()
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
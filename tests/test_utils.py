@@ -0,0 +1,122 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+from bluemix_service_discovery import utils
+from bluemix_service_discovery.cache import LookupCache
+from bluemix_service_discovery.connection import ConnectionPool
+from bluemix_service_discovery.service_locator import ServiceLocator
+from bluemix_service_discovery.service_publisher import ServicePublisher
+from bluemix_service_discovery.stub_registry import StubRegistryServer
+from bluemix_service_discovery.utils import add_query_string, build_query, lookup_key
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(QueryTestCase('test_query_encoding'))
+    test_suite.addTest(QueryTestCase('test_list_filters'))
+    test_suite.addTest(QueryTestCase('test_lookup_key'))
+    test_suite.addTest(QueryTestCase('test_filters_pushed_down'))
+    test_suite.addTest(CredentialsTestCase('test_credentials_memoized'))
+    test_suite.addTest(CredentialsTestCase('test_import_defers_requests'))
+    return test_suite
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class QueryTestCase(unittest.TestCase):
+    """Tests for the lookup query builder."""
+
+    def test_query_encoding(self):
+        """Are filter values URL-encoded and empty filters skipped?"""
+        self.assertEqual(build_query(('tags', None), ('status', '')), '')
+        self.assertEqual(build_query(('service_name', 'my service&co'), ('status', 'UP')),
+                         '?service_name=my%20service%26co&status=UP')
+        self.assertEqual(add_query_string(('tags', 'a,b'), ('status', 'UP')), '?tags=a%2Cb&status=UP')
+
+    def test_list_filters(self):
+        """Are list values sent comma separated, each one encoded?"""
+        self.assertEqual(build_query(('tags', ['zone 1', 'a,b']), ('status', ('UP', 'OUT_OF_SERVICE'))),
+                         '?tags=zone%201,a%2Cb&status=UP,OUT_OF_SERVICE')
+        self.assertEqual(build_query(('tags', [])), '')
+
+    def test_lookup_key(self):
+        """Do equivalent list filters share one hashable key?"""
+        self.assertEqual(lookup_key(tags=['b', 'a', 'b']), lookup_key(tags=('a', 'b')))
+        self.assertEqual(lookup_key(tags=['a', 'b']), (None, ('a', 'b'), None, None))
+        self.assertEqual(lookup_key('id', '', 'name', None), ('id', None, 'name', None))
+        hash(lookup_key(fields=['id'], status=['UP']))
+
+    def test_filters_pushed_down(self):
+        """Does the registry filter instances and fields for list filters?"""
+        with StubRegistryServer() as server:
+            pool = ConnectionPool()
+            for name, tags, status in [('a', ['web', 'zone-1'], 'UP'), ('b', ['web', 'zone-2'], 'UP'),
+                                       ('c', ['web', 'zone-1'], 'DOWN')]:
+                ServicePublisher(name, 300, status, 'https://%s.mybluemix.net' % name, 'http', tags=tags,
+                                 url=server.url, auth_token='token', pool=pool).register_service(False)
+            locator = ServiceLocator(server.url, 'token', pool=pool, cache=LookupCache())
+
+            instances = json.loads(locator.get_services(fields=['service_name', 'status'], tags=['zone-1', 'web'],
+                                                        status=['UP', 'DOWN']))['instances']
+            self.assertEqual(sorted((i['service_name'], i['status']) for i in instances), [('a', 'UP'), ('c', 'DOWN')])
+            self.assertEqual(set(key for i in instances for key in i), set(['service_name', 'status']))
+
+            instances = locator.get_services(tags=['web', 'zone-1'], status='UP', parsed=True)
+            self.assertEqual([i.service_name for i in instances], ['a'])
+            self.assertEqual(locator.cache.stats()['hits'], 0)
+            locator.get_services(tags=('zone-1', 'web'), status='UP')
+            self.assertEqual(locator.cache.stats()['hits'], 1)
+            pool.close()
+
+
+class CredentialsTestCase(unittest.TestCase):
+    """Tests for load_credentials and import cost."""
+
+    def setUp(self):
+        self.vcap_services = os.environ.get('VCAP_SERVICES')
+
+    @staticmethod
+    def vcap(url):
+        return json.dumps({'service_discovery': [{'credentials': {'url': url, 'auth_token': 'vcap-token'}}]})
+
+    def test_credentials_memoized(self):
+        """Is VCAP_SERVICES parsed once, and again once it changes?"""
+        os.environ['VCAP_SERVICES'] = self.vcap('https://first')
+        credentials = utils.load_credentials()
+        self.assertEqual(credentials, {'url': 'https://first', 'auth_token': 'vcap-token'})
+        parsed = utils._vcap_credentials[1]
+
+        credentials['url'] = 'changed by caller'
+        self.assertEqual(utils.load_credentials('ignored', 'ignored')['url'], 'https://first')
+        self.assertIs(utils._vcap_credentials[1], parsed)
+
+        os.environ['VCAP_SERVICES'] = self.vcap('https://second')
+        self.assertEqual(utils.load_credentials()['url'], 'https://second')
+
+        del os.environ['VCAP_SERVICES']
+        self.assertEqual(utils.load_credentials('https://given', 'token'),
+                         {'url': 'https://given', 'auth_token': 'token'})
+
+    def test_import_defers_requests(self):
+        """Does importing the clients leave requests unloaded until the first request?"""
+        code = ('import sys\n'
+                'from bluemix_service_discovery.service_locator import ServiceLocator\n'
+                'from bluemix_service_discovery.service_publisher import ServicePublisher\n'
+                'ServiceLocator("http://127.0.0.1:1", "token")\n'
+                'print("requests" in sys.modules)\n')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(output.strip(), b'False')
+
+    def tearDown(self):
+        if self.vcap_services is None:
+            os.environ.pop('VCAP_SERVICES', None)
+        else:
+            os.environ['VCAP_SERVICES'] = self.vcap_services
+
+if __name__ == '__main__':
+    unittest.main()
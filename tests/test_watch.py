@@ -0,0 +1,88 @@
+import unittest
+from bluemix_service_discovery.models import ServiceInstance
+from bluemix_service_discovery.watch import CatalogWatcher
+
+
+def suite():
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(CatalogWatcherTestCase('test_initial_snapshot'))
+    test_suite.addTest(CatalogWatcherTestCase('test_incremental_diff'))
+    test_suite.addTest(CatalogWatcherTestCase('test_unchanged_not_notified'))
+    test_suite.addTest(CatalogWatcherTestCase('test_heartbeat_not_notified'))
+    return test_suite
+
+
+class _Locator(object):
+    """Locator stand-in returning whatever instances are set on it."""
+
+    def __init__(self):
+        self.instances = ()
+
+    def get_services(self, fields=None, tags=None, service_name=None, status=None, parsed=False):
+        return tuple(self.instances)
+
+
+def _instance(id, status='UP', last_heartbeat=None):
+    return ServiceInstance(id, 'test-service', 'https://%s.mybluemix.net' % id, 'http', (), status, 300,
+                           last_heartbeat)
+
+
+###########################
+#        Unit Tests       #
+###########################
+
+class CatalogWatcherTestCase(unittest.TestCase):
+    """Tests for CatalogWatcher."""
+
+    def setUp(self):
+        self.locator = _Locator()
+        self.watcher = CatalogWatcher(self.locator)
+        self.watcher.watch('test', service_name='test-service')
+        self.notifications = []
+        self.watcher.subscribe(lambda name, diff, snapshot: self.notifications.append((name, diff, snapshot)))
+
+    def test_initial_snapshot(self):
+        """Is the first refresh reported as all instances added?"""
+        self.assertEqual(len(self.watcher.snapshot('test')), 0)
+        self.locator.instances = [_instance('a'), _instance('b')]
+        self.watcher.refresh()
+        snapshot = self.watcher.snapshot('test')
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual(snapshot.get('a').id, 'a')
+        self.assertEqual(len(self.notifications[0][1].added), 2)
+
+    def test_incremental_diff(self):
+        """Are added, removed and changed instances reported?"""
+        self.locator.instances = [_instance('a'), _instance('b')]
+        self.watcher.refresh()
+        first = self.watcher.snapshot('test')
+        self.locator.instances = [_instance('a', status='OUT_OF_SERVICE'), _instance('c')]
+        changes = self.watcher.refresh()
+        diff = changes['test']
+        self.assertEqual([i.id for i in diff.added], ['c'])
+        self.assertEqual([i.id for i in diff.removed], ['b'])
+        self.assertEqual([i.status for i in diff.changed], ['OUT_OF_SERVICE'])
+        self.assertEqual(first.get('a').status, 'UP')
+        self.assertEqual(self.watcher.snapshot('test').version, 2)
+
+    def test_unchanged_not_notified(self):
+        """Are subscribers left alone when nothing changed?"""
+        self.locator.instances = [_instance('a')]
+        self.watcher.refresh()
+        self.locator.instances = [_instance('a')]
+        self.assertEqual(self.watcher.refresh(), {})
+        self.assertEqual(len(self.notifications), 1)
+        self.assertEqual(self.watcher.snapshot('test').version, 1)
+
+    def test_heartbeat_not_notified(self):
+        """Are instances that only heartbeated since the last refresh left out of the changes?"""
+        self.locator.instances = [_instance('a', last_heartbeat='2017-03-01T10:00:00.000Z')]
+        self.watcher.refresh()
+        self.locator.instances = [_instance('a', last_heartbeat='2017-03-01T10:00:15.000Z')]
+        self.assertEqual(self.watcher.refresh(), {})
+        self.locator.instances = [_instance('a', 'OUT_OF_SERVICE', last_heartbeat='2017-03-01T10:00:30.000Z')]
+        self.assertEqual(len(self.watcher.refresh()['test'].changed), 1)
+        self.assertEqual(len(self.notifications), 2)
+
+if __name__ == '__main__':
+    unittest.main()